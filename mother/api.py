@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
-from mother.core import tone, memory
+from mother.core import tone, memory, rollups
 from mother.core.nudges import NudgeRequest, compose_nudge, demo_nudge
 
 app = FastAPI(title="mother-api")
@@ -12,6 +12,15 @@ app = FastAPI(title="mother-api")
 @app.on_event("startup")
 def _init_memory() -> None:
     memory.init_db()
+    memory.start_sweeper()
+    rollups.init_db()
+    rollups.start()
+
+
+@app.on_event("shutdown")
+def _flush_memory() -> None:
+    rollups.stop()
+    memory.shutdown()
 
 
 @app.get("/health")
@@ -55,3 +64,18 @@ def memory_remember(body: RememberBody):
 def memory_profile(user_id: str = "default"):
     prof = memory.get_profile(user_id)
     return {"user_id": user_id, "profile": prof}
+
+
+@app.get("/events/rollups")
+def events_rollups(
+    user_id: str | None = None,
+    grain: str = "day",
+    since: str | None = None,
+    until: str | None = None,
+    kind: str | None = None,
+):
+    try:
+        rows = rollups.query(user_id, grain, since, until, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"grain": grain, "user_id": user_id, "rollups": rows}
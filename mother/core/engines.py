@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import functools
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Protocol, Set, Tuple
+
+from mother.memory.queues import STOP, gather
+
+# Storage engines behind mother.core.memory. SQL is written once, in the
+# SQLite dialect with ``?`` placeholders and portable upserts (ON CONFLICT),
+# and each engine adapts it. An operation is a list of (sql, params) run in
+# one transaction; submit() resolves to the rows each statement returned.
+#   sqlite    one writer thread with group commit, per-thread read
+#             connections; MOTHER_DB_PATH may contain "{pid}" for one file per
+#             worker (shared-nothing: only correct when users are pinned to
+#             workers, e.g. by a hashing load balancer)
+#   postgres  statements run on the shared psycopg pool (mother.memory.pool);
+#             every worker shares the server, so nothing is pinned
+Op = List[Tuple[str, tuple]]
+
+
+class Engine(Protocol):
+    name: str
+    durability: str
+
+    def submit(
+        self, op: Op, on_commit: Optional[Callable[[], None]] = None
+    ) -> Future: ...
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]: ...
+
+    def columns(self, table: str) -> Set[str]: ...
+
+    def flush(self) -> None: ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+    def close(self) -> None: ...
+
+
+# RETURNING (touch_and_delta, the fact sweeper, pruning) arrived in SQLite 3.35
+_SQLITE_MIN = (3, 35, 0)
+
+
+def _check_sqlite_version() -> None:
+    if sqlite3.sqlite_version_info < _SQLITE_MIN:
+        raise RuntimeError(
+            f"MOTHER_DB_ENGINE=sqlite needs SQLite >= 3.35 (RETURNING); this"
+            f" Python's sqlite3 module is built against {sqlite3.sqlite_version}."
+            " Use a newer Python build or MOTHER_DB_ENGINE=postgres."
+        )
+
+
+def _check_durability(durability: str) -> str:
+    if durability not in ("full", "group", "async"):
+        raise ValueError(f"unknown MOTHER_DB_DURABILITY: {durability!r}")
+    return durability
+
+
+class _Writer:
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        durability: str,
+        group_ms: float,
+        group_rows: int,
+    ):
+        self.durability = durability
+        self.max_rows = 1 if durability == "full" else max(1, group_rows)
+        self.max_wait = 0.0 if durability == "full" else max(0.0, group_ms) / 1000.0
+        self._q: "queue.Queue[object]" = queue.Queue()
+        self._conn = conn
+        self._conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        sync = "NORMAL" if durability == "async" else "FULL"
+        self._conn.execute(f"PRAGMA synchronous={sync};")
+        self.commits = 0
+        self._thread = threading.Thread(
+            target=self._run, name="mother-db-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, op: Op, on_commit: Optional[Callable[[], None]] = None) -> Future:
+        fut: Future = Future()
+        self._q.put((op, on_commit, fut))
+        return fut
+
+    def _apply(self, batch: list) -> List[list]:
+        # per operation, the rows each statement returned (RETURNING)
+        results = []
+        self._conn.execute("BEGIN")
+        for op, _, _ in batch:
+            results.append(
+                [self._conn.execute(sql, params).fetchall() for sql, params in op]
+            )
+        self._conn.execute("COMMIT")
+        self.commits += 1
+        return results
+
+    def _rollback(self) -> None:
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is STOP:
+                return
+            batch, stop = gather(self._q, first, self.max_rows, self.max_wait)
+            try:
+                done = [
+                    (item, res, None) for item, res in zip(batch, self._apply(batch))
+                ]
+            except Exception:
+                # isolate the failing operation; the rest still commit
+                self._rollback()
+                done = []
+                for item in batch:
+                    try:
+                        done.append((item, self._apply([item])[0], None))
+                    except Exception as e:
+                        self._rollback()
+                        done.append((item, None, e))
+            for (_, on_commit, fut), res, err in done:
+                if err is None:
+                    if on_commit is not None:
+                        on_commit()
+                    fut.set_result(res)
+                else:
+                    fut.set_exception(err)
+            if stop:
+                return
+
+    def flush(self) -> None:
+        self.submit([]).result()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self._q.put(STOP)
+        self._thread.join(timeout)
+        self._conn.close()
+
+
+class SQLiteEngine:
+    """WAL file, one group-committing writer thread, a reader per thread.
+
+    Writes from one process never contend with each other; writers in other
+    worker processes wait up to ``busy_ms`` for the file lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        durability: str = "group",
+        group_ms: float = 0.0,
+        group_rows: int = 256,
+        mmap_bytes: int = int(os.getenv("MOTHER_DB_MMAP_BYTES", str(256 << 20))),
+        busy_ms: int = int(os.getenv("MOTHER_DB_BUSY_MS", "5000")),
+    ):
+        _check_sqlite_version()
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.durability = _check_durability(durability)
+        self.mmap_bytes = mmap_bytes
+        self.busy_ms = busy_ms
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._writer = _Writer(self._connect(), durability, group_ms, group_rows)
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_ms / 1000.0, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA foreign_keys=ON;")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_ms)};")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)};")
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def submit(self, op: Op, on_commit: Optional[Callable[[], None]] = None) -> Future:
+        return self._writer.submit(op, on_commit)
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self.reader().execute(sql, params).fetchall()
+
+    def columns(self, table: str) -> Set[str]:
+        return {r[1] for r in self.query(f"PRAGMA table_info({table})")}
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": self.name,
+            "path": self.path,
+            "durability": self.durability,
+            "commits": self._writer.commits,
+            "queued": self._writer._q.qsize(),
+            "readers": len(self._readers),
+        }
+
+    def close(self) -> None:
+        self._writer.close()
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            conn.close()
+
+
+@functools.lru_cache(maxsize=256)
+def _pg_sql(sql: str) -> str:
+    # a literal % (LIKE patterns, strftime formats) must be doubled once the
+    # placeholders are %s; statements carry no ? outside placeholders
+    return (
+        sql.replace("%", "%%")
+        .replace("?", "%s")
+        .replace("INTEGER PRIMARY KEY AUTOINCREMENT", "BIGSERIAL PRIMARY KEY")
+    )
+
+
+class PostgresEngine:
+    """Runs each operation as one transaction on a pooled connection.
+
+    Calls are synchronous in every durability mode; ``async`` maps to
+    ``synchronous_commit = off`` for its transactions.
+    """
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, durability: str = "group"):
+        from mother.memory.pool import shared_pool
+
+        self.durability = _check_durability(durability)
+        self.dsn = dsn
+        self._pool = shared_pool(dsn)
+
+    def submit(self, op: Op, on_commit: Optional[Callable[[], None]] = None) -> Future:
+        from psycopg.rows import tuple_row
+
+        fut: Future = Future()
+        try:
+            results = []
+            with self._pool.connection() as conn:
+                with conn.transaction(), conn.cursor(row_factory=tuple_row) as cur:
+                    if self.durability == "async":
+                        cur.execute("SET LOCAL synchronous_commit = off")
+                    for sql, params in op:
+                        cur.execute(_pg_sql(sql), params)
+                        results.append(cur.fetchall() if cur.description else [])
+            if on_commit is not None:
+                on_commit()
+            fut.set_result(results)
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        from psycopg.rows import tuple_row
+
+        with self._pool.connection() as conn:
+            with conn.cursor(row_factory=tuple_row) as cur:
+                cur.execute(_pg_sql(sql), params)
+                return cur.fetchall()
+
+    def columns(self, table: str) -> Set[str]:
+        rows = self.query(
+            "SELECT column_name FROM information_schema.columns"
+            " WHERE table_schema = current_schema() AND table_name = ?",
+            (table,),
+        )
+        return {r[0] for r in rows}
+
+    def flush(self) -> None:
+        pass  # submit() has already committed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": self.name,
+            "durability": self.durability,
+            **self._pool.stats(),
+        }
+
+    def close(self) -> None:
+        pass  # the pool is shared; mother.memory.pool.close_pools() owns it
+
+
+def make_engine(
+    kind: str,
+    *,
+    path: str,
+    dsn: Optional[str],
+    durability: str,
+    group_ms: float,
+    group_rows: int,
+) -> Engine:
+    kind = kind.lower()
+    if kind == "sqlite":
+        return SQLiteEngine(path, durability, group_ms, group_rows)
+    if kind in ("postgres", "postgresql"):
+        if not dsn:
+            raise ValueError("MOTHER_DB_ENGINE=postgres needs MOTHER_DB_DSN")
+        return PostgresEngine(dsn, durability)
+    raise ValueError(f"unknown MOTHER_DB_ENGINE: {kind!r}")
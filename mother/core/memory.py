@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import atexit
 import json
 import os
-import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mother.core.engines import Engine, Op, make_engine
 
 _DB_DEFAULT = os.path.join(
     os.environ.get(
@@ -20,67 +26,206 @@ def _utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
-def _connect() -> sqlite3.Connection:
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    return conn
+# Storage sits behind an engine (mother/core/engines.py), created on first
+# use: MOTHER_DB_ENGINE=sqlite (default, DB_PATH) or postgres (MOTHER_DB_DSN).
+# SQLite writes go through one writer thread that owns the only write
+# connection and commits queued operations in groups (every MOTHER_DB_GROUP_MS
+# or MOTHER_DB_GROUP_ROWS operations). MOTHER_DB_DURABILITY picks the
+# trade-off:
+#   full   one transaction per operation, fsync'd; callers wait (old behaviour)
+#   group  operations share a transaction and its fsync; callers wait for it
+#   async  like group, but callers return once queued and commits are not
+#          fsync'd (WAL synchronous=NORMAL); a crash can lose the last window
+# Reads use per-thread connections (WAL readers never block the writer).
+ENGINE = os.environ.get("MOTHER_DB_ENGINE", "sqlite")
+DSN = os.environ.get("MOTHER_DB_DSN")
+DURABILITY = os.environ.get("MOTHER_DB_DURABILITY", "group")
+# group: 0 = commit whatever queued up while the previous fsync ran, which
+# batches under load without delaying a lone request
+GROUP_MS = float(
+    os.environ.get("MOTHER_DB_GROUP_MS", "5" if DURABILITY == "async" else "0")
+)
+GROUP_ROWS = int(os.environ.get("MOTHER_DB_GROUP_ROWS", "256"))
+# user_ids known to exist, with the last_seen_at this process wrote for them
+USER_CACHE = int(os.environ.get("MOTHER_DB_USER_CACHE", "10000"))
+# get_profile: per-user LRU; other workers' remember_fact shows after TTL_S
+PROFILE_CACHE = int(os.environ.get("MOTHER_PROFILE_CACHE", "10000"))
+PROFILE_CACHE_TTL_S = float(os.environ.get("MOTHER_PROFILE_CACHE_TTL_S", "5"))
+# expired facts are hidden by reads and deleted by a background sweeper
+SWEEP_INTERVAL_S = float(os.environ.get("MOTHER_FACTS_SWEEP_S", "300"))
+SWEEP_BATCH = int(os.environ.get("MOTHER_FACTS_SWEEP_BATCH", "500"))
+
+_Op = Op
+
+
+_ENGINE: Optional[Engine] = None
+_ENGINE_LOCK = threading.Lock()
+
+# Bounded LRU of user_id -> last_seen_at this process wrote. Users are never
+# deleted, so a cached id exists for every worker sharing the file and its
+# ensure-insert can be skipped. The timestamps are only trusted in async
+# mode (see touch_and_delta); the other modes read them back from the write.
+_USERS: "OrderedDict[str, str]" = OrderedDict()
+_SEEN_LOCK = threading.Lock()
+
+
+def _engine() -> Engine:
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = make_engine(
+                    ENGINE,
+                    path=DB_PATH,
+                    dsn=DSN,
+                    durability=DURABILITY,
+                    group_ms=GROUP_MS,
+                    group_rows=GROUP_ROWS,
+                )
+    return _ENGINE
+
+
+def _submit(op: _Op, on_commit: Optional[Callable[[], None]] = None) -> Future:
+    return _engine().submit(op, on_commit)
+
+
+def _write(op: _Op, on_commit: Optional[Callable[[], None]] = None) -> None:
+    fut = _submit(op, on_commit)
+    if _engine().durability != "async":
+        fut.result()
+
+
+def _query(sql: str, params: tuple = ()) -> List[tuple]:
+    return _engine().query(sql, params)
+
 
+def _cache_user(user_id: str, last_seen: Optional[str] = None) -> None:
+    # caller holds _SEEN_LOCK
+    if last_seen is None:
+        last_seen = _USERS.get(user_id, "")
+    _USERS[user_id] = last_seen
+    _USERS.move_to_end(user_id)
+    while len(_USERS) > max(0, USER_CACHE):
+        _USERS.popitem(last=False)
 
-_CONN: sqlite3.Connection = _connect()
+
+def _remember_user(user_id: str, last_seen: Optional[str] = None) -> None:
+    with _SEEN_LOCK:
+        _cache_user(user_id, last_seen)
+
+
+def flush() -> None:
+    """Wait until everything queued so far is committed."""
+    if _ENGINE is not None:
+        _ENGINE.flush()
+
+
+def engine_stats() -> Dict[str, Any]:
+    return _engine().stats()
+
+
+def shutdown() -> None:
+    """Stop the sweeper, commit queued writes and close the engine."""
+    global _ENGINE
+    stop_sweeper()
+    with _ENGINE_LOCK:
+        e, _ENGINE = _ENGINE, None
+    if e is not None:
+        e.close()
+    with _SEEN_LOCK:
+        _USERS.clear()
+    with _PROFILE_LOCK:
+        _PROFILES.clear()
+        _PENDING_FACTS.clear()
+
+
+atexit.register(shutdown)
+
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        last_seen_at TEXT,
+        prev_seen_at TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS facts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        k TEXT NOT NULL,
+        v TEXT NOT NULL,
+        source TEXT,
+        confidence REAL DEFAULT 0.9,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        expires_at TEXT,
+        UNIQUE(user_id, k),
+        FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_facts_expires
+    ON facts(expires_at) WHERE expires_at IS NOT NULL;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_events_user_created
+    ON events(user_id, created_at);
+    """,
+)
 
 
 def init_db() -> None:
-    _CONN.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            created_at TEXT NOT NULL,
-            last_seen_at TEXT
-        );
-        """
-    )
-    _CONN.execute(
-        """
-        CREATE TABLE IF NOT EXISTS facts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            k TEXT NOT NULL,
-            v TEXT NOT NULL,
-            source TEXT,
-            confidence REAL DEFAULT 0.9,
-            created_at TEXT NOT NULL,
-            updated_at TEXT NOT NULL,
-            expires_at TEXT,
-            UNIQUE(user_id, k),
-            FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
-        );
-        """
-    )
-    _CONN.execute(
-        """
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            kind TEXT NOT NULL,
-            payload TEXT,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(user_id) REFERENCES users(user_id) ON DELETE CASCADE
-        );
-        """
-    )
-    _CONN.commit()
+    _write([(ddl, ()) for ddl in _SCHEMA])
+    flush()
+    if "prev_seen_at" not in _engine().columns("users"):
+        try:
+            _submit([("ALTER TABLE users ADD COLUMN prev_seen_at TEXT", ())]).result()
+        except Exception:
+            # workers starting together race to add it; one of them wins
+            if "prev_seen_at" not in _engine().columns("users"):
+                raise
+    flush()
 
 
-def _ensure_user(user_id: str) -> None:
-    cur = _CONN.execute("SELECT 1 FROM users WHERE user_id=?", (user_id,))
-    if cur.fetchone() is None:
-        _CONN.execute(
-            "INSERT INTO users(user_id, created_at) VALUES(?, ?)",
+def _ensure_user_ops(user_id: str) -> _Op:
+    # queued ahead of the rows that reference the user (foreign keys)
+    if user_id in _USERS:
+        return []
+    return [
+        (
+            "INSERT INTO users(user_id, created_at) VALUES(?, ?)"
+            " ON CONFLICT(user_id) DO NOTHING",
             (user_id, _utc_now().isoformat()),
         )
-        _CONN.commit()
+    ]
+
+
+# One statement creates the user or advances last_seen_at, handing back the
+# value it replaced: SET expressions see the old row, RETURNING the new one.
+# The write lock serialises workers, so each gets its true predecessor.
+_TOUCH_SQL = """
+    INSERT INTO users(user_id, created_at, last_seen_at) VALUES(?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+      prev_seen_at=users.last_seen_at,
+      last_seen_at=CASE
+        WHEN users.last_seen_at > excluded.last_seen_at THEN users.last_seen_at
+        ELSE excluded.last_seen_at
+      END
+    RETURNING prev_seen_at
+"""
 
 
 def _parse_dt(s: Optional[str]) -> Optional[datetime]:
@@ -111,20 +256,35 @@ def touch_and_delta(
     payload: Optional[Dict[str, Any]] = None,
 ) -> Optional[timedelta]:
     """Return delta since last_seen BEFORE updating last_seen; then update."""
-    _ensure_user(user_id)
-    cur = _CONN.execute("SELECT last_seen_at FROM users WHERE user_id=?", (user_id,))
-    row = cur.fetchone()
-    last_seen = _parse_dt(row[0]) if row and row[0] else None
     now = _utc_now()
-    _CONN.execute(
-        "UPDATE users SET last_seen_at=? WHERE user_id=?",
-        (now.isoformat(), user_id),
-    )
-    _CONN.execute(
-        "INSERT INTO events(user_id, kind, payload, created_at) VALUES(?, ?, ?, ?)",
-        (user_id, kind, json.dumps(payload or {}), now.isoformat()),
-    )
-    _CONN.commit()
+    ts = now.isoformat()
+    op = [
+        (_TOUCH_SQL, (user_id, ts, ts)),
+        (
+            "INSERT INTO events(user_id, kind, payload, created_at)"
+            " VALUES(?, ?, ?, ?)",
+            (user_id, kind, json.dumps(payload or {}), ts),
+        ),
+    ]
+    e = _engine()
+    if e.durability == "async":
+        # the caller does not wait for the write, so the predecessor comes
+        # from this process (exact within it; another worker's touch since
+        # our last one is only seen once the entry is evicted)
+        with _SEEN_LOCK:
+            prev = _USERS.get(user_id)
+            if not prev:
+                rows = _query(
+                    "SELECT last_seen_at FROM users WHERE user_id=?", (user_id,)
+                )
+                prev = rows[0][0] if rows else None
+            _cache_user(user_id, ts)
+        e.submit(op)
+    else:
+        touched = e.submit(op).result()[0]  # rows of _TOUCH_SQL's RETURNING
+        prev = touched[0][0]
+        _remember_user(user_id, ts)
+    last_seen = _parse_dt(prev)
     return (now - last_seen) if last_seen else None
 
 
@@ -137,10 +297,9 @@ def remember_fact(
     source: str = "api",
     confidence: float = 0.9,
 ) -> None:
-    _ensure_user(user_id)
     now = _utc_now().isoformat()
     expires = (_utc_now() + timedelta(days=ttl_days)).isoformat() if ttl_days else None
-    _CONN.execute(
+    fact = (
         """
         INSERT INTO facts(user_id, k, v, source, confidence, created_at, updated_at, expires_at)
         VALUES(?, ?, ?, ?, ?, ?, ?, ?)
@@ -153,21 +312,116 @@ def remember_fact(
         """,
         (user_id, key, value, source, confidence, now, now, expires),
     )
-    _CONN.commit()
+    with _PROFILE_LOCK:
+        _PROFILES.pop(user_id, None)
+        _PENDING_FACTS[user_id] = _PENDING_FACTS.get(user_id, 0) + 1
+
+    def done(_fut: Future) -> None:
+        global _FACTS_EPOCH
+        with _PROFILE_LOCK:
+            _FACTS_EPOCH += 1
+            _PROFILES.pop(user_id, None)
+            left = _PENDING_FACTS.get(user_id, 1) - 1
+            if left > 0:
+                _PENDING_FACTS[user_id] = left
+            else:
+                _PENDING_FACTS.pop(user_id, None)
+
+    fut = _submit(_ensure_user_ops(user_id) + [fact])
+    fut.add_done_callback(done)
+    if _engine().durability != "async":
+        fut.result()
+    _remember_user(user_id)
+
+
+# user_id -> (monotonic expiry, [(k, v, expires_at)]), newest last
+_PROFILES: "OrderedDict[str, Tuple[float, list]]" = OrderedDict()
+# remember_fact calls not yet committed, per user (async mode reads flush them)
+_PENDING_FACTS: Dict[str, int] = {}
+# bumped on every fact commit; a read racing a commit does not fill the cache
+_FACTS_EPOCH = 0
+_PROFILE_LOCK = threading.Lock()
 
 
 def get_profile(user_id: str) -> Dict[str, str]:
-    _ensure_user(user_id)
-    _CONN.execute(
-        "DELETE FROM facts WHERE expires_at IS NOT NULL AND expires_at < ?",
-        (_utc_now().isoformat(),),
-    )
-    _CONN.commit()
-    cur = _CONN.execute(
-        "SELECT k, v FROM facts WHERE user_id=? ORDER BY k",
-        (user_id,),
-    )
-    return {k: v for (k, v) in cur.fetchall()}
+    """Unexpired facts for ``user_id``; read-only, served from cache when warm."""
+    ts = _utc_now().isoformat()
+    with _PROFILE_LOCK:
+        hit = _PROFILES.get(user_id)
+        if hit is not None and hit[0] > time.monotonic():
+            _PROFILES.move_to_end(user_id)
+            facts = hit[1]
+        else:
+            facts = None
+        pending = user_id in _PENDING_FACTS
+    if facts is None:
+        if pending:
+            flush()  # async mode: see facts remembered just before
+        with _PROFILE_LOCK:
+            epoch = _FACTS_EPOCH
+        facts = _query(
+            "SELECT k, v, expires_at FROM facts WHERE user_id=?"
+            " AND (expires_at IS NULL OR expires_at >= ?) ORDER BY k",
+            (user_id, ts),
+        )
+        with _PROFILE_LOCK:
+            if epoch == _FACTS_EPOCH and PROFILE_CACHE > 0:
+                _PROFILES[user_id] = (time.monotonic() + PROFILE_CACHE_TTL_S, facts)
+                _PROFILES.move_to_end(user_id)
+                while len(_PROFILES) > PROFILE_CACHE:
+                    _PROFILES.popitem(last=False)
+    # cached rows may have expired since they were read
+    return {k: v for (k, v, exp) in facts if exp is None or exp >= ts}
+
+
+def sweep_expired(batch: int = SWEEP_BATCH, max_batches: Optional[int] = None) -> int:
+    """Delete expired facts through the partial index, ``batch`` rows per commit."""
+    n = batches = 0
+    while max_batches is None or batches < max_batches:
+        op = [
+            (
+                "DELETE FROM facts WHERE id IN (SELECT id FROM facts"
+                " WHERE expires_at IS NOT NULL AND expires_at < ? LIMIT ?)"
+                " RETURNING id",
+                (_utc_now().isoformat(), max(1, batch)),
+            )
+        ]
+        deleted = len(_submit(op).result()[0])
+        n += deleted
+        batches += 1
+        if deleted < max(1, batch):
+            break
+    return n
+
+
+_SWEEPER: Optional[threading.Thread] = None
+_SWEEP_STOP = threading.Event()
+
+
+def start_sweeper(interval_s: float = SWEEP_INTERVAL_S) -> None:
+    """Run sweep_expired every ``interval_s`` in a daemon thread (idempotent)."""
+    global _SWEEPER
+    if _SWEEPER is not None or interval_s <= 0:
+        return
+    _SWEEP_STOP.clear()
+
+    def loop() -> None:
+        while not _SWEEP_STOP.wait(interval_s):
+            try:
+                sweep_expired()
+            except Exception:
+                pass  # next round retries; reads already hide expired rows
+
+    _SWEEPER = threading.Thread(target=loop, name="mother-facts-sweeper", daemon=True)
+    _SWEEPER.start()
+
+
+def stop_sweeper() -> None:
+    global _SWEEPER
+    t, _SWEEPER = _SWEEPER, None
+    if t is not None:
+        _SWEEP_STOP.set()
+        t.join(5.0)
 
 
 def personalize_and_update(text: str, user_id: str = "default") -> str:
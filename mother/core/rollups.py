@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import threading
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from mother.core import memory
+
+# Per-user hour/day event counts by kind, folded in incrementally from the
+# events table. rollup_state.last_id is the high-water mark: each pass
+# aggregates the events above it and advances it in the same transaction,
+# which first locks the state row and re-reads the mark after the lock, so
+# workers sharing the store never count an event twice. Raw events older than
+# the retention horizon (and already rolled up) are appended to monthly gzip
+# NDJSON files and deleted; the archive is at-least-once (a crash between
+# append and delete re-archives that batch).
+ROLLUP_BATCH = int(os.environ.get("MOTHER_ROLLUP_BATCH", "5000"))
+ROLLUP_INTERVAL_S = float(os.environ.get("MOTHER_ROLLUP_S", "60"))
+# Postgres takes BIGSERIAL ids at INSERT but shows rows at COMMIT, so an id
+# below the mark can appear after the mark has passed it and would never be
+# counted. There a pass stops at events older than this lag; SQLite's single
+# writer commits ids in order and rolls up to max(id).
+ROLLUP_LAG_S = float(os.environ.get("MOTHER_ROLLUP_LAG_S", "60"))
+# 0 keeps raw events forever
+RETENTION_DAYS = float(os.environ.get("MOTHER_EVENTS_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = os.environ.get(
+    "MOTHER_EVENTS_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(memory.DB_PATH), "archive", "events"),
+)
+# 0 prunes without writing archive files
+ARCHIVE = os.environ.get("MOTHER_EVENTS_ARCHIVE", "1") == "1"
+
+GRAINS = {"hour": 13, "day": 10}  # ISO-8601 prefix length of each bucket
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS event_rollups (
+        grain TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY(grain, user_id, bucket, kind)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    );
+    """,
+    "INSERT INTO rollup_state(name, last_id) VALUES('events', 0)"
+    " ON CONFLICT(name) DO NOTHING",
+)
+
+_MARK = "(SELECT last_id FROM rollup_state WHERE name='events')"
+
+
+def init_db() -> None:
+    memory._write([(ddl, ()) for ddl in _SCHEMA])
+    memory.flush()
+
+
+def _rollup_op(hi: int) -> memory._Op:
+    # Lock the state row first. Under Postgres' READ COMMITTED a concurrent
+    # pass blocks here until this one commits, and its later statements then
+    # see the advanced mark, so the range is not counted twice. SQLite
+    # serializes writers anyway; the no-op UPDATE is portable where
+    # SELECT ... FOR UPDATE is not.
+    op = [("UPDATE rollup_state SET last_id = last_id WHERE name='events'", ())]
+    for grain, width in GRAINS.items():
+        op.append(
+            (
+                f"""
+                INSERT INTO event_rollups(grain, user_id, bucket, kind, n)
+                SELECT '{grain}', user_id, substr(created_at, 1, {width}), kind,
+                       count(*)
+                FROM events WHERE id > {_MARK} AND id <= ?
+                GROUP BY user_id, substr(created_at, 1, {width}), kind
+                ON CONFLICT(grain, user_id, bucket, kind) DO UPDATE SET
+                  n = event_rollups.n + excluded.n
+                """,
+                (hi,),
+            )
+        )
+    op.append(
+        (
+            "UPDATE rollup_state SET last_id = ? WHERE name='events' AND last_id < ?",
+            (hi, hi),
+        )
+    )
+    return op
+
+
+def high_water_mark() -> int:
+    rows = memory._query("SELECT last_id FROM rollup_state WHERE name='events'")
+    return rows[0][0] if rows else 0
+
+
+def _top_id() -> int:
+    if memory._engine().name != "postgres" or ROLLUP_LAG_S <= 0:
+        return memory._query("SELECT coalesce(max(id), 0) FROM events")[0][0]
+    cutoff = (memory._utc_now() - timedelta(seconds=ROLLUP_LAG_S)).isoformat()
+    # walks the primary key down from the newest id, past one lag's worth
+    rows = memory._query(
+        "SELECT id FROM events WHERE created_at < ? ORDER BY id DESC LIMIT 1",
+        (cutoff,),
+    )
+    return rows[0][0] if rows else 0
+
+
+def rollup(
+    batch: int = ROLLUP_BATCH, max_batches: Optional[int] = None
+) -> Dict[str, int]:
+    """Fold events above the high-water mark into event_rollups, ``batch`` ids
+    per transaction."""
+    memory.flush()  # async mode: count what was queued before the call
+    top = _top_id()
+    start = mark = high_water_mark()
+    batches = 0
+    while mark < top and (max_batches is None or batches < max_batches):
+        hi = min(top, mark + max(1, batch))
+        memory._submit(_rollup_op(hi)).result()
+        mark = high_water_mark()
+        batches += 1
+    return {"from_id": start, "to_id": mark, "batches": batches}
+
+
+def _archive_path(month: str, archive_dir: str) -> str:
+    return os.path.join(archive_dir, f"events-{month}.ndjson.gz")
+
+
+def _append_archive(rows: List[tuple], archive_dir: str) -> None:
+    by_month: Dict[str, List[str]] = {}
+    for id_, user_id, kind, payload, created_at in rows:
+        line = json.dumps(
+            {
+                "id": id_,
+                "user_id": user_id,
+                "kind": kind,
+                "payload": json.loads(payload) if payload else None,
+                "created_at": created_at,
+            },
+            separators=(",", ":"),
+        )
+        by_month.setdefault(created_at[:7], []).append(line)
+    os.makedirs(archive_dir, exist_ok=True)
+    for month, lines in by_month.items():
+        # appending adds a gzip member; readers see one concatenated stream
+        with open(_archive_path(month, archive_dir), "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                gz.write(("\n".join(lines) + "\n").encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def prune(
+    days: float = RETENTION_DAYS,
+    archive: bool = ARCHIVE,
+    archive_dir: str = ARCHIVE_DIR,
+    batch: int = ROLLUP_BATCH,
+) -> Dict[str, Any]:
+    """Archive, then delete, rolled-up events older than ``days``."""
+    if days <= 0:
+        return {"pruned": 0, "archived": 0}
+    cutoff = (memory._utc_now() - timedelta(days=days)).isoformat()
+    mark = high_water_mark()
+    after = pruned = 0
+    while True:
+        rows = memory._query(
+            "SELECT id, user_id, kind, payload, created_at FROM events"
+            " WHERE id > ? AND id <= ? AND created_at < ? ORDER BY id LIMIT ?",
+            (after, mark, cutoff, max(1, batch)),
+        )
+        if not rows:
+            break
+        if archive:
+            _append_archive(rows, archive_dir)
+        lo, hi = rows[0][0], rows[-1][0]
+        done = memory._submit(
+            [
+                (
+                    "DELETE FROM events WHERE id BETWEEN ? AND ? AND created_at < ?"
+                    " RETURNING id",
+                    (lo, hi, cutoff),
+                )
+            ]
+        )
+        pruned += len(done.result()[0])
+        after = hi
+    return {"pruned": pruned, "archived": pruned if archive else 0}
+
+
+def read_archive(month: str, archive_dir: str = ARCHIVE_DIR) -> List[Dict[str, Any]]:
+    path = _archive_path(month, archive_dir)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def query(
+    user_id: Optional[str] = None,
+    grain: str = "day",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    kind: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Counts per bucket and kind; ``since``/``until`` are ISO prefixes (inclusive).
+
+    Without ``user_id`` the counts are summed over all users.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {sorted(GRAINS)}")
+    where, params = ["grain = ?"], [grain]
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if since:
+        where.append("bucket >= ?")
+        params.append(since[: GRAINS[grain]])
+    if until:
+        where.append("bucket <= ?")
+        params.append(until[: GRAINS[grain]])
+    if kind:
+        where.append("kind = ?")
+        params.append(kind)
+    rows = memory._query(
+        f"SELECT bucket, kind, sum(n) FROM event_rollups WHERE {' AND '.join(where)}"
+        " GROUP BY bucket, kind ORDER BY bucket, kind",
+        tuple(params),
+    )
+    return [{"bucket": b, "kind": k, "n": int(n)} for (b, k, n) in rows]
+
+
+_WORKER: Optional[threading.Thread] = None
+_STOP = threading.Event()
+
+
+def start(interval_s: float = ROLLUP_INTERVAL_S) -> None:
+    """Roll up (and prune, if RETENTION_DAYS is set) every ``interval_s``."""
+    global _WORKER
+    if _WORKER is not None or interval_s <= 0:
+        return
+    _STOP.clear()
+
+    def loop() -> None:
+        while not _STOP.wait(interval_s):
+            try:
+                rollup()
+                prune()
+            except Exception:
+                pass  # next round picks up from the high-water mark
+
+    _WORKER = threading.Thread(target=loop, name="mother-rollups", daemon=True)
+    _WORKER.start()
+
+
+def stop() -> None:
+    global _WORKER
+    t, _WORKER = _WORKER, None
+    if t is not None:
+        _STOP.set()
+        t.join(5.0)
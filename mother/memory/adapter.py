@@ -4,13 +4,40 @@ import hashlib
 import json
 import os
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import psycopg
 from psycopg.rows import dict_row
 
-from .embedders import load_embedder
-from .sql import search_memory_sql, upsert_memory_sql
+from .batching import BatchingEmbedder
+from .cache import CachedEmbedder, RetrievalCache, cached, default_recall_cache
+from .embedders import Embedder, load_embedder
+from .index import (
+    IndexSpec,
+    ensure_index,
+    index_status,
+    rebuild_index,
+    resolve_iterative_scan,
+)
+from .pool import PoolConfig, SharedPool, shared_pool
+from .retention import AccessRecorder, RetentionWorker, shared_access_recorder
+from .sql import (
+    UPSERT_COLUMNS,
+    copy_stage_sql,
+    create_stage_sql,
+    hybrid_search_sql,
+    check_quant,
+    merge_stage_fp_sql,
+    merge_stage_sql,
+    search_memory_sql,
+    search_settings_sql,
+    upsert_dedupe_sql,
+    upsert_fp_many_sql,
+    upsert_fp_sql,
+    upsert_memory_many_sql,
+    upsert_memory_sql,
+)
+from .store import MemoryStore, store_from_env
 
 
 def _dsn_from_env() -> str:
@@ -30,20 +57,150 @@ def _pad_or_trunc(vec: List[float], dim: int) -> List[float]:
     return vec + [0.0] * (dim - len(vec))
 
 
+def _vec_literal(vec: List[float]) -> str:
+    # pgvector text input format, used by COPY where no list adaptation happens
+    return "[" + ",".join(repr(float(v)) for v in vec) + "]"
+
+
+def _parse_vec(text: str) -> List[float]:
+    # pgvector text output: "[0.1,0.2,...]"
+    return [float(x) for x in text.strip("[]").split(",") if x]
+
+
+def _many_params(rows: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for i, r in enumerate(rows.values()):
+        params.update({f"{c}_{i}": r[c] for c in UPSERT_COLUMNS})
+    return params
+
+
 @dataclass
 class MemoryAdapter:
     dsn: str | None = None
     metric: str = os.getenv("MEMORY_DISTANCE", "cosine")
     topk: int = int(os.getenv("MEMORY_TOPK", "50"))
+    # pooled=True shares one psycopg_pool per DSN across all adapters in the
+    # process instead of paying a TCP+auth handshake on every call
+    pooled: bool = os.getenv("MEMORY_POOL", "0") == "1"
+    pool_config: Optional[PoolConfig] = None
+    # pass an existing embedder to share one model between adapters
+    embedder: Optional[Embedder] = None
+    # defaults to the process-wide cache (MEMORY_RECALL_CACHE*)
+    recall_cache: Optional[RetrievalCache] = None
+    # ANN index DDL + per-query search breadth (MEMORY_INDEX*, MEMORY_HNSW_*)
+    index: Optional[IndexSpec] = None
+    # embedded backend instead of pgvector (MEMORY_BACKEND=local)
+    store: Optional[MemoryStore] = None
+    # retrieve() default: "vector", or "hybrid" (full-text/trigram + vector,
+    # fused by reciprocal rank); overridable per call
+    search_mode: str = os.getenv("MEMORY_SEARCH_MODE", "vector")
+    rrf_k: int = int(os.getenv("MEMORY_RRF_K", "60"))
+    hybrid_candidates: int = int(os.getenv("MEMORY_HYBRID_CANDIDATES", "100"))
+    # "halfvec": search the compact column, re-score limit * rescore_factor
+    # candidates against memory_item_fp (needs the 20251017 migration)
+    quant: str = os.getenv("MEMORY_QUANT", "none")
+    rescore_factor: int = int(os.getenv("MEMORY_RESCORE_FACTOR", "4"))
+    # retrieve hits feed the LRFU retention stats (batched, deferred writes;
+    # paused until the 20251018 migration has run)
+    track_access: bool = os.getenv("MEMORY_ACCESS_TRACKING", "1") != "0"
+    access: Optional[AccessRecorder] = None
+    # near-duplicate collapse: an upsert whose nearest row (same user and
+    # type) scores >= dedupe_threshold merges into it instead of inserting
+    dedupe: bool = os.getenv("MEMORY_DEDUPE", "0") == "1"
+    dedupe_threshold: float = float(os.getenv("MEMORY_DEDUPE_THRESHOLD", "0.92"))
+    dedupe_bump: float = float(os.getenv("MEMORY_DEDUPE_BUMP", "0.05"))
 
     def __post_init__(self) -> None:
         self.dsn = self.dsn or _dsn_from_env()
-        self.embedder = load_embedder()
+        # embeddings are content-addressed and cached (MEMORY_EMBED_CACHE*)
+        self.embedder = self.embedder or cached(load_embedder())
         self.dim = int(os.getenv("EMBEDDING_DIM", str(self.embedder.dim)))
+        self._pool: Optional[SharedPool] = None
+        if self.recall_cache is None:
+            self.recall_cache = default_recall_cache()
+        self.index = self.index or IndexSpec(metric=self.metric, quant=self.quant)
+        if self.index.metric != self.metric:
+            raise ValueError(
+                f"index metric {self.index.metric!r} != adapter metric {self.metric!r}"
+            )
+        if self.index.quant != check_quant(self.quant):
+            raise ValueError(
+                f"index quant {self.index.quant!r} != adapter quant {self.quant!r}"
+            )
+        if self.store is None:
+            self.store = store_from_env(self.dim, self.metric)
+        if self.access is None and self.track_access and self.store is None:
+            # flushes share the pool; unpooled, the recorder keeps its own
+            # connection open
+            self.access = shared_access_recorder(
+                self.dsn, self._connect if self.pooled else None
+            )
+        self._check_mode(self.search_mode)
 
     def _connect(self):
+        if self.pooled:
+            if self._pool is None:
+                self._pool = shared_pool(self.dsn, self.pool_config)
+            return self._pool.connection()
         return psycopg.connect(self.dsn, row_factory=dict_row)
 
+    def _admin_connect(self):
+        # CREATE/REINDEX ... CONCURRENTLY cannot run inside a transaction
+        return psycopg.connect(self.dsn, row_factory=dict_row, autocommit=True)
+
+    def ensure_index(self) -> Dict[str, Any]:
+        if self.store is not None:
+            return self.store_stats()
+        with self._admin_connect() as conn:
+            return ensure_index(conn, self.index)
+
+    def rebuild_index(self) -> Dict[str, Any]:
+        if self.store is not None:
+            return self.store_stats()
+        with self._admin_connect() as conn:
+            return rebuild_index(conn, self.index)
+
+    def index_status(self) -> Dict[str, Any]:
+        if self.store is not None:
+            return self.store_stats()
+        with self._admin_connect() as conn:
+            return index_status(conn, self.index)
+
+    def store_stats(self) -> Dict[str, Any]:
+        if self.store is None:
+            return {"backend": "pgvector"}
+        return self.store.stats()
+
+    def access_stats(self) -> Dict[str, Any]:
+        if self.access is None:
+            return {"enabled": False}
+        return self.access.stats()
+
+    def retention_worker(self, **kwargs: Any) -> RetentionWorker:
+        """LRFU eviction over memory_item; evictions drop cached recalls."""
+        if self.store is not None:
+            raise ValueError("retention needs the pgvector backend")
+        return RetentionWorker(self._connect, on_evict=self._invalidate, **kwargs)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        if not self.pooled:
+            return {"pooled": False}
+        if self._pool is None:
+            return {"pooled": True, "open": False}
+        return {"pooled": True, "open": True, **self._pool.stats()}
+
+    def embedder_stats(self) -> Dict[str, Any]:
+        """Stats of each embedder wrapper layer (cache, batching), outermost first."""
+        out: Dict[str, Any] = {"name": self.embedder.name, "dim": self.dim}
+        emb = self.embedder
+        while emb is not None:
+            if isinstance(emb, CachedEmbedder):
+                out["cache"] = emb.stats()
+            elif isinstance(emb, BatchingEmbedder):
+                out["batching"] = emb.stats()
+            emb = getattr(emb, "inner", None)
+        return out
+
     def _stable_id(self, user_id: str, text: str) -> str:
         h = hashlib.sha256(f"{user_id}\x1f{text}".encode("utf-8")).hexdigest()
         return h[:32]
@@ -58,28 +215,245 @@ class MemoryAdapter:
         payload: Optional[dict] = None,
         id_override: Optional[str] = None,
         confidence: float = 0.9,
+        dedupe: Optional[bool] = None,
     ) -> str:
+        """Write one item; returns its id, or the id it was merged into."""
         vid = id_override or self._stable_id(user_id, text)
         vec = _pad_or_trunc(self.embedder.embed(text), self.dim)
-        params = {
+        params = self._row_params(
+            vid, user_id, text, mtype, tags, pin, payload, confidence, vec
+        )
+        dedupe = self.dedupe if dedupe is None else dedupe
+        if self.store is not None:
+            if dedupe:
+                vid = self._store_dedupe([params])[vid]
+            else:
+                self.store.upsert_rows([params])
+        else:
+            with self._connect() as conn, conn.cursor() as cur:
+                if dedupe:
+                    vid = self._dedupe_rows(cur, [params])[vid]
+                else:
+                    for sql in self._upsert_sql():
+                        cur.execute(sql, params)
+                conn.commit()
+        self._invalidate([user_id])
+        return vid
+
+    def _row_params(
+        self,
+        vid: str,
+        user_id: str,
+        text: str,
+        mtype: str,
+        tags: Optional[list[str]],
+        pin: bool,
+        payload: Optional[dict],
+        confidence: float,
+        vec: List[float],
+    ) -> Dict[str, Any]:
+        return {
             "id": vid,
             "user_id": user_id,
             "type": mtype,
             "text": text,
             "tags": tags or [],
             "confidence": float(confidence),
-            "ttl_days": 0 if pin else int(os.getenv("MEMORY_TTL_DAYS", "0")),
+            "ttl_days": 0 if pin else int(os.getenv("MEMORY_TTL_DAYS", "90")),
             "retention_policy": os.getenv("MEMORY_RETENTION", "LRFU(21d)"),
             "embedding_model": self.embedder.name,
             "embedding_dim": self.dim,
             "embedding": vec,
             "payload": json.dumps(payload or {}),
         }
-        sql = upsert_memory_sql()
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        vecs = self.embedder.embed_batch(texts)
+        return [_pad_or_trunc(list(v), self.dim) for v in vecs]
+
+    def _chunk_rows(
+        self, ids: List[str], chunk: List[Dict[str, Any]], vecs: List[List[float]]
+    ) -> Dict[str, Dict[str, Any]]:
+        # last write wins for repeated ids, as with sequential upserts
+        rows: Dict[str, Dict[str, Any]] = {}
+        for vid, it, vec in zip(ids, chunk, vecs):
+            rows.pop(vid, None)
+            rows[vid] = self._row_params(
+                vid,
+                it["user_id"],
+                it["text"],
+                it.get("mtype") or it.get("type") or "autobio",
+                it.get("tags"),
+                bool(it.get("pin", False)),
+                it.get("payload"),
+                it.get("confidence", 0.9),
+                vec,
+            )
+        return rows
+
+    def _item_ids(self, items: List[Dict[str, Any]]) -> List[str]:
+        return [
+            it.get("id_override") or self._stable_id(it["user_id"], it["text"])
+            for it in items
+        ]
+
+    def upsert_many(
+        self,
+        items: Iterable[Dict[str, Any]],
+        *,
+        batch_size: int = int(os.getenv("MEMORY_UPSERT_BATCH", "500")),
+        copy: Optional[bool] = None,
+        reindex: Optional[bool] = None,
+        dedupe: Optional[bool] = None,
+    ) -> List[str]:
+        """Embed and write many items in a single transaction; returns ids.
+
+        Each item takes the keyword arguments of ``upsert`` (``type`` is
+        accepted as an alias for ``mtype``). Items are embedded and written in
+        chunks of ``batch_size`` using multi-row INSERT ... ON CONFLICT, or via
+        COPY into a temp staging table plus one merge when ``copy`` is set
+        (default: when there are at least MEMORY_COPY_THRESHOLD items).
+        ``reindex`` rebuilds the ANN index afterwards; it defaults to on for
+        COPY-sized loads unless MEMORY_INDEX_AUTO_REBUILD=0.
+        ``dedupe`` collapses near-duplicates as in ``upsert`` (not with COPY);
+        items merged into existing rows report the existing id.
+        """
+        items = list(items)
+        if not items:
+            return []
+        if copy is None:
+            copy = len(items) >= int(os.getenv("MEMORY_COPY_THRESHOLD", "5000"))
+        dedupe = (self.dedupe if dedupe is None else dedupe) and not copy
+        batch_size = max(1, batch_size)
+        ids = self._item_ids(items)
+        merged: Dict[str, str] = {}
+        if self.store is not None:
+            for lo in range(0, len(items), batch_size):
+                chunk = items[lo : lo + batch_size]
+                vecs = self._embed_many([it["text"] for it in chunk])
+                rows = self._chunk_rows(ids[lo : lo + batch_size], chunk, vecs)
+                if dedupe:
+                    merged.update(self._store_dedupe(list(rows.values())))
+                else:
+                    self.store.upsert_rows(list(rows.values()))
+            self._invalidate(it["user_id"] for it in items)
+            return [merged.get(i, i) for i in ids]
         with self._connect() as conn, conn.cursor() as cur:
-            cur.execute(sql, params)
+            if copy:
+                cur.execute(create_stage_sql())
+            for lo in range(0, len(items), batch_size):
+                chunk = items[lo : lo + batch_size]
+                vecs = self._embed_many([it["text"] for it in chunk])
+                rows = self._chunk_rows(ids[lo : lo + batch_size], chunk, vecs)
+                if copy:
+                    with cur.copy(copy_stage_sql()) as cp:
+                        for r in rows.values():
+                            r["embedding"] = _vec_literal(r["embedding"])
+                            cp.write_row([r[c] for c in UPSERT_COLUMNS])
+                    continue
+                if dedupe:
+                    merged.update(self._dedupe_rows(cur, list(rows.values())))
+                    continue
+                many = _many_params(rows)
+                for sql in self._upsert_many_sql(len(rows)):
+                    cur.execute(sql, many)
+            if copy:
+                for sql in self._merge_sql():
+                    cur.execute(sql)
             conn.commit()
-        return vid
+        self._invalidate(it["user_id"] for it in items)
+        if self._should_reindex(copy, reindex):
+            self.rebuild_index()
+        return [merged.get(i, i) for i in ids]
+
+    def _dedupe_params(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        # threshold is on the retrieve() score scale
+        t = self.dedupe_threshold
+        max_distance = 1.0 - t if self.metric == "cosine" else -t
+        return {**row, "max_distance": max_distance, "bump": self.dedupe_bump}
+
+    def _dedupe_rows(self, cur, rows: List[Dict[str, Any]]) -> Dict[str, str]:
+        # rows run in order, so later rows see (and can merge into) earlier
+        # ones; executemany pipelines them into one round-trip. The settings
+        # go on their own cursor: a result still pending on ``cur`` would be
+        # delivered as the first of executemany's result sets.
+        conn = cur.connection
+        with conn.pipeline():
+            conn.execute(
+                search_settings_sql(self.index.iterative), self.index.search_params()
+            )
+            cur.executemany(
+                upsert_dedupe_sql(self.metric, self.quant),
+                [self._dedupe_params(r) for r in rows],
+                returning=True,
+            )
+        out: Dict[str, str] = {}
+        for r in rows:
+            out[r["id"]] = cur.fetchone()["id"]
+            cur.nextset()
+        return out
+
+    def _store_dedupe(self, rows: List[Dict[str, Any]]) -> Dict[str, str]:
+        # as in upsert_dedupe_sql: an id that is already stored is a plain
+        # upsert, whatever its nearest neighbour
+        known = self.store.existing([r["id"] for r in rows])
+        out: Dict[str, str] = {}
+        for r in rows:
+            if r["id"] in known:
+                self.store.upsert_rows([r])
+                out[r["id"]] = r["id"]
+                continue
+            q = self._search_params(
+                r["user_id"],
+                r["embedding"],
+                1,
+                [r["type"]],
+                None,
+                mode="vector",
+                with_embeddings=True,
+            )
+            hits = self._scored(self.store.search(q, self.metric))
+            if hits and hits[0]["score"] >= self.dedupe_threshold:
+                self.store.upsert_rows([self._merged_row(hits[0], r)])
+                out[r["id"]] = hits[0]["id"]
+                continue
+            self.store.upsert_rows([r])
+            out[r["id"]] = r["id"]
+        return out
+
+    def _merged_row(self, hit: Dict[str, Any], row: Dict[str, Any]) -> Dict[str, Any]:
+        # same merge as upsert_dedupe_sql: existing text and vector stay
+        merged = {c: hit[c] for c in UPSERT_COLUMNS}
+        merged["tags"] = list(dict.fromkeys([*(hit["tags"] or []), *row["tags"]]))
+        merged["confidence"] = min(
+            1.0, max(hit["confidence"], row["confidence"]) + self.dedupe_bump
+        )
+        if 0 in (hit["ttl_days"], row["ttl_days"]):
+            merged["ttl_days"] = 0
+        else:
+            merged["ttl_days"] = max(hit["ttl_days"], row["ttl_days"])
+        merged["payload"] = json.dumps(
+            {**(hit["payload"] or {}), **json.loads(row["payload"])}
+        )
+        return merged
+
+    # quantized storage writes memory_item first, then memory_item_fp (FK)
+    def _upsert_sql(self) -> List[str]:
+        sqls = [upsert_memory_sql(quant=self.quant)]
+        return sqls if self.quant == "none" else sqls + [upsert_fp_sql()]
+
+    def _upsert_many_sql(self, n: int) -> List[str]:
+        sqls = [upsert_memory_many_sql(n, quant=self.quant)]
+        return sqls if self.quant == "none" else sqls + [upsert_fp_many_sql(n)]
+
+    def _merge_sql(self) -> List[str]:
+        sqls = [merge_stage_sql(quant=self.quant)]
+        return sqls if self.quant == "none" else sqls + [merge_stage_fp_sql()]
+
+    def _should_reindex(self, copied: bool, reindex: Optional[bool]) -> bool:
+        if reindex is None:
+            return copied and os.getenv("MEMORY_INDEX_AUTO_REBUILD", "1") != "0"
+        return reindex
 
     def retrieve(
         self,
@@ -88,31 +462,155 @@ class MemoryAdapter:
         limit: Optional[int] = None,
         types: Optional[list[str]] = None,
         tags: Optional[list[str]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        mode: Optional[str] = None,
+        with_embeddings: bool = False,
     ) -> list[dict]:
-        limit = int(limit or self.topk)
+        """Top-``limit`` memories for ``query``, best first.
+
+        ``mode="hybrid"`` fuses vector and lexical ranks (RRF); rows then also
+        carry ``rrf``, ``vec_rank`` and ``lex_rank`` and are ordered by ``rrf``
+        while ``score`` stays the vector similarity. ``with_embeddings`` adds
+        each row's stored ``embedding`` (list of floats), e.g. for MMR.
+        """
         qvec = _pad_or_trunc(self.embedder.embed(query), self.dim)
-        sql = search_memory_sql(metric=self.metric)
+        params = self._search_params(
+            user_id, qvec, limit, types, tags, query, mode, with_embeddings
+        )
+        sql = self._search_sql(params)
+        key, gen, hit = self._recall_lookup(params)
+        if hit is not None:
+            return self._touch(hit)
+        if self.store is not None:
+            rows = self.store.search(params, self.metric)
+            return self._recall_store(key, gen, self._scored(rows))
+        self._resolve_iterative()
+        settings = self.index.search_params(ef_search, probes, self._ann_limit(params))
+        with self._connect() as conn, conn.cursor() as cur:
+            # pipelined: the SET LOCAL knobs and the search share a round-trip
+            with conn.pipeline():
+                cur.execute(search_settings_sql(self.index.iterative), settings)
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+        return self._touch(
+            self._recall_store(key, gen, self._scored(rows, self._relaxed(params)))
+        )
+
+    def _resolve_iterative(self) -> None:
+        # "auto" iterative_scan needs the pgvector version; ensure_index()
+        # usually resolves it at startup, otherwise the first search does
+        if self.index.iterative_scan == "auto":
+            with self._connect() as conn, conn.cursor() as cur:
+                resolve_iterative_scan(cur, self.index)
+
+    def _ann_limit(self, params: Dict[str, Any]) -> int:
+        # rows the ANN scan must yield before the user/type filters apply
+        if params["mode"] == "hybrid":
+            return params["candidates"]
+        return params["rescore"] if self.quant != "none" else params["limit"]
+
+    def _touch(self, rows: list[dict]) -> list[dict]:
+        # cached hits count too; the recorder only buffers ids here
+        if self.access is not None:
+            self.access.record(r["id"] for r in rows)
+        return rows
+
+    def _recall_lookup(self, params: Dict[str, Any]):
+        cache = self.recall_cache
+        if cache is None:
+            return None, 0, None
+        key = cache.key(
+            params["user_id"],
+            params["query_vec"],
+            params["types"],
+            params["tags"],
+            params["limit"],
+            params["mode"],
+            params["with_embedding"],
+        )
+        # read the generation first so a concurrent write wins over our put
+        gen = cache.generation(params["user_id"])
+        return key, gen, cache.get(key)
+
+    def _recall_store(self, key, gen: int, rows: list[dict]) -> list[dict]:
+        if key is not None:
+            self.recall_cache.put(key, rows, gen)
+        return rows
+
+    def _invalidate(self, user_ids: Iterable[str]) -> None:
+        if self.recall_cache is not None:
+            for uid in set(user_ids):
+                self.recall_cache.invalidate_user(uid)
+
+    def recall_cache_stats(self) -> Dict[str, Any]:
+        if self.recall_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.recall_cache.stats()}
+
+    def _search_params(
+        self,
+        user_id: str,
+        qvec: List[float],
+        limit: Optional[int],
+        types: Optional[list[str]],
+        tags: Optional[list[str]],
+        query: str = "",
+        mode: Optional[str] = None,
+        with_embeddings: bool = False,
+    ) -> Dict[str, Any]:
+        # normalize optional params so ANY($n) sees arrays
+        if isinstance(types, str):
+            types = [types]
+        if isinstance(tags, str):
+            tags = [tags]
+        mode = self._check_mode(mode or self.search_mode)
         params = {
             "user_id": user_id,
             "query_vec": qvec,
-            "limit": limit,
+            "limit": int(limit or self.topk),
             "types": types,
             "tags": tags,
+            "mode": mode,
+            "with_embedding": bool(with_embeddings),
         }
-        with self._connect() as conn, conn.cursor() as cur:
-            # normalize optional params so ANY($n) sees arrays
-            if isinstance(types, str):
-                types = [types]
-            if isinstance(tags, str):
-                tags = [tags]
-            params["types"] = types
-            params["tags"] = tags
-            cur.execute(sql, params)
-            rows = cur.fetchall()
+        # quantized storage: candidates taken from the compact column
+        params["rescore"] = params["limit"] * max(1, self.rescore_factor)
+        if mode == "hybrid":
+            params["query_text"] = query
+            params["candidates"] = max(params["limit"], self.hybrid_candidates)
+            params["rrf_k"] = self.rrf_k
+        return params
+
+    @staticmethod
+    def _check_mode(mode: str) -> str:
+        if mode not in ("vector", "hybrid"):
+            raise ValueError(f"unknown search mode: {mode!r}")
+        return mode
+
+    def _search_sql(self, params: Dict[str, Any]) -> str:
+        build = hybrid_search_sql if params["mode"] == "hybrid" else search_memory_sql
+        return build(
+            metric=self.metric,
+            with_embedding=params["with_embedding"],
+            quant=self.quant,
+        )
+
+    def _relaxed(self, params: Dict[str, Any]) -> bool:
+        # relaxed_order iterative scans may return rows slightly out of order
+        return params["mode"] != "hybrid" and self.index.iterative_scan == (
+            "relaxed_order"
+        )
+
+    def _scored(self, rows: List[Dict[str, Any]], resort: bool = False) -> list[dict]:
         out = []
         for r in rows:
             d = float(r.pop("distance", 0.0))
             score = 1.0 - d if self.metric == "cosine" else -d
             r["score"] = score
+            if isinstance(r.get("embedding"), str):
+                r["embedding"] = _parse_vec(r["embedding"])
             out.append(r)
+        if resort:
+            out.sort(key=lambda r: r["score"], reverse=True)
         return out
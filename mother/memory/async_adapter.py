@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import psycopg
+from psycopg.rows import dict_row
+
+from .adapter import MemoryAdapter, _many_params, _pad_or_trunc, _vec_literal
+from .batching import BatchingEmbedder
+from .cache import CachedEmbedder
+from .pool import SharedAsyncPool, shared_async_pool
+from .sql import (
+    UPSERT_COLUMNS,
+    copy_stage_sql,
+    create_stage_sql,
+    search_settings_sql,
+    upsert_dedupe_sql,
+)
+
+
+@dataclass
+class AsyncMemoryAdapter(MemoryAdapter):
+    """MemoryAdapter for asyncio callers.
+
+    Database I/O goes through a shared psycopg AsyncConnectionPool (a fresh
+    AsyncConnection per call when ``pooled`` is off) and the CPU-bound
+    embedding runs in ``executor`` (default: the loop's thread pool), so
+    FastAPI endpoints never block the event loop. The sync methods
+    inherited from MemoryAdapter remain usable for scripts.
+    """
+
+    executor: Optional[Executor] = None
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        self._apool: Optional[SharedAsyncPool] = None
+
+    def _aconnect(self):
+        if not self.pooled:
+            return self._aconnect_once()
+        if self._apool is None:
+            self._apool = shared_async_pool(self.dsn, self.pool_config)
+        return self._apool.connection()
+
+    @asynccontextmanager
+    async def _aconnect_once(self) -> AsyncIterator[psycopg.AsyncConnection]:
+        conn = await psycopg.AsyncConnection.connect(self.dsn, row_factory=dict_row)
+        async with conn:
+            yield conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    def _batched(self) -> bool:
+        emb = self.embedder
+        if isinstance(emb, CachedEmbedder):
+            emb = emb.inner
+        return isinstance(emb, BatchingEmbedder)
+
+    async def aembed(self, text: str) -> List[float]:
+        # memory-tier cache hits skip the executor hop entirely; a batching
+        # embedder is awaited directly (its worker thread runs the model)
+        lookup = getattr(self.embedder, "lookup", None)
+        vec = lookup(text) if lookup else None
+        if vec is None:
+            if self._batched():
+                vec = await self.embedder.aembed(text)
+            else:
+                vec = await self._run(self.embedder.embed, text)
+        return _pad_or_trunc(list(vec), self.dim)
+
+    async def aupsert(
+        self,
+        user_id: str,
+        text: str,
+        mtype: str = "autobio",
+        tags: Optional[list[str]] = None,
+        pin: bool = False,
+        payload: Optional[dict] = None,
+        id_override: Optional[str] = None,
+        confidence: float = 0.9,
+        dedupe: Optional[bool] = None,
+    ) -> str:
+        vid = id_override or self._stable_id(user_id, text)
+        vec = await self.aembed(text)
+        params = self._row_params(
+            vid, user_id, text, mtype, tags, pin, payload, confidence, vec
+        )
+        dedupe = self.dedupe if dedupe is None else dedupe
+        if self.store is not None:
+            if dedupe:
+                vid = (await self._run(self._store_dedupe, [params]))[vid]
+            else:
+                await self._run(self.store.upsert_rows, [params])
+        else:
+            async with self._aconnect() as conn, conn.cursor() as cur:
+                if dedupe:
+                    vid = (await self._adedupe_rows(cur, [params]))[vid]
+                else:
+                    for sql in self._upsert_sql():
+                        await cur.execute(sql, params)
+                await conn.commit()
+        self._invalidate([user_id])
+        return vid
+
+    async def aupsert_many(
+        self,
+        items: Iterable[Dict[str, Any]],
+        *,
+        batch_size: int = int(os.getenv("MEMORY_UPSERT_BATCH", "500")),
+        copy: Optional[bool] = None,
+        reindex: Optional[bool] = None,
+        dedupe: Optional[bool] = None,
+    ) -> List[str]:
+        """Async ``upsert_many``; same chunking, one transaction."""
+        items = list(items)
+        if not items:
+            return []
+        if copy is None:
+            copy = len(items) >= int(os.getenv("MEMORY_COPY_THRESHOLD", "5000"))
+        batch_size = max(1, batch_size)
+        if self.store is not None:
+            # the embedded store is synchronous; keep it off the loop
+            return await self._run(
+                lambda: self.upsert_many(items, batch_size=batch_size, dedupe=dedupe)
+            )
+        dedupe = (self.dedupe if dedupe is None else dedupe) and not copy
+        ids = self._item_ids(items)
+        merged: Dict[str, str] = {}
+        async with self._aconnect() as conn, conn.cursor() as cur:
+            if copy:
+                await cur.execute(create_stage_sql())
+            for lo in range(0, len(items), batch_size):
+                chunk = items[lo : lo + batch_size]
+                vecs = await self._run(self._embed_many, [it["text"] for it in chunk])
+                rows = self._chunk_rows(ids[lo : lo + batch_size], chunk, vecs)
+                if copy:
+                    async with cur.copy(copy_stage_sql()) as cp:
+                        for r in rows.values():
+                            r["embedding"] = _vec_literal(r["embedding"])
+                            await cp.write_row([r[c] for c in UPSERT_COLUMNS])
+                    continue
+                if dedupe:
+                    merged.update(await self._adedupe_rows(cur, list(rows.values())))
+                    continue
+                many = _many_params(rows)
+                for sql in self._upsert_many_sql(len(rows)):
+                    await cur.execute(sql, many)
+            if copy:
+                for sql in self._merge_sql():
+                    await cur.execute(sql)
+            await conn.commit()
+        self._invalidate(it["user_id"] for it in items)
+        if self._should_reindex(copy, reindex):
+            await self._run(self.rebuild_index)
+        return [merged.get(i, i) for i in ids]
+
+    async def _adedupe_rows(self, cur, rows: List[Dict[str, Any]]) -> Dict[str, str]:
+        # settings on their own cursor, as in MemoryAdapter._dedupe_rows
+        conn = cur.connection
+        async with conn.pipeline():
+            await conn.execute(
+                search_settings_sql(self.index.iterative), self.index.search_params()
+            )
+            await cur.executemany(
+                upsert_dedupe_sql(self.metric, self.quant),
+                [self._dedupe_params(r) for r in rows],
+                returning=True,
+            )
+        out: Dict[str, str] = {}
+        for r in rows:
+            out[r["id"]] = (await cur.fetchone())["id"]
+            cur.nextset()
+        return out
+
+    async def aretrieve(
+        self,
+        user_id: str,
+        query: str,
+        limit: Optional[int] = None,
+        types: Optional[list[str]] = None,
+        tags: Optional[list[str]] = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        mode: Optional[str] = None,
+        with_embeddings: bool = False,
+    ) -> list[dict]:
+        qvec = await self.aembed(query)
+        params = self._search_params(
+            user_id, qvec, limit, types, tags, query, mode, with_embeddings
+        )
+        key, gen, hit = self._recall_lookup(params)
+        if hit is not None:
+            return self._touch(hit)
+        if self.store is not None:
+            rows = await self._run(self.store.search, params, self.metric)
+            return self._recall_store(key, gen, self._scored(rows))
+        if self.index.iterative_scan == "auto":
+            await self._run(self._resolve_iterative)
+        settings = self.index.search_params(ef_search, probes, self._ann_limit(params))
+        async with self._aconnect() as conn, conn.cursor() as cur:
+            async with conn.pipeline():
+                await cur.execute(search_settings_sql(self.index.iterative), settings)
+                await cur.execute(self._search_sql(params), params)
+                rows = await cur.fetchall()
+        return self._touch(
+            self._recall_store(key, gen, self._scored(rows, self._relaxed(params)))
+        )
+
+    def apool_stats(self) -> Dict[str, Any]:
+        if not self.pooled:
+            return {"pooled": False}
+        if self._apool is None:
+            return {"pooled": True, "open": False}
+        return {"pooled": True, "open": True, **self._apool.stats()}
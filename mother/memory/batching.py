@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+
+from .embedders import Embedder
+from .metrics import Counter, Histogram
+from .queues import STOP, gather
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class BatchingEmbedder:
+    """Coalesces concurrent ``embed`` calls into one ``inner.embed_batch`` call.
+
+    Callers from any thread enqueue texts and block on a per-text Future. A
+    single worker thread takes the first waiting request, keeps gathering
+    until ``max_batch`` texts are queued or ``max_wait_ms`` has passed, and
+    runs them through the model together. Calls that are already at least
+    ``max_batch`` long bypass the queue. After ``close`` every call raises.
+    """
+
+    def __init__(
+        self,
+        inner: Embedder,
+        max_batch: int = int(os.getenv("MEMORY_EMBED_BATCH_MAX", "32")),
+        max_wait_ms: float = float(os.getenv("MEMORY_EMBED_BATCH_WAIT_MS", "5")),
+    ):
+        self.inner = inner
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._q: "queue.Queue[object]" = queue.Queue()
+        self.batch_size = Histogram(BATCH_BUCKETS)
+        self.queue_ms = Histogram()
+        self.encode_ms = Histogram()
+        self.counts = Counter("texts", "batches", "bypass", "errors")
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="embed-batcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def dim(self) -> int:
+        return self.inner.dim
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("embedding batcher closed")
+
+    def submit(self, texts: Sequence[str]) -> List[Future]:
+        self._check_open()
+        now = time.perf_counter()
+        futs: List[Future] = []
+        for t in texts:
+            f: Future = Future()
+            self._q.put((t, f, now))
+            futs.append(f)
+        return futs
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit([text])[0].result()
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        if len(texts) >= self.max_batch:
+            self._check_open()
+            self.counts.inc("bypass")
+            return self.inner.embed_batch(texts)
+        return [f.result() for f in self.submit(texts)]
+
+    async def aembed(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit([text])[0])
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is STOP:
+                return
+            batch, stop = gather(self._q, first, self.max_batch, self.max_wait)
+            start = time.perf_counter()
+            for _, _, t_sub in batch:
+                self.queue_ms.observe((start - t_sub) * 1000.0)
+            live = [(t, f) for t, f, _ in batch if f.set_running_or_notify_cancel()]
+            if live:
+                try:
+                    vecs = self.inner.embed_batch([t for t, _ in live])
+                except BaseException as e:
+                    self.counts.inc("errors")
+                    for _, f in live:
+                        f.set_exception(e)
+                else:
+                    for (_, f), v in zip(live, vecs):
+                        f.set_result(list(v))
+                self.encode_ms.observe((time.perf_counter() - start) * 1000.0)
+                self.batch_size.observe(len(live))
+                self.counts.inc("batches")
+                self.counts.inc("texts", len(live))
+            if stop:
+                return
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **self.counts.snapshot(),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._q.qsize(),
+            "batch_size": self.batch_size.snapshot(),
+            "queue_ms": self.queue_ms.snapshot(),
+            "encode_ms": self.encode_ms.snapshot(),
+        }
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self._closed = True
+        self._q.put(STOP)
+        self._thread.join(timeout)
+        # fail anything that raced past the check and was enqueued after the
+        # stop marker, instead of hanging its caller
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                return
+            if item is not STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("embedding batcher closed"))
@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .embedders import Embedder
+from .metrics import Counter
+
+
+def embedding_key(name: str, dim: int, text: str) -> str:
+    """Content address of an embedding: (embedder name, dim, sha256(text))."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{name}\x1f{dim}\x1f{digest}"
+
+
+class EmbeddingCache:
+    """In-memory LRU tier over an optional on-disk sqlite tier.
+
+    Disk rows hold float32 blobs (pgvector stores float4 anyway) and are
+    evicted oldest-used-first once ``max_disk_entries`` is exceeded. Disk hits
+    are promoted into the memory tier. The memory tier keeps tuples and hands
+    out fresh lists, so callers may edit what they get back.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = int(os.getenv("MEMORY_EMBED_CACHE_SIZE", "4096")),
+        path: Optional[str] = os.getenv("MEMORY_EMBED_CACHE_PATH") or None,
+        max_disk_entries: int = int(
+            os.getenv("MEMORY_EMBED_CACHE_DISK_SIZE", "200000")
+        ),
+    ):
+        self.max_entries = max(0, max_entries)
+        self.max_disk_entries = max(0, max_disk_entries)
+        self.path = path
+        self._mem: OrderedDict[str, Tuple[float, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_rows = 0
+        self.counts = Counter(
+            "hits_mem", "hits_disk", "misses", "evictions_mem", "evictions_disk"
+        )
+        if path:
+            self._open_disk(path)
+
+    def _open_disk(self, path: str) -> None:
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL;")
+        db.execute("PRAGMA synchronous=NORMAL;")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                vec BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embedding_cache_used"
+            " ON embedding_cache(last_used)"
+        )
+        db.commit()
+        self._db = db
+        (self._disk_rows,) = db.execute(
+            "SELECT count(*) FROM embedding_cache"
+        ).fetchone()
+
+    def _remember(self, key: str, vec: Sequence[float]) -> None:
+        # caller holds the lock
+        if not self.max_entries:
+            return
+        self._mem[key] = tuple(vec)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.counts.inc("evictions_mem")
+
+    def peek(self, key: str) -> Optional[List[float]]:
+        """Memory-tier lookup only; never touches disk."""
+        with self._lock:
+            vec = self._mem.get(key)
+            if vec is not None:
+                self._mem.move_to_end(key)
+                self.counts.inc("hits_mem")
+                return list(vec)
+            return None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._db is not None
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        out: List[Optional[List[float]]] = [None] * len(keys)
+        disk_wanted: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._mem.get(k)
+                if vec is not None:
+                    self._mem.move_to_end(k)
+                    self.counts.inc("hits_mem")
+                    out[i] = list(vec)
+                else:
+                    disk_wanted.setdefault(k, []).append(i)
+            if disk_wanted and self._db is not None:
+                found = self._disk_get(list(disk_wanted))
+                for k, vec in found.items():
+                    self._remember(k, vec)
+                    for i in disk_wanted.pop(k):
+                        out[i] = list(vec)
+                    self.counts.inc("hits_disk")
+        self.counts.inc("misses", sum(len(v) for v in disk_wanted.values()))
+        return out
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        for lo in range(0, len(keys), 500):
+            part = keys[lo : lo + 500]
+            marks = ",".join("?" * len(part))
+            rows = self._db.execute(
+                f"SELECT key, vec FROM embedding_cache WHERE key IN ({marks})", part
+            ).fetchall()
+            for k, blob in rows:
+                a = array("f")
+                a.frombytes(blob)
+                found[k] = a.tolist()
+        if found:
+            now = time.time()
+            self._db.executemany(
+                "UPDATE embedding_cache SET last_used=? WHERE key=?",
+                [(now, k) for k in found],
+            )
+            self._db.commit()
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            for k, vec in items.items():
+                self._remember(k, vec)
+            if self._db is None or not self.max_disk_entries or not items:
+                return
+            now = time.time()
+            # keys are content addresses, so a stored vector never changes;
+            # rowcount is then exactly the number of new rows
+            added = self._db.executemany(
+                "INSERT OR IGNORE INTO embedding_cache(key, vec, last_used)"
+                " VALUES(?, ?, ?)",
+                [(k, array("f", v).tobytes(), now) for k, v in items.items()],
+            ).rowcount
+            if added < len(items):
+                self._db.executemany(
+                    "UPDATE embedding_cache SET last_used=? WHERE key=?",
+                    [(now, k) for k in items],
+                )
+            self._disk_rows += added
+            over = self._disk_rows - self.max_disk_entries
+            if over > 0:
+                # trim a little extra so eviction does not run on every put
+                n = over + self.max_disk_entries // 20
+                cur = self._db.execute(
+                    "DELETE FROM embedding_cache WHERE key IN ("
+                    " SELECT key FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                    (n,),
+                )
+                self.counts.inc("evictions_disk", cur.rowcount)
+                self._disk_rows = self._db.execute(
+                    "SELECT count(*) FROM embedding_cache"
+                ).fetchone()[0]
+            self._db.commit()
+
+    def stats(self) -> Dict[str, object]:
+        c = self.counts.snapshot()
+        lookups = c["hits_mem"] + c["hits_disk"] + c["misses"]
+        return {
+            **c,
+            "hit_rate": round((lookups - c["misses"]) / lookups, 4) if lookups else 0.0,
+            "mem_entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "disk_entries": self._disk_rows if self._db is not None else None,
+            "max_disk_entries": self.max_disk_entries if self._db is not None else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachedEmbedder:
+    """Embedder wrapper that consults an EmbeddingCache before the model."""
+
+    def __init__(self, inner: Embedder, cache: EmbeddingCache):
+        self.inner = inner
+        self.cache = cache
+
+    @property
+    def dim(self) -> int:
+        return self.inner.dim
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    def _key(self, text: str) -> str:
+        return embedding_key(self.inner.name, self.inner.dim, text)
+
+    def lookup(self, text: str) -> Optional[List[float]]:
+        return self.cache.peek(self._key(text))
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        out = self.cache.get_many(keys)
+        miss: Dict[str, int] = {}
+        for i, (k, v) in enumerate(zip(keys, out)):
+            if v is None and k not in miss:
+                miss[k] = i
+        if miss:
+            vecs = self.inner.embed_batch([texts[i] for i in miss.values()])
+            fresh = {k: list(v) for k, v in zip(miss, vecs)}
+            self.cache.put_many(fresh)
+            out = [v if v is not None else fresh[k] for k, v in zip(keys, out)]
+        return out
+
+    async def aembed(self, text: str) -> List[float]:
+        """``embed`` for event-loop callers over an async inner embedder
+        (BatchingEmbedder). The disk tier, if any, is read in a thread."""
+        key = self._key(text)
+        if self.cache.on_disk:
+            vec = (await asyncio.to_thread(self.cache.get_many, [key]))[0]
+        else:
+            vec = self.cache.get_many([key])[0]
+        if vec is None:
+            vec = list(await self.inner.aembed(text))
+            if self.cache.on_disk:
+                await asyncio.to_thread(self.cache.put_many, {key: vec})
+            else:
+                self.cache.put_many({key: vec})
+        return vec
+
+    def stats(self) -> Dict[str, object]:
+        return self.cache.stats()
+
+
+_DEFAULT_CACHE: Optional[EmbeddingCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_cache() -> EmbeddingCache:
+    """Process-wide cache so every adapter shares hits (e.g. the health probe)."""
+    global _DEFAULT_CACHE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_CACHE is None:
+            _DEFAULT_CACHE = EmbeddingCache()
+        return _DEFAULT_CACHE
+
+
+def cached(embedder: Embedder) -> Embedder:
+    """Wrap ``embedder`` with the default cache unless MEMORY_EMBED_CACHE=0."""
+    if os.getenv("MEMORY_EMBED_CACHE", "1") == "0" or isinstance(
+        embedder, CachedEmbedder
+    ):
+        return embedder
+    return CachedEmbedder(embedder, default_cache())
+
+
+class RetrievalCache:
+    """Per-user TTL + LRU cache of ``retrieve`` results.
+
+    Keys are (user_id, sha1 of the float32 query vector, types, tags, limit).
+    Every write for a user bumps that user's generation and drops their
+    entries; a lookup that started before the write cannot repopulate the
+    cache because ``put`` checks the generation it was handed. Invalidation is
+    per process, so with several workers the TTL bounds cross-worker staleness.
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = float(os.getenv("MEMORY_RECALL_CACHE_TTL", "30")),
+        max_entries: int = int(os.getenv("MEMORY_RECALL_CACHE_SIZE", "2048")),
+    ):
+        self.ttl_s = ttl_s
+        self.max_entries = max(0, max_entries)
+        self._lru: OrderedDict[tuple, Tuple[float, List[dict]]] = OrderedDict()
+        self._by_user: Dict[str, set] = {}
+        # per-user generations come from one global tick; when the map is
+        # trimmed, _floor stands in for every forgotten user so in-flight puts
+        # that predate the trim are still rejected
+        self._gen: Dict[str, int] = {}
+        self._tick = 0
+        self._floor = 0
+        self._lock = threading.Lock()
+        self.counts = Counter("hits", "misses", "expired", "evictions", "invalidations")
+
+    @staticmethod
+    def key(
+        user_id: str,
+        qvec: Sequence[float],
+        types: Optional[Sequence[str]],
+        tags: Optional[Sequence[str]],
+        limit: int,
+        mode: str = "vector",
+        embeddings: bool = False,
+    ) -> tuple:
+        h = hashlib.sha1(array("f", qvec).tobytes()).hexdigest()
+        return (
+            user_id,
+            h,
+            tuple(sorted(types)) if types else None,
+            tuple(sorted(tags)) if tags else None,
+            int(limit),
+            mode,
+            bool(embeddings),
+        )
+
+    def generation(self, user_id: str) -> int:
+        return self._gen.get(user_id, self._floor)
+
+    def _drop(self, key: tuple) -> None:
+        # caller holds the lock
+        self._lru.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def get(self, key: tuple) -> Optional[List[dict]]:
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is None:
+                self.counts.inc("misses")
+                return None
+            expires, rows = hit
+            if expires < time.monotonic():
+                self._drop(key)
+                self.counts.inc("expired")
+                self.counts.inc("misses")
+                return None
+            self._lru.move_to_end(key)
+            self.counts.inc("hits")
+        return [dict(r) for r in rows]
+
+    def put(self, key: tuple, rows: List[dict], generation: int) -> None:
+        if not self.max_entries or self.ttl_s <= 0:
+            return
+        with self._lock:
+            if self._gen.get(key[0], self._floor) != generation:
+                return
+            self._lru[key] = (time.monotonic() + self.ttl_s, [dict(r) for r in rows])
+            self._lru.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._lru) > self.max_entries:
+                old, _ = next(iter(self._lru.items()))
+                self._drop(old)
+                self.counts.inc("evictions")
+
+    def invalidate_user(self, user_id: str) -> None:
+        with self._lock:
+            self._tick += 1
+            self._gen[user_id] = self._tick
+            if len(self._gen) > max(1024, 4 * self.max_entries):
+                self._floor = self._tick
+                self._gen.clear()
+            for k in self._by_user.pop(user_id, ()):
+                self._lru.pop(k, None)
+            self.counts.inc("invalidations")
+
+    def stats(self) -> Dict[str, object]:
+        c = self.counts.snapshot()
+        lookups = c["hits"] + c["misses"]
+        return {
+            **c,
+            "hit_rate": round(c["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._lru),
+            "users": len(self._by_user),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+        }
+
+
+_DEFAULT_RECALL: Optional[RetrievalCache] = None
+
+
+def default_recall_cache() -> Optional[RetrievalCache]:
+    """Process-wide retrieval cache, or None when MEMORY_RECALL_CACHE=0."""
+    global _DEFAULT_RECALL
+    if os.getenv("MEMORY_RECALL_CACHE", "1") == "0":
+        return None
+    with _DEFAULT_LOCK:
+        if _DEFAULT_RECALL is None:
+            _DEFAULT_RECALL = RetrievalCache()
+        return _DEFAULT_RECALL
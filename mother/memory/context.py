@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# Context assembly for chat prompts: diversify recalled facts (MMR over the
+# stored embeddings), then pack facts and history into a token budget.
+
+# words, numbers and single punctuation marks; long words cost ~1 token per
+# 4 chars, which tracks BPE tokenizers closely enough for budgeting
+_PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+def approx_tokens(text: str) -> int:
+    return sum(1 + (len(p) - 1) // 4 for p in _PIECE.findall(text))
+
+
+def mmr(
+    rows: Sequence[Dict[str, Any]],
+    k: int,
+    lambda_: float = float(os.getenv("MEMORY_MMR_LAMBDA", "0.7")),
+) -> List[Dict[str, Any]]:
+    """Pick ``k`` rows by maximal marginal relevance.
+
+    Relevance is the row ``score`` min-max scaled to [0, 1]; redundancy is
+    the max cosine similarity of a row's ``embedding`` to those already
+    picked. ``lambda_=1`` is plain top-k. Rows without embeddings (or without
+    NumPy) keep their score order. ``embedding`` is dropped from the output.
+    """
+    rows = list(rows)
+    k = min(k, len(rows))
+    if k <= 0:
+        return []
+    if np is None or any(r.get("embedding") is None for r in rows):
+        picked = sorted(rows, key=lambda r: -float(r.get("score", 0.0)))[:k]
+    else:
+        v = np.asarray([r["embedding"] for r in rows], dtype=np.float32)
+        n = np.linalg.norm(v, axis=1, keepdims=True)
+        v = v / np.where(n > 0, n, 1.0)
+        sim = v @ v.T
+        rel = np.asarray([float(r.get("score", 0.0)) for r in rows])
+        span = rel.max() - rel.min()
+        rel = (rel - rel.min()) / span if span > 0 else np.ones_like(rel)
+        chosen = [int(np.argmax(rel))]
+        redundancy = sim[chosen[0]].copy()
+        free = np.ones(len(rows), dtype=bool)
+        free[chosen[0]] = False
+        while len(chosen) < k:
+            gain = lambda_ * rel - (1.0 - lambda_) * redundancy
+            gain[~free] = -np.inf
+            i = int(np.argmax(gain))
+            chosen.append(i)
+            free[i] = False
+            redundancy = np.maximum(redundancy, sim[i])
+        picked = [rows[i] for i in chosen]
+    return [{c: x for c, x in r.items() if c != "embedding"} for r in picked]
+
+
+@dataclass
+class ContextBudget:
+    total: int = int(os.getenv("MEMORY_CONTEXT_TOKENS", "3000"))
+    # cap for the facts section; history gets whatever is left
+    facts: int = int(os.getenv("MEMORY_CONTEXT_FACT_TOKENS", "800"))
+    history_turns: int = int(os.getenv("MEMORY_CONTEXT_HISTORY_TURNS", "10"))
+
+
+@dataclass
+class PackedContext:
+    facts: List[Dict[str, Any]]
+    history: List[Dict[str, str]]
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+def fact_line(fact: Dict[str, Any]) -> str:
+    return f"- {fact['text']}"
+
+
+def history_line(turn: Dict[str, str]) -> str:
+    return f"{turn['role'].title()}: {turn['content']}"
+
+
+def pack_context(
+    system: str,
+    user_msg: str,
+    facts: Sequence[Dict[str, Any]],
+    history: Sequence[Dict[str, str]],
+    budget: Optional[ContextBudget] = None,
+) -> PackedContext:
+    """Fit facts (in the given order) and recent history into ``budget``.
+
+    System prompt and user message are always kept. Facts are taken greedily
+    up to ``budget.facts``, skipping ones that do not fit; history is filled
+    newest-first from the remainder and returned in chronological order.
+    """
+    budget = budget or ContextBudget()
+    fixed_sys = approx_tokens(system)
+    fixed_user = approx_tokens(user_msg) + 2  # "User:" / "Assistant:" framing
+    left = max(0, budget.total - fixed_sys - fixed_user)
+
+    kept_facts: List[Dict[str, Any]] = []
+    fact_tokens = 0
+    fact_cap = min(budget.facts, left)
+    for f in facts:
+        t = approx_tokens(fact_line(f))
+        if fact_tokens + t <= fact_cap:
+            kept_facts.append(f)
+            fact_tokens += t
+    left -= fact_tokens
+
+    kept_hist: List[Dict[str, str]] = []
+    hist_tokens = 0
+    recent = list(history)[-budget.history_turns :] if budget.history_turns else []
+    for turn in reversed(recent):
+        t = approx_tokens(history_line(turn))
+        if hist_tokens + t > left:
+            break
+        kept_hist.append(turn)
+        hist_tokens += t
+    kept_hist.reverse()
+
+    return PackedContext(
+        facts=kept_facts,
+        history=kept_hist,
+        usage={
+            "system": fixed_sys,
+            "facts": fact_tokens,
+            "history": hist_tokens,
+            "user": fixed_user,
+            "total": fixed_sys + fact_tokens + hist_tokens + fixed_user,
+            "budget": budget.total,
+            "facts_dropped": len(facts) - len(kept_facts),
+            "history_dropped": len(history) - len(kept_hist),
+        },
+    )
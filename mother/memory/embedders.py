@@ -4,11 +4,18 @@ import hashlib
 import math
 import os
 from dataclasses import dataclass
-from typing import List, Protocol
+from functools import lru_cache
+from typing import List, Protocol, Sequence
+
+try:
+    import numpy as np
+except Exception:
+    np = None
 
 
 class Embedder(Protocol):
     def embed(self, text: str) -> List[float]: ...
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]: ...
     @property
     def dim(self) -> int: ...
     @property
@@ -31,15 +38,67 @@ class HashEmbedder:
         return self._name
 
     def embed(self, text: str) -> List[float]:
-        h = hashlib.sha256(text.encode("utf-8")).digest()
-        seed = int.from_bytes(h[:8], "big") or 1
-        vals = [0.0] * self._dim
-        x = seed
-        for i in range(self._dim):
-            x = (1103515245 * x + 12345) & ((1 << 63) - 1)
-            vals[i] = ((x % 1000003) / 500001.5) - 1.0
-        norm = math.sqrt(sum(v * v for v in vals)) or 1.0
-        return [v / norm for v in vals]
+        if np is None:
+            return _hash_embed_py(text, self._dim)
+        return _hash_embed_np([text], self._dim)[0].tolist()
+
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        if np is None:
+            return [_hash_embed_py(t, self._dim) for t in texts]
+        if not texts:
+            return []
+        return _hash_embed_np(texts, self._dim).tolist()
+
+
+_LCG_A = 1103515245
+_LCG_C = 12345
+_LCG_MASK = (1 << 63) - 1
+
+
+def _hash_seed(text: str) -> int:
+    h = hashlib.sha256(text.encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big") or 1
+
+
+def _hash_embed_py(text: str, dim: int) -> List[float]:
+    """Reference implementation: sequential LCG walk, one step per dimension."""
+    vals = [0.0] * dim
+    x = _hash_seed(text)
+    for i in range(dim):
+        x = (_LCG_A * x + _LCG_C) & _LCG_MASK
+        vals[i] = ((x % 1000003) / 500001.5) - 1.0
+    norm = math.sqrt(sum(v * v for v in vals)) or 1.0
+    return [v / norm for v in vals]
+
+
+@lru_cache(maxsize=8)
+def _lcg_jumps(dim: int):
+    # x_i = A_i * x_0 + C_i (mod 2^63): closed form of the i-th LCG step, so
+    # every dimension is computed independently instead of sequentially
+    a_i, c_i = [], []
+    a, c = 1, 0
+    for _ in range(dim):
+        a = (_LCG_A * a) & _LCG_MASK
+        c = (_LCG_A * c + _LCG_C) & _LCG_MASK
+        a_i.append(a)
+        c_i.append(c)
+    return np.array(a_i, dtype=np.uint64), np.array(c_i, dtype=np.uint64)
+
+
+def _hash_embed_np(texts: Sequence[str], dim: int):
+    """Vectorized ``_hash_embed_py`` for a batch; returns a (n, dim) float64 array.
+
+    uint64 arithmetic wraps mod 2^64, and masking to 63 bits afterwards gives
+    the same residue as the reference. The norm is accumulated left to right
+    (cumsum) like the reference ``sum`` so vectors match bit for bit.
+    """
+    a_i, c_i = _lcg_jumps(dim)
+    seeds = np.array([_hash_seed(t) for t in texts], dtype=np.uint64)[:, None]
+    x = (seeds * a_i + c_i) & np.uint64(_LCG_MASK)
+    vals = (x % np.uint64(1000003)).astype(np.float64) / 500001.5 - 1.0
+    norm = np.sqrt(np.cumsum(vals * vals, axis=1)[:, -1])
+    norm[norm == 0.0] = 1.0
+    return vals / norm[:, None]
 
 
 def load_embedder():
@@ -70,9 +129,18 @@ def load_embedder():
                 v = self._m.encode(text, normalize_embeddings=True)
                 return v.tolist() if hasattr(v, "tolist") else list(v)
 
+            def embed_batch(self, texts):
+                vs = self._m.encode(list(texts), normalize_embeddings=True)
+                return [v.tolist() if hasattr(v, "tolist") else list(v) for v in vs]
+
         probe = _ST(m, model_id, dim_env)
         v = probe.embed("probe")
         probe._dim = len(v) or dim_env
+        if os.getenv("MEMORY_EMBED_BATCHING", "1") != "0":
+            from .batching import BatchingEmbedder
+
+            # coalesce concurrent single-text calls into one encode(list)
+            return BatchingEmbedder(probe)
         return probe
     except Exception:
         return HashEmbedder(_dim=dim_env)
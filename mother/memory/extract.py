@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+from .metrics import Counter
+
+# Auto-remember candidate extraction for /chat. Each entry is (pattern, type,
+# tags, pin); a match's first group (or the whole match) is the fact.
+# Output order is: per text, per pattern, per match, first occurrence wins
+# (case-insensitively). Patterns may overlap (an IP inside a path is both), so
+# they cannot be folded into one alternation without changing results.
+PATTERNS: List[Tuple[re.Pattern, str, List[str], bool]] = [
+    # paths / repos
+    (
+        re.compile(r"(?:^|\b)(/+(?:home|root|mnt|srv|var|repos)[^\s]+)", re.I),
+        "autobio",
+        ["path"],
+        True,
+    ),
+    (
+        re.compile(r"\b(repo(?:sitory)? (?:root|path) is [^\n]+)", re.I),
+        "autobio",
+        ["repo", "path"],
+        True,
+    ),
+    # infra hosts / IP:port
+    (
+        re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d{2,5})?\b"),
+        "semantic",
+        ["ip"],
+        False,
+    ),
+    (
+        re.compile(r"\b([a-z0-9][-a-z0-9.]*\.[a-z]{2,})(?::\d{2,5})?\b", re.I),
+        "semantic",
+        ["host"],
+        False,
+    ),
+    (
+        re.compile(r"\bpostgres\b.*\b(10\.10\.10\.\d+:\d+)\b", re.I),
+        "semantic",
+        ["db", "infra"],
+        False,
+    ),
+]
+
+# per text; longer input is cut at the last whitespace before the limit
+MAX_CHARS = int(os.getenv("MEMORY_EXTRACT_MAX_CHARS", "65536"))
+# per call; on overrun the facts found so far are returned
+BUDGET_MS = float(os.getenv("MEMORY_EXTRACT_BUDGET_MS", "50"))
+
+# Equivalent forms of PATTERNS that start with a literal, so the regex engine
+# can skip ahead to candidate positions instead of trying every offset (the
+# leading \b moves into a lookbehind after the first character).
+_PATH = re.compile(r"(/(?<![^\w]/)/*(?:home|root|mnt|srv|var|repos)[^\s]+)", re.I)
+_REPO = re.compile(r"([rR](?<=\b[rR])(?i:epo(?:sitory)? (?:root|path) is )[^\n]+)")
+_IP = re.compile(r"\d(?<=\b\d)\d{0,2}(?:\.\d{1,3}){3}(?::\d{2,5})?\b")
+_HOST = PATTERNS[3][0]
+_HOST_TLD = re.compile(r"\.[a-z]{2}", re.I)  # in every host match
+_HOST_RUN = re.compile(r"[-a-z0-9.]*", re.I)
+_HOST_START = re.compile(r"\b[a-z0-9]", re.I)
+_PG = re.compile(r"[pP](?<=\b[pP])(?i:ostgres)\b")
+_PG_IP = re.compile(r"\b(10\.10\.10\.\d+:\d+)\b")
+
+stats = Counter("calls", "truncated", "over_budget")
+
+
+class _Deadline(Exception):
+    pass
+
+
+def _scan_regex(pat: re.Pattern) -> Callable[[str, Callable[[], None]], Iterator]:
+    # linear patterns: plain finditer
+    def scan(text: str, tick: Callable[[], None]) -> Iterator[str]:
+        for m in pat.finditer(text):
+            tick()
+            yield m.group(1) if m.groups() else m.group(0)
+
+    return scan
+
+
+def _scan_hosts(text: str, tick: Callable[[], None]) -> Iterator[str]:
+    # ``finditer`` retries the host pattern at every word boundary of a long
+    # [-a-z0-9.] run, each attempt scanning to the end of the run (quadratic
+    # on dashed/dotted log noise). A match lies within one run and contains a
+    # ".tld", so only runs holding the next ".tld" are tried. If the pattern
+    # fails at the first viable start of a run it fails at every later start
+    # too (a later match would also be a match from the earlier start), so a
+    # run costs one failed attempt at most.
+    pos, rev = 0, None
+    while True:
+        tick()
+        tld = _HOST_TLD.search(text, pos)
+        if tld is None:
+            return
+        if rev is None:
+            rev = text[::-1]
+        i = len(text) - tld.start()
+        first = max(pos, tld.start() - len(_HOST_RUN.match(rev, i).group()))
+        end = _HOST_RUN.match(text, tld.start()).end()
+        s = _HOST_START.search(text, first, end)
+        m = _HOST.match(text, s.start()) if s is not None else None
+        if m is None:
+            pos = end
+            continue
+        yield m.group(1)
+        pos = m.end()
+
+
+def _scan_postgres(text: str, tick: Callable[[], None]) -> Iterator[str]:
+    # ``.*`` after "postgres" runs to the end of the line and backtracks to the
+    # rightmost address; find that address directly from the right instead.
+    pos = 0
+    while True:
+        tick()
+        m = _PG.search(text, pos)
+        if m is None:
+            return
+        eol = text.find("\n", m.end())
+        eol = len(text) if eol < 0 else eol
+        hit = None
+        q = text.rfind("10.10.10.", m.end(), eol)
+        while q >= 0:
+            tick()
+            ip = _PG_IP.match(text, q)
+            if ip is not None and ip.end() <= eol:
+                hit = ip
+                break
+            q = text.rfind("10.10.10.", m.end(), q + 8)
+        if hit is None:
+            # a later "postgres" on this line sees a suffix of the same text
+            pos = eol + 1
+            continue
+        yield hit.group(1)
+        pos = hit.end()
+
+
+_SCANNERS = [
+    _scan_regex(_PATH),
+    _scan_regex(_REPO),
+    _scan_regex(_IP),
+    _scan_hosts,
+    _scan_postgres,
+]
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    stats.inc("truncated")
+    cut = max(text.rfind(" ", 0, max_chars), text.rfind("\n", 0, max_chars))
+    return text[: cut if cut > 0 else max_chars]
+
+
+def extract_candidate_facts(
+    *texts: str,
+    max_chars: int = MAX_CHARS,
+    budget_ms: Optional[float] = BUDGET_MS,
+) -> List[Tuple[str, str, List[str], bool]]:
+    """Return list of (text, type, tags, pin). Duplicates removed."""
+    stats.inc("calls")
+    deadline = None
+    if budget_ms is not None and budget_ms > 0:
+        deadline = time.perf_counter() + budget_ms / 1000.0
+    n = 0
+
+    def tick() -> None:
+        nonlocal n
+        n += 1
+        if deadline is not None and n % 64 == 0 and time.perf_counter() > deadline:
+            raise _Deadline
+
+    out: List[Tuple[str, str, List[str], bool]] = []
+    seen: Set[str] = set()
+    try:
+        for t in texts:
+            if not t:
+                continue
+            t = _clip(t, max_chars)
+            for scan, (_, typ, tags, pin) in zip(_SCANNERS, PATTERNS):
+                for fact in scan(t, tick):
+                    key = fact.strip().lower()
+                    if len(key) >= 4 and key not in seen:
+                        seen.add(key)
+                        out.append((fact.strip(), typ, tags, pin))
+    except _Deadline:
+        stats.inc("over_budget")
+    return out
+
+
+def extract_candidate_facts_legacy(
+    *texts: str,
+) -> List[Tuple[str, str, List[str], bool]]:
+    """The original finditer loop; reference for tests and the benchmark."""
+    out, seen = [], set()
+    for t in texts:
+        if not t:
+            continue
+        for pat, typ, tags, pin in PATTERNS:
+            for m in pat.finditer(t):
+                fact = m.group(1) if m.groups() else m.group(0)
+                key = fact.strip().lower()
+                if len(key) >= 4 and key not in seen:
+                    seen.add(key)
+                    out.append((fact.strip(), typ, tags, pin))
+    return out
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .sql import METRIC_OPS, TEXT_TSV, check_quant
+
+# ANN index lifecycle for memory_item.embedding (embedding_half when storage is
+# quantized). The adapter owns exactly one index named
+# idx_memory_embedding_<method>_<metric>[_half]; any other index with the
+# idx_memory_embedding_ prefix (e.g. the one from the initial migration) is
+# treated as stale and dropped by ensure_index().
+
+INDEX_PREFIX = "idx_memory_embedding_"
+
+# GIN indexes behind hybrid (lexical + vector) search. They live outside
+# INDEX_PREFIX, so switching ANN methods never drops them.
+LEXICAL_INDEXES = {
+    "idx_memory_text_tsv": f"USING gin ({TEXT_TSV})",
+    "idx_memory_text_trgm": "USING gin (text gin_trgm_ops)",
+}
+
+
+@dataclass
+class IndexSpec:
+    method: str = os.getenv("MEMORY_INDEX", "hnsw")  # hnsw | ivfflat | none
+    metric: str = os.getenv("MEMORY_DISTANCE", "cosine")
+    # build parameters
+    m: int = int(os.getenv("MEMORY_HNSW_M", "16"))
+    ef_construction: int = int(os.getenv("MEMORY_HNSW_EF_CONSTRUCTION", "64"))
+    lists: int = int(os.getenv("MEMORY_IVF_LISTS", "0"))  # 0 = size from rows
+    # search parameters, applied per query with SET LOCAL semantics
+    ef_search: int = int(os.getenv("MEMORY_HNSW_EF_SEARCH", "40"))
+    probes: int = int(os.getenv("MEMORY_IVF_PROBES", "10"))
+    # pgvector >= 0.8: keep scanning when filters (user_id/type) drop results
+    # (strict_order | relaxed_order | off). "auto" becomes relaxed_order once
+    # the installed version is known to be >= 0.8 and counts as off until
+    # then: older pgvector reserves the hnsw. GUC prefix, so setting an
+    # unknown hnsw.* knob fails there.
+    iterative_scan: str = os.getenv("MEMORY_ITERATIVE_SCAN", "auto")
+    # "halfvec": index memory_item.embedding_half (quantized storage)
+    quant: str = os.getenv("MEMORY_QUANT", "none")
+    # also manage the GIN indexes hybrid search needs
+    lexical: bool = os.getenv("MEMORY_LEXICAL_INDEX", "1") != "0"
+
+    def __post_init__(self) -> None:
+        if self.method not in ("hnsw", "ivfflat", "none"):
+            raise ValueError(f"unknown index method: {self.method!r}")
+        if self.metric not in METRIC_OPS:
+            raise ValueError(f"unknown distance metric: {self.metric!r}")
+        check_quant(self.quant)
+
+    @property
+    def iterative(self) -> bool:
+        return (self.iterative_scan or "off") not in ("off", "auto")
+
+    @property
+    def name(self) -> str:
+        suffix = "" if self.quant == "none" else "_half"
+        return f"{INDEX_PREFIX}{self.method}_{self.metric}{suffix}"
+
+    @property
+    def opclass(self) -> str:
+        ops = METRIC_OPS[self.metric][0]
+        return ops if self.quant == "none" else ops.replace("vector_", "halfvec_")
+
+    @property
+    def column(self) -> str:
+        return "embedding" if self.quant == "none" else "embedding_half"
+
+    def search_params(
+        self,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, str]:
+        """SET LOCAL values for one query.
+
+        ``limit`` is how many rows the ANN scan has to yield. The user/type
+        filters apply after the scan, which returns at most ``ef_search``
+        candidates (hnsw), so ef_search is raised to at least ``limit`` and
+        probes is scaled by the same ratio (ivfflat).
+        """
+        ef = int(ef_search or self.ef_search)
+        pr = int(probes or self.probes)
+        if limit and limit > ef:
+            pr = max(pr, math.ceil(pr * limit / ef))
+            ef = int(limit)
+        return {
+            "ef_search": str(ef),
+            "probes": str(pr),
+            "iterative_scan": self.iterative_scan if self.iterative else "off",
+        }
+
+
+def ivf_lists_for(rows: int) -> int:
+    # pgvector guidance: rows/1000 up to 1M rows, sqrt(rows) beyond
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def create_index_sql(
+    spec: IndexSpec,
+    rows: int = 0,
+    concurrently: bool = False,
+    name: Optional[str] = None,
+) -> str:
+    conc = "CONCURRENTLY " if concurrently else ""
+    if spec.method == "hnsw":
+        with_ = f"m = {int(spec.m)}, ef_construction = {int(spec.ef_construction)}"
+    else:
+        with_ = f"lists = {int(spec.lists or ivf_lists_for(rows))}"
+    return (
+        f"CREATE INDEX {conc}IF NOT EXISTS {name or spec.name} ON memory_item "
+        f"USING {spec.method} ({spec.column} {spec.opclass}) WITH ({with_})"
+    )
+
+
+def lexical_index_sql(name: str, concurrently: bool = False) -> str:
+    conc = "CONCURRENTLY " if concurrently else ""
+    using = LEXICAL_INDEXES[name]
+    return f"CREATE INDEX {conc}IF NOT EXISTS {name} ON memory_item {using}"
+
+
+def ensure_lexical_indexes(conn) -> List[str]:
+    """Create missing hybrid-search indexes (autocommit ``conn``)."""
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute(
+            "SELECT indexname FROM pg_indexes"
+            " WHERE tablename = 'memory_item' AND indexname = ANY (%s)",
+            (list(LEXICAL_INDEXES),),
+        )
+        rows = cur.fetchall()
+        have = {r["indexname"] if isinstance(r, dict) else r[0] for r in rows}
+        created = [n for n in LEXICAL_INDEXES if n not in have]
+        for n in created:
+            cur.execute(lexical_index_sql(n, concurrently=True))
+    return created
+
+
+def _managed_indexes(cur) -> List[str]:
+    cur.execute(
+        "SELECT indexname FROM pg_indexes"
+        " WHERE tablename = 'memory_item' AND indexname LIKE %s",
+        (INDEX_PREFIX.replace("_", r"\_") + "%",),
+    )
+    return [r["indexname"] if isinstance(r, dict) else r[0] for r in cur.fetchall()]
+
+
+def _row_estimate(cur) -> int:
+    cur.execute(
+        "SELECT reltuples::bigint AS n FROM pg_class WHERE relname = 'memory_item'"
+    )
+    r = cur.fetchone()
+    n = (r["n"] if isinstance(r, dict) else r[0]) if r else 0
+    if n is None or n < 0:  # never analyzed
+        cur.execute("SELECT count(*) AS n FROM memory_item")
+        r = cur.fetchone()
+        n = r["n"] if isinstance(r, dict) else r[0]
+    return int(n)
+
+
+def _pgvector_version(cur) -> tuple:
+    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    r = cur.fetchone()
+    v = (r["extversion"] if isinstance(r, dict) else r[0]) if r else "0"
+    return tuple(int(p) for p in re.findall(r"\d+", v)[:3])
+
+
+def resolve_iterative_scan(cur, spec: IndexSpec) -> tuple:
+    """Fit ``spec.iterative_scan`` to the installed pgvector; returns its version.
+
+    "auto" becomes relaxed_order on >= 0.8, and any iterative setting is
+    turned off on older versions, which do not know the knob.
+    """
+    version = _pgvector_version(cur)
+    if version < (0, 8):
+        spec.iterative_scan = "off"
+    elif spec.iterative_scan == "auto":
+        spec.iterative_scan = "relaxed_order"
+    return version
+
+
+def ensure_index(conn, spec: IndexSpec) -> Dict[str, Any]:
+    """Create the spec's index and drop other managed ones.
+
+    Runs the DDL CONCURRENTLY, so ``conn`` must be in autocommit mode.
+    ``spec.iterative_scan`` is resolved against the installed pgvector (see
+    resolve_iterative_scan).
+    """
+    with conn.cursor() as cur:
+        version = resolve_iterative_scan(cur, spec)
+        existing = _managed_indexes(cur)
+        dropped = [n for n in existing if n != spec.name]
+        created = False
+        if spec.method != "none" and spec.name not in existing:
+            cur.execute(create_index_sql(spec, _row_estimate(cur), concurrently=True))
+            created = True
+        for n in dropped:
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {n}")
+    out = {
+        "index": spec.name,
+        "created": created,
+        "dropped": dropped,
+        "pgvector": ".".join(map(str, version)),
+        "iterative_scan": spec.iterative_scan,
+    }
+    if spec.lexical:
+        out["lexical_created"] = ensure_lexical_indexes(conn)
+    return out
+
+
+def rebuild_index(conn, spec: IndexSpec) -> Dict[str, Any]:
+    """Rebuild after bulk loads (autocommit ``conn``, no write lock held).
+
+    IVFFlat centroids are trained at build time and lists depend on the row
+    count, so it is rebuilt from scratch with fresh sizing: built next to the
+    old index under a temporary name, then swapped in, so searches always
+    have an index. HNSW is reindexed in place.
+    """
+    if spec.method == "none":
+        return {"index": None, "rebuilt": False}
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE memory_item")
+        rows = _row_estimate(cur)
+        if spec.method == "ivfflat":
+            tmp = f"{spec.name}_rebuild"
+            # an interrupted CONCURRENTLY build leaves an invalid index behind
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {tmp}")
+            cur.execute(create_index_sql(spec, rows, concurrently=True, name=tmp))
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {spec.name}")
+            cur.execute(f"ALTER INDEX {tmp} RENAME TO {spec.name}")
+        else:
+            if spec.name not in _managed_indexes(cur):
+                cur.execute(create_index_sql(spec, rows, concurrently=True))
+            else:
+                cur.execute(f"REINDEX INDEX CONCURRENTLY {spec.name}")
+    return {"index": spec.name, "rebuilt": True, "rows": rows}
+
+
+def index_status(conn, spec: IndexSpec) -> Dict[str, Any]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT i.indexrelid::regclass::text AS name,"
+            " pg_relation_size(i.indexrelid) AS bytes, i.indisvalid AS valid,"
+            " pg_get_indexdef(i.indexrelid) AS definition"
+            " FROM pg_index i JOIN pg_class c ON c.oid = i.indrelid"
+            " WHERE c.relname = 'memory_item'"
+            " AND (i.indexrelid::regclass::text LIKE %s"
+            " OR i.indexrelid::regclass::text = ANY (%s))",
+            (INDEX_PREFIX.replace("_", r"\_") + "%", list(LEXICAL_INDEXES)),
+        )
+        found = cur.fetchall()
+        rows = _row_estimate(cur)
+    return {"spec": spec.__dict__, "rows": rows, "indexes": found}
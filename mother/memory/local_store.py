@@ -0,0 +1,492 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS store_meta (
+        k TEXT PRIMARY KEY,
+        v TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS memory_item (
+        slot             INTEGER PRIMARY KEY,
+        id               TEXT NOT NULL UNIQUE,
+        user_id          TEXT NOT NULL,
+        type             TEXT NOT NULL,
+        text             TEXT NOT NULL,
+        tags             TEXT NOT NULL DEFAULT '[]',
+        ts_created       TEXT NOT NULL,
+        ts_seen          TEXT NOT NULL,
+        confidence       REAL NOT NULL DEFAULT 0.9,
+        ttl_days         INTEGER NOT NULL DEFAULT 0,
+        retention_policy TEXT NOT NULL DEFAULT 'LRFU(21d)',
+        embedding_model  TEXT NOT NULL,
+        embedding_dim    INTEGER NOT NULL,
+        payload          TEXT NOT NULL DEFAULT '{}'
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_memory_user ON memory_item (user_id)",
+)
+
+_SCAN_BLOCK = 4096
+
+_TERM = re.compile(r"[^\s\"'(),;!?]+")
+
+_COLS = (
+    "id, user_id, type, text, tags, ts_created, ts_seen, confidence, ttl_days,"
+    " retention_policy, embedding_model, embedding_dim, payload"
+)
+
+_UPSERT = """
+    INSERT INTO memory_item (
+        slot, id, user_id, type, text, tags, ts_created, ts_seen, confidence,
+        ttl_days, retention_policy, embedding_model, embedding_dim, payload
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        user_id = excluded.user_id,
+        type = excluded.type,
+        text = excluded.text,
+        tags = excluded.tags,
+        confidence = excluded.confidence,
+        ttl_days = excluded.ttl_days,
+        retention_policy = excluded.retention_policy,
+        embedding_model = excluded.embedding_model,
+        embedding_dim = excluded.embedding_dim,
+        payload = excluded.payload,
+        ts_seen = excluded.ts_seen
+"""
+
+# rows that bring their own timestamps (import, re-embed) keep ts_created too
+_UPSERT_KEEP_TS = _UPSERT.rstrip() + ",\n        ts_created = excluded.ts_created\n"
+
+
+class LocalVectorStore:
+    """Embedded MemoryStore: memory-mapped vector matrix + sqlite metadata.
+
+    Row ``slot`` in ``meta.sqlite`` is the row index into ``vectors.<dtype>``,
+    a (capacity, dim) memmap that doubles as it fills. User/type codes, tag
+    sets and norms are mirrored in RAM so a query is a vectorized mask + one
+    matmul over the user's rows + argpartition top-k.
+
+    Compact dtypes (float16, int8 with a per-row scale in ``scales.float32``)
+    are searched first; the best ``rescore`` rows are then re-ranked against
+    full-precision copies in ``vectors.full.float32``, which is only touched
+    for those rows. Single-process: one writer per directory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        dtype: str = "float32",
+        initial_capacity: int = 1024,
+    ):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"unsupported dtype: {dtype!r}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.dim = int(dim)
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(
+            os.path.join(path, "meta.sqlite"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL;")
+        for stmt in _SCHEMA:
+            self._db.execute(stmt)
+        self._check_meta()
+        self._vec_path = os.path.join(path, f"vectors.{dtype}")
+        self.compact = self.dtype != np.float32
+        (n,) = self._db.execute(
+            "SELECT coalesce(max(slot) + 1, 0) FROM memory_item"
+        ).fetchone()
+        self._n = int(n)
+        self._cap = 0
+        self._mm: Optional[np.memmap] = None
+        self._full: Optional[np.memmap] = None  # compact dtypes only
+        self._scale: Optional[np.memmap] = None  # int8 only
+        self._user = np.zeros(0, dtype=np.int32)
+        self._type = np.zeros(0, dtype=np.int16)
+        self._norm = np.zeros(0, dtype=np.float32)
+        self._tags: List[frozenset] = []
+        self._text: List[str] = []  # casefolded, for hybrid lexical matching
+        self._user_codes: Dict[str, int] = {}
+        self._type_codes: Dict[str, int] = {}
+        self._grow(max(initial_capacity, self._n))
+        self._load()
+
+    def _check_meta(self) -> None:
+        meta = dict(self._db.execute("SELECT k, v FROM store_meta").fetchall())
+        want = {"dim": str(self.dim), "dtype": self.dtype.name}
+        if not meta:
+            self._db.executemany(
+                "INSERT INTO store_meta(k, v) VALUES(?, ?)", list(want.items())
+            )
+            self._db.commit()
+            return
+        for k, v in want.items():
+            if meta.get(k) != v:
+                raise ValueError(
+                    f"{self.path}: store was created with {k}={meta.get(k)}, not {v}"
+                )
+
+    def _grow(self, need: int) -> None:
+        if need <= self._cap:
+            return
+        cap = max(need, self._cap * 2, 1)
+        self._flush()
+        self._mm = self._open(self._vec_path, self.dtype, (cap, self.dim))
+        if self.compact:
+            full = os.path.join(self.path, "vectors.full.float32")
+            self._full = self._open(full, np.dtype(np.float32), (cap, self.dim))
+        if self.dtype == np.int8:
+            scales = os.path.join(self.path, "scales.float32")
+            self._scale = self._open(scales, np.dtype(np.float32), (cap,))
+        pad = cap - self._cap
+        self._user = np.concatenate([self._user, np.full(pad, -1, np.int32)])
+        self._type = np.concatenate([self._type, np.full(pad, -1, np.int16)])
+        self._norm = np.concatenate([self._norm, np.zeros(pad, np.float32)])
+        self._tags.extend([frozenset()] * pad)
+        self._text.extend([""] * pad)
+        self._cap = cap
+
+    @staticmethod
+    def _open(path: str, dtype: np.dtype, shape: tuple) -> np.memmap:
+        size = int(np.prod(shape)) * dtype.itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _flush(self) -> None:
+        for mm in (self._mm, self._full, self._scale):
+            if mm is not None:
+                mm.flush()
+
+    def _rows(self, slots: np.ndarray) -> np.ndarray:
+        """Vectors as searched (dequantized compact copies), float32."""
+        v = np.asarray(self._mm[slots], dtype=np.float32)
+        if self._scale is not None:
+            v *= np.asarray(self._scale[slots], dtype=np.float32)[:, None]
+        return v
+
+    def _scan(self, idx: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """q . row for the searched rows, in cache-sized blocks.
+
+        A contiguous slot range is read as memmap slices (no gather copy) and
+        compact blocks are widened to float32 one block at a time.
+        """
+        out = np.empty(idx.size, dtype=np.float32)
+        run = idx.size > 0 and int(idx[-1]) - int(idx[0]) + 1 == idx.size
+        for lo in range(0, idx.size, _SCAN_BLOCK):
+            hi = min(lo + _SCAN_BLOCK, idx.size)
+            if run:
+                blk = self._mm[int(idx[0]) + lo : int(idx[0]) + hi]
+            else:
+                blk = self._mm[idx[lo:hi]]
+            out[lo:hi] = blk.astype(np.float32, copy=False) @ q
+        if self._scale is not None:
+            out *= self._scale[idx]
+        return out
+
+    def _exact(self, slots: np.ndarray) -> np.ndarray:
+        src = self._full if self.compact else self._mm
+        return np.asarray(src[slots], dtype=np.float32)
+
+    def _write_vec(self, slot: int, vec: np.ndarray) -> None:
+        full = np.zeros(self.dim, dtype=np.float32)
+        full[: len(vec)] = vec[: self.dim]
+        if self._full is not None:
+            self._full[slot] = full
+        if self.dtype == np.int8:
+            peak = float(np.abs(full).max())
+            scale = peak / 127.0 if peak > 0 else 1.0
+            self._scale[slot] = scale
+            self._mm[slot] = np.clip(np.rint(full / scale), -127, 127)
+        else:
+            self._mm[slot] = full
+        self._norm[slot] = np.linalg.norm(self._rows(np.asarray([slot]))[0])
+
+    def _code(self, table: Dict[str, int], value: str) -> int:
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(table)
+        return code
+
+    def _load(self) -> None:
+        rows = self._db.execute(
+            "SELECT slot, user_id, type, tags, text FROM memory_item"
+        )
+        for slot, user_id, mtype, tags, text in rows:
+            self._index(slot, user_id, mtype, json.loads(tags), text)
+        # chunked so reopening a large store never dequantizes it all at once
+        for lo in range(0, self._n, 65536):
+            part = np.arange(lo, min(lo + 65536, self._n))
+            self._norm[part] = np.linalg.norm(self._rows(part), axis=1)
+
+    def _index(
+        self, slot: int, user_id: str, mtype: str, tags: Sequence[str], text: str
+    ) -> None:
+        self._user[slot] = self._code(self._user_codes, user_id)
+        self._type[slot] = self._code(self._type_codes, mtype)
+        self._tags[slot] = frozenset(tags or ())
+        self._text[slot] = text.casefold()
+
+    def _slots(self, ids: Sequence[str]) -> Dict[str, int]:
+        slots: Dict[str, int] = {}
+        for lo in range(0, len(ids), 500):
+            part = list(ids[lo : lo + 500])
+            marks = ",".join("?" * len(part))
+            slots.update(
+                self._db.execute(
+                    f"SELECT id, slot FROM memory_item WHERE id IN ({marks})", part
+                ).fetchall()
+            )
+        return slots
+
+    def existing(self, ids: Sequence[str]) -> Set[str]:
+        with self._lock:
+            return set(self._slots(ids))
+
+    def upsert_rows(self, rows: Sequence[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            slots = self._slots([r["id"] for r in rows])
+            params, kept = [], []
+            for r in rows:
+                slot = slots.get(r["id"])
+                if slot is None:
+                    slot = slots[r["id"]] = self._n
+                    self._n += 1
+                    self._grow(self._n)
+                self._write_vec(slot, np.asarray(r["embedding"], dtype=np.float32))
+                # a reused id moves to the new user/type: the codes the
+                # search mask reads and the stored row change together
+                self._index(slot, r["user_id"], r["type"], r["tags"], r["text"])
+                created, seen = _ts(r.get("ts_created")), _ts(r.get("ts_seen"))
+                (kept if created else params).append(
+                    (
+                        slot,
+                        r["id"],
+                        r["user_id"],
+                        r["type"],
+                        r["text"],
+                        json.dumps(list(r["tags"] or [])),
+                        created or now,
+                        seen or created or now,
+                        float(r["confidence"]),
+                        int(r["ttl_days"]),
+                        r["retention_policy"],
+                        r["embedding_model"],
+                        int(r["embedding_dim"]),
+                        (
+                            r["payload"]
+                            if isinstance(r["payload"], str)
+                            else json.dumps(r["payload"] or {})
+                        ),
+                    )
+                )
+            # vectors hit the file before the metadata that points at them
+            self._flush()
+            self._db.executemany(_UPSERT, params)
+            self._db.executemany(_UPSERT_KEEP_TS, kept)
+            self._db.commit()
+
+    def _candidates(self, params: Dict[str, Any]) -> np.ndarray:
+        ucode = self._user_codes.get(params["user_id"])
+        if ucode is None:
+            return np.zeros(0, dtype=np.int64)
+        n = self._n
+        mask = self._user[:n] == ucode
+        if params.get("types"):
+            codes = [
+                self._type_codes[t] for t in params["types"] if t in self._type_codes
+            ]
+            mask &= np.isin(self._type[:n], codes)
+        idx = np.flatnonzero(mask)
+        if params.get("tags") and idx.size:
+            want = set(params["tags"])
+            keep = np.fromiter(
+                (not want.isdisjoint(self._tags[i]) for i in idx), bool, idx.size
+            )
+            idx = idx[keep]
+        return idx
+
+    def _distances(
+        self, idx: np.ndarray, q: np.ndarray, metric: str, exact: bool = False
+    ) -> np.ndarray:
+        if exact:
+            v = self._exact(idx)
+            norm = np.linalg.norm(v, axis=1)
+            dots = v @ q
+        else:
+            norm = self._norm[idx]
+            dots = self._scan(idx, q)
+        if metric == "cosine":
+            denom = norm * float(np.linalg.norm(q))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                d = 1.0 - np.where(denom > 0, dots / denom, 0.0)
+            return d
+        if metric == "l2":
+            sq = norm**2 - 2.0 * dots + float(q @ q)
+            return np.sqrt(np.maximum(sq, 0.0))
+        if metric == "ip":
+            return -dots
+        raise ValueError(f"unknown distance metric: {metric!r}")
+
+    def _lexical(self, idx: np.ndarray, query: str) -> np.ndarray:
+        # stand-in for the full-text/trigram side: query terms found verbatim
+        terms = set(_TERM.findall(query.casefold()))
+        return np.fromiter(
+            (sum(t in self._text[i] for t in terms) for i in idx), np.float32, idx.size
+        )
+
+    def _fuse(self, idx: np.ndarray, d: np.ndarray, params: Dict[str, Any]):
+        """RRF over the vector and lexical rankings, as in hybrid_search_sql."""
+        c = int(params["candidates"])
+        k0 = float(params["rrf_k"])
+        rrf = np.zeros(d.size)
+        vec_rank = np.zeros(d.size, dtype=np.int64)
+        lex_rank = np.zeros(d.size, dtype=np.int64)
+        vorder = np.argsort(d, kind="stable")[:c]
+        lex = self._lexical(idx, params["query_text"])
+        lorder = np.argsort(-lex, kind="stable")[: min(c, int((lex > 0).sum()))]
+        for order, ranks in ((vorder, vec_rank), (lorder, lex_rank)):
+            ranks[order] = np.arange(1, order.size + 1)
+            rrf[order] += 1.0 / (k0 + ranks[order])
+        hit = np.flatnonzero(rrf)
+        top = hit[np.lexsort((d[hit], -rrf[hit]))][: int(params["limit"])]
+        extra = [
+            {
+                "rrf": float(rrf[i]),
+                "vec_rank": int(vec_rank[i]) or None,
+                "lex_rank": int(lex_rank[i]) or None,
+            }
+            for i in top
+        ]
+        return top, extra
+
+    def search(self, params: Dict[str, Any], metric: str) -> List[Dict[str, Any]]:
+        q = np.zeros(self.dim, dtype=np.float32)
+        qv = np.asarray(params["query_vec"], dtype=np.float32)[: self.dim]
+        q[: len(qv)] = qv
+        with self._lock:
+            idx = self._candidates(params)
+            if idx.size == 0:
+                return []
+            d = self._distances(idx, q, metric)
+            if params.get("mode") == "hybrid":
+                top, extra = self._fuse(idx, d, params)
+            else:
+                k = int(params["limit"])
+                if self.compact:
+                    # approximate pass picks candidates, full precision orders them
+                    cand = _topk(d, max(k, int(params.get("rescore") or 4 * k)))
+                    d = d.copy()
+                    d[cand] = self._distances(idx[cand], q, metric, exact=True)
+                    top = cand[_topk(d[cand], k)]
+                else:
+                    top = _topk(d, k)
+                extra = [{}] * top.size
+            if self.compact and params.get("mode") == "hybrid":
+                d = d.copy()
+                d[top] = self._distances(idx[top], q, metric, exact=True)
+            slots = idx[top].tolist()
+            dist = d[top].tolist()
+            if params.get("with_embedding"):
+                vecs = self._exact(idx[top]).tolist()
+                extra = [{**e, "embedding": v} for e, v in zip(extra, vecs)]
+            marks = ",".join("?" * len(slots))
+            found = {
+                row[0]: row[1:]
+                for row in self._db.execute(
+                    f"SELECT slot, {_COLS} FROM memory_item WHERE slot IN ({marks})",
+                    slots,
+                )
+            }
+        out = []
+        for slot, dd, more in zip(slots, dist, extra):
+            r = _decode(found[slot])
+            r["distance"] = float(dd)
+            r.update(more)
+            out.append(r)
+        return out
+
+    def scan(
+        self, after: str, limit: int, user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Up to ``limit`` rows with id > ``after``, in id order, each with its
+        full-precision ``embedding``. Keyset pages for export / re-embedding."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT slot, {_COLS} FROM memory_item"
+                " WHERE id > ? AND (? IS NULL OR user_id = ?)"
+                " ORDER BY id LIMIT ?",
+                (after, user_id, user_id, int(limit)),
+            ).fetchall()
+            slots = np.asarray([r[0] for r in rows], dtype=np.int64)
+            vecs = self._exact(slots).tolist() if rows else []
+        out = []
+        for row, vec in zip(rows, vecs):
+            r = _decode(row[1:])
+            r["embedding"] = vec
+            out.append(r)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "path": self.path,
+            "rows": self._n,
+            "capacity": self._cap,
+            "dtype": self.dtype.name,
+            "vector_bytes": self._cap * self.dim * self.dtype.itemsize,
+            "full_bytes": self._cap * self.dim * 4 if self.compact else 0,
+            "users": len(self._user_codes),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._mm = self._full = self._scale = None
+            self._db.close()
+
+
+_NAMES = [c.strip() for c in _COLS.split(",")]
+
+
+def _ts(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value or None
+
+
+def _decode(values: Sequence[Any]) -> Dict[str, Any]:
+    r = dict(zip(_NAMES, values))
+    r["tags"] = json.loads(r["tags"])
+    r["payload"] = json.loads(r["payload"])
+    r["ts_created"] = datetime.fromisoformat(r["ts_created"])
+    r["ts_seen"] = datetime.fromisoformat(r["ts_seen"])
+    return r
+
+
+def _topk(d: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the ``k`` smallest values of ``d``, ascending (stable)."""
+    k = min(k, d.size)
+    if k < d.size:
+        part = np.argpartition(d, k - 1)[:k]
+    else:
+        part = np.arange(d.size)
+    return part[np.argsort(d[part], kind="stable")]
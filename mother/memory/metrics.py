@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, Sequence
+
+# Lightweight in-process metrics for the memory stack. No exporter dependency:
+# snapshots are plain dicts meant to be served from a diagnostics endpoint.
+
+MS_BUCKETS: tuple[float, ...] = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram; cumulative counts are computed on snapshot."""
+
+    def __init__(self, buckets: Sequence[float] = MS_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._n = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        v = float(value)
+        i = 0
+        for i, b in enumerate(self.buckets):
+            if v <= b:
+                break
+        else:
+            i = len(self.buckets)
+        with self._lock:
+            self._counts[i] += 1
+            self._n += 1
+            self._sum += v
+            if v > self._max:
+                self._max = v
+
+    def _quantile(self, counts: list[int], n: int, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation
+        target = q * n
+        acc = 0
+        for i, c in enumerate(counts):
+            acc += c
+            if acc >= target:
+                return self.buckets[i] if i < len(self.buckets) else self._max
+        return self._max
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counts = list(self._counts)
+            n, total, vmax = self._n, self._sum, self._max
+        out: Dict[str, object] = {
+            "count": n,
+            "sum": round(total, 3),
+            "mean": round(total / n, 3) if n else 0.0,
+            "max": round(vmax, 3),
+        }
+        if n:
+            for q in (0.5, 0.95, 0.99):
+                out[f"p{int(q * 100)}"] = self._quantile(counts, n, q)
+        acc = 0
+        le: Dict[str, int] = {}
+        for b, c in zip(self.buckets, counts):
+            acc += c
+            le[f"{b:g}"] = acc
+        le["+Inf"] = n
+        out["le"] = le
+        return out
+
+
+class Counter:
+    """Thread-safe monotonically increasing counters keyed by name."""
+
+    def __init__(self, *names: str):
+        self._v: Dict[str, int] = {n: 0 for n in names}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._v[name] = self._v.get(name, 0) + n
+
+    def get(self, name: str) -> int:
+        return self._v.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._v)
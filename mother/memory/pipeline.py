@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .metrics import Counter, Histogram
+from .queues import STOP, gather
+
+try:
+    import fcntl
+except ImportError:  # Windows: the journal is only safe within one process
+    fcntl = None
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+Item = Dict[str, Any]
+
+
+class RememberPipeline:
+    """Background writer for ``remember_many``-shaped items.
+
+    ``submit`` assigns each item its final id (``id_fn``), queues it and
+    returns at once. Worker threads gather items across requests into batches
+    of up to ``max_batch`` (waiting at most ``max_wait_ms``) and hand them to
+    ``sink``, retrying failures with backoff. Delivery is at-least-once, which
+    is safe because upserts are keyed by those ids:
+      * a full queue, a batch that keeps failing, and whatever is queued or in
+        flight at ``close`` are appended to ``journal`` (NDJSON, fsync'd);
+      * on start, worker 0 replays the journal while the other workers wait,
+        so queued items are written after the older journaled ones.
+    Processes may share one journal: appends and the hand-over to a replay
+    take ``journal.lock`` (flock), and each replay file is flock'd by the
+    process replaying it, so an orphaned one is picked up exactly once.
+    Unreadable lines are counted as errors and skipped.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[Item]], Any],
+        id_fn: Callable[[str, str], str],
+        *,
+        workers: int = int(os.getenv("MEMORY_PIPELINE_WORKERS", "2")),
+        max_queue: int = int(os.getenv("MEMORY_PIPELINE_QUEUE", "10000")),
+        max_batch: int = int(os.getenv("MEMORY_PIPELINE_BATCH", "64")),
+        max_wait_ms: float = float(os.getenv("MEMORY_PIPELINE_WAIT_MS", "20")),
+        max_retries: int = int(os.getenv("MEMORY_PIPELINE_RETRIES", "5")),
+        journal: Optional[str] = os.getenv(
+            "MEMORY_PIPELINE_JOURNAL", "data/memory/remember.journal"
+        ),
+    ):
+        self.sink = sink
+        self.id_fn = id_fn
+        self.max_queue = max(1, max_queue)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_retries = max(0, max_retries)
+        self.journal = journal
+        # unbounded underneath so stop markers never block; submit enforces
+        # max_queue
+        self._q: "queue.Queue[object]" = queue.Queue()
+        self._journal_lock = threading.Lock()
+        self._inflight: Dict[int, List[Item]] = {}
+        self._inflight_lock = threading.Lock()
+        self._pending = 0  # queued + in flight, for flush()
+        self._closing = threading.Event()
+        self._replayed = threading.Event()
+        self.batch_size = Histogram(BATCH_BUCKETS)
+        self.queue_ms = Histogram()
+        self.write_ms = Histogram()
+        self.counts = Counter(
+            "queued", "written", "batches", "retries", "errors", "spilled", "replayed"
+        )
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(i == 0,), name=f"remember-{i}", daemon=True
+            )
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    # -- producer side -----------------------------------------------------
+
+    def submit(self, items: Iterable[Item]) -> List[str]:
+        """Queue ``items``; returns their ids. Never blocks on storage."""
+        now = time.perf_counter()
+        ids, overflow = [], []
+        for it in items:
+            it = dict(it)
+            it["id_override"] = it.get("id_override") or self.id_fn(
+                it["user_id"], it["text"]
+            )
+            ids.append(it["id_override"])
+            if self._closing.is_set() or self._q.qsize() >= self.max_queue:
+                overflow.append(it)
+            else:
+                with self._inflight_lock:
+                    self._pending += 1
+                self._q.put((it, now))
+        self.counts.inc("queued", len(ids))
+        if overflow:
+            self._spill(overflow)
+        return ids
+
+    # -- workers -----------------------------------------------------------
+
+    def _write(self, items: List[Item]) -> bool:
+        """Deliver ``items`` with retries; False once they have been spilled."""
+        key = id(items)
+        with self._inflight_lock:
+            self._inflight[key] = items
+        try:
+            for attempt in range(self.max_retries + 1):
+                t0 = time.perf_counter()
+                try:
+                    self.sink(items)
+                except Exception:
+                    self.counts.inc("errors")
+                    if attempt == self.max_retries or self._closing.is_set():
+                        break
+                    self.counts.inc("retries")
+                    self._closing.wait(min(5.0, 0.1 * 2**attempt))
+                    continue
+                self.write_ms.observe((time.perf_counter() - t0) * 1000.0)
+                self.counts.inc("written", len(items))
+                return True
+            self._spill(items)
+            return False
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+
+    def _run(self, replay: bool) -> None:
+        if replay:
+            try:
+                self._replay()
+            except Exception:
+                self.counts.inc("errors")  # left on disk for the next start
+            finally:
+                self._replayed.set()
+        else:
+            self._replayed.wait()
+        while True:
+            first = self._q.get()
+            if first is STOP:
+                return
+            batch, stop = gather(self._q, first, self.max_batch, self.max_wait)
+            start = time.perf_counter()
+            for _, t_sub in batch:
+                self.queue_ms.observe((start - t_sub) * 1000.0)
+            self.batch_size.observe(len(batch))
+            self.counts.inc("batches")
+            try:
+                self._write([it for it, _ in batch])
+            finally:
+                with self._inflight_lock:
+                    self._pending -= len(batch)
+            if stop:
+                return
+
+    # -- journal -----------------------------------------------------------
+
+    @contextmanager
+    def _journal_locked(self) -> Iterator[None]:
+        with self._journal_lock:
+            os.makedirs(os.path.dirname(self.journal) or ".", exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(self.journal + ".lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield  # released when the file closes
+
+    def _spill(self, items: List[Item]) -> None:
+        if not items:
+            return
+        if not self.journal:
+            self.counts.inc("errors", len(items))  # nowhere to keep them
+            return
+        with self._journal_locked():
+            with open(self.journal, "a", encoding="utf-8") as f:
+                for it in items:
+                    f.write(json.dumps(it, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        self.counts.inc("spilled", len(items))
+
+    def _replay(self) -> None:
+        # the journal is moved aside to a per-process replay file; replay
+        # files left by interrupted runs (any process) are replayed as well
+        if not self.journal:
+            return
+        with self._journal_locked():
+            if os.path.exists(self.journal):
+                # unique even when a restarted container reuses the pid
+                os.replace(
+                    self.journal,
+                    f"{self.journal}.replay.{os.getpid()}.{time.time_ns()}",
+                )
+        for path in sorted(glob.glob(glob.escape(self.journal) + ".replay*")):
+            try:
+                self._replay_file(path)
+            except Exception:
+                self.counts.inc("errors")  # kept for the next start
+
+    def _replay_file(self, path: str) -> None:
+        try:
+            f = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return  # replayed by another process meanwhile
+        with f:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # another process is replaying it
+                try:
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        return
+                except FileNotFoundError:
+                    return  # finished by the previous holder
+            items = []
+            for line in f:
+                if not line.endswith("\n"):
+                    continue  # torn final write
+                try:
+                    items.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.counts.inc("errors")
+            for lo in range(0, len(items), self.max_batch):
+                if not self._write(items[lo : lo + self.max_batch]):
+                    # re-spilled to the journal; the rest follows it there
+                    self._spill(items[lo + self.max_batch :])
+                    break
+            os.remove(path)  # still holding the flock
+        self.counts.inc("replayed", len(items))
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until nothing is queued or in flight; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._replayed.wait(timeout):
+            return False
+        while self._pending:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Drain for up to ``timeout``; spill whatever is still pending."""
+        self._closing.set()  # no more retries: failures spill right away
+        for _ in self._threads:
+            self._q.put(STOP)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self._threads:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            t.join(left)
+        left_over: List[Item] = []
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not STOP:
+                left_over.append(item[0])
+        with self._inflight_lock:
+            # may be written twice if a stuck batch completes after all
+            for items in self._inflight.values():
+                left_over.extend(items)
+        self._spill(left_over)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            **self.counts.snapshot(),
+            "depth": self._q.qsize(),
+            "max_queue": self.max_queue,
+            "max_batch": self.max_batch,
+            "batch_size": self.batch_size.snapshot(),
+            "queue_ms": self.queue_ms.snapshot(),
+            "write_ms": self.write_ms.snapshot(),
+        }
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from psycopg.rows import dict_row
+
+from .metrics import Counter, Histogram
+
+
+@dataclass
+class PoolConfig:
+    """Sizing and hygiene knobs for the shared Postgres pool (env driven)."""
+
+    min_size: int = int(os.getenv("MEMORY_POOL_MIN", "1"))
+    max_size: int = int(os.getenv("MEMORY_POOL_MAX", "10"))
+    # seconds a surplus connection (above min_size) may sit idle before reaping
+    max_idle: float = float(os.getenv("MEMORY_POOL_MAX_IDLE", "300"))
+    max_lifetime: float = float(os.getenv("MEMORY_POOL_MAX_LIFETIME", "3600"))
+    # seconds a caller waits for a free connection before PoolTimeout
+    timeout: float = float(os.getenv("MEMORY_POOL_TIMEOUT", "5"))
+    # run a cheap round-trip on checkout so dead sockets are never handed out
+    check: bool = os.getenv("MEMORY_POOL_CHECK", "1") != "0"
+
+
+@dataclass
+class PoolMetrics:
+    wait_ms: Histogram = field(default_factory=Histogram)
+    hold_ms: Histogram = field(default_factory=Histogram)
+    counts: Counter = field(
+        default_factory=lambda: Counter("checkouts", "timeouts", "errors")
+    )
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            **self.counts.snapshot(),
+            "wait_ms": self.wait_ms.snapshot(),
+            "hold_ms": self.hold_ms.snapshot(),
+        }
+
+
+class SharedPool:
+    """A psycopg ConnectionPool plus checkout timing, shared per DSN."""
+
+    def __init__(self, dsn: str, config: Optional[PoolConfig] = None):
+        from psycopg_pool import ConnectionPool
+
+        self.config = config or PoolConfig()
+        self.metrics = PoolMetrics()
+        cfg = self.config
+        self._pool = ConnectionPool(
+            dsn,
+            min_size=cfg.min_size,
+            max_size=max(cfg.max_size, cfg.min_size),
+            max_idle=cfg.max_idle,
+            max_lifetime=cfg.max_lifetime,
+            timeout=cfg.timeout,
+            check=ConnectionPool.check_connection if cfg.check else None,
+            kwargs={"row_factory": dict_row},
+            name="mother-memory",
+            open=True,
+        )
+
+    @contextmanager
+    def connection(self) -> Iterator[object]:
+        from psycopg_pool import PoolTimeout
+
+        t0 = time.perf_counter()
+        t1 = None
+        try:
+            with self._pool.connection() as conn:
+                t1 = time.perf_counter()
+                self.metrics.wait_ms.observe((t1 - t0) * 1000.0)
+                self.metrics.counts.inc("checkouts")
+                try:
+                    yield conn
+                except BaseException:
+                    self.metrics.counts.inc("errors")
+                    raise
+                finally:
+                    self.metrics.hold_ms.observe((time.perf_counter() - t1) * 1000.0)
+        except PoolTimeout:
+            if t1 is None:
+                self.metrics.counts.inc("timeouts")
+            raise
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "config": {
+                "min_size": self.config.min_size,
+                "max_size": self.config.max_size,
+                "max_idle": self.config.max_idle,
+                "timeout": self.config.timeout,
+            },
+            "pool": self._pool.get_stats(),
+            "checkout": self.metrics.snapshot(),
+        }
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class SharedAsyncPool:
+    """AsyncConnectionPool counterpart of SharedPool; opened on first use."""
+
+    def __init__(self, dsn: str, config: Optional[PoolConfig] = None):
+        from psycopg_pool import AsyncConnectionPool
+
+        self.config = config or PoolConfig()
+        self.metrics = PoolMetrics()
+        cfg = self.config
+        # the pool binds to the running loop, so it is opened lazily
+        self._pool = AsyncConnectionPool(
+            dsn,
+            min_size=cfg.min_size,
+            max_size=max(cfg.max_size, cfg.min_size),
+            max_idle=cfg.max_idle,
+            max_lifetime=cfg.max_lifetime,
+            timeout=cfg.timeout,
+            check=AsyncConnectionPool.check_connection if cfg.check else None,
+            kwargs={"row_factory": dict_row},
+            name="mother-memory-async",
+            open=False,
+        )
+        self._opened = False
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[object]:
+        from psycopg_pool import PoolTimeout
+
+        if not self._opened:
+            await self._pool.open()
+            self._opened = True
+        t0 = time.perf_counter()
+        t1 = None
+        try:
+            async with self._pool.connection() as conn:
+                t1 = time.perf_counter()
+                self.metrics.wait_ms.observe((t1 - t0) * 1000.0)
+                self.metrics.counts.inc("checkouts")
+                try:
+                    yield conn
+                except BaseException:
+                    self.metrics.counts.inc("errors")
+                    raise
+                finally:
+                    self.metrics.hold_ms.observe((time.perf_counter() - t1) * 1000.0)
+        except PoolTimeout:
+            if t1 is None:
+                self.metrics.counts.inc("timeouts")
+            raise
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "config": {
+                "min_size": self.config.min_size,
+                "max_size": self.config.max_size,
+                "max_idle": self.config.max_idle,
+                "timeout": self.config.timeout,
+            },
+            "pool": self._pool.get_stats(),
+            "checkout": self.metrics.snapshot(),
+        }
+
+    async def close(self) -> None:
+        if self._opened:
+            await self._pool.close()
+
+
+_POOLS: Dict[str, SharedPool] = {}
+_ASYNC_POOLS: Dict[str, SharedAsyncPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _registered(registry: Dict, dsn: str, config: Optional[PoolConfig], make):
+    # caller holds _POOLS_LOCK
+    pool = registry.get(dsn)
+    if pool is None:
+        pool = registry[dsn] = make(dsn, config)
+    elif config is not None and config != pool.config:
+        raise ValueError(
+            f"a shared pool for this DSN already exists with {pool.config!r};"
+            f" cannot reuse it with {config!r}"
+        )
+    return pool
+
+
+def shared_pool(dsn: str, config: Optional[PoolConfig] = None) -> SharedPool:
+    """Return the process-wide pool for ``dsn``, creating it on first use.
+
+    ``config`` only applies on creation; a later call with a different one
+    raises ValueError instead of silently getting the existing pool.
+    """
+    with _POOLS_LOCK:
+        return _registered(_POOLS, dsn, config, SharedPool)
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        p.close()
+
+
+def shared_async_pool(dsn: str, config: Optional[PoolConfig] = None) -> SharedAsyncPool:
+    """Async counterpart of ``shared_pool``, with the same config check."""
+    with _POOLS_LOCK:
+        return _registered(_ASYNC_POOLS, dsn, config, SharedAsyncPool)
+
+
+async def close_async_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_ASYNC_POOLS.values())
+        _ASYNC_POOLS.clear()
+    for p in pools:
+        await p.close()
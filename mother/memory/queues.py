@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import queue
+import time
+from typing import Any, List, Tuple
+
+# Batch gathering shared by the background queue consumers: the remember
+# pipeline, the embedding batcher and the SQLite group-commit writer. Each
+# worker blocks for a first item, then takes whatever else arrives within the
+# wait window; close() enqueues STOP once per worker.
+STOP = object()
+
+
+def gather(
+    q: "queue.Queue[Any]", first: Any, max_items: int, max_wait: float
+) -> Tuple[List[Any], bool]:
+    """``first`` plus up to ``max_items - 1`` more items that arrive within
+    ``max_wait`` seconds. The flag is True when STOP was taken: the caller
+    handles the batch and exits."""
+    batch = [first]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_items:
+        timeout = deadline - time.monotonic()
+        try:
+            item = q.get(timeout=timeout) if timeout > 0 else q.get_nowait()
+        except queue.Empty:
+            break
+        if item is STOP:
+            return batch, True
+        batch.append(item)
+    return batch, False
@@ -0,0 +1,515 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import psycopg
+
+from .metrics import Counter, Histogram
+
+# Retention for memory_item (needs the 20251018 migration).
+#
+# retention_policy "LRFU(<h>d)" keeps a combined recency-frequency value per
+# row: every access adds 1 and older mass halves every <h> days, so
+#   score(now) = crf * 0.5 ** ((now - ts_seen) / h)
+# A row is evicted once it is older than its ttl_days (since ts_seen) AND its
+# score fell below min_score. ttl_days = 0 is pinned and never touched; rows
+# with any other policy keep their crf but are scored with the default
+# half-life.
+
+DEFAULT_HALF_LIFE_DAYS = 21.0
+
+_POLICY = re.compile(r"^LRFU\((\d+(?:\.\d+)?)d\)$")
+
+# same parse, in SQL; must agree with half_life_days()
+_HALF_LIFE_SQL = (
+    r"coalesce(substring({t}retention_policy FROM '^LRFU\((\d+(?:\.\d+)?)d\)$')"
+    f"::float8, {DEFAULT_HALF_LIFE_DAYS})"
+)
+
+
+def half_life_days(policy: str) -> float:
+    m = _POLICY.match(policy or "")
+    return float(m.group(1)) if m else DEFAULT_HALF_LIFE_DAYS
+
+
+def touch_sql() -> str:
+    # one statement per flush; ids arrive sorted so concurrent flushers lock
+    # rows in the same order
+    return f"""
+    UPDATE memory_item m
+    SET access_count = m.access_count + a.hits,
+        crf = a.hits + m.crf * power(
+            0.5,
+            greatest(0, extract(epoch FROM a.seen - m.ts_seen)) / 86400.0
+              / {_HALF_LIFE_SQL.format(t="m.")}
+        ),
+        ts_seen = greatest(m.ts_seen, a.seen)
+    FROM unnest(%(ids)s::text[], %(hits)s::int[], %(seen)s::timestamptz[])
+         AS a(id, hits, seen)
+    WHERE m.id = a.id
+    ;
+    """
+
+
+# one keyset page of the table, scored; shared by the sweep and the dry run
+_SCAN = f"""
+    scan AS (
+        SELECT id, user_id, type, ts_seen, access_count, ttl_days = 0 AS pinned,
+               ttl_days > 0 AND ts_seen < now() - ttl_days * interval '1 day'
+                 AS expired,
+               crf * power(
+                   0.5,
+                   extract(epoch FROM now() - ts_seen) / 86400.0
+                     / {_HALF_LIFE_SQL.format(t="")}
+               ) AS score
+        FROM memory_item
+        WHERE id > %(after)s
+        ORDER BY id
+        LIMIT %(batch)s
+    )"""
+
+ARCHIVE_COLUMNS = (
+    "id",
+    "user_id",
+    "type",
+    "text",
+    "tags",
+    "ts_created",
+    "ts_seen",
+    "confidence",
+    "ttl_days",
+    "retention_policy",
+    "embedding_model",
+    "embedding_dim",
+    "payload",
+    "access_count",
+    "crf",
+)
+
+
+def sweep_batch_sql() -> str:
+    """Score one page and delete (optionally archive) its evictable rows.
+
+    Archived rows keep text and metadata but no vectors; they can be
+    re-embedded on restore.
+    """
+    cols = ", ".join(ARCHIVE_COLUMNS)
+    gone = ", ".join(f"m.{c}" for c in ARCHIVE_COLUMNS)
+    # an id can come back after eviction and be evicted again
+    refresh = ",\n            ".join(
+        f"{c} = EXCLUDED.{c}" for c in ARCHIVE_COLUMNS[1:] + ("score",)
+    )
+    return f"""
+    WITH{_SCAN},
+    victims AS (
+        SELECT m.id, s.score
+        FROM memory_item m
+        JOIN scan s ON s.id = m.id
+        WHERE s.expired AND s.score < %(min_score)s
+        FOR UPDATE OF m SKIP LOCKED
+    ),
+    gone AS (
+        DELETE FROM memory_item m
+        USING victims v
+        WHERE m.id = v.id
+        RETURNING {gone}, v.score
+    ),
+    archived AS (
+        INSERT INTO memory_item_archive ({cols}, score)
+        SELECT {cols}, score FROM gone
+        WHERE %(archive)s
+        ON CONFLICT (id) DO UPDATE SET
+            {refresh},
+            ts_archived = now()
+        RETURNING id
+    )
+    SELECT (SELECT count(*) FROM scan) AS scanned,
+           (SELECT max(id) FROM scan) AS last_id,
+           (SELECT count(*) FROM gone) AS evicted,
+           (SELECT count(*) FROM archived) AS archived,
+           (SELECT array_agg(DISTINCT user_id) FROM gone) AS users
+    ;
+    """
+
+
+def scan_batch_sql() -> str:
+    return f"""
+    WITH{_SCAN}
+    SELECT * FROM scan ORDER BY id
+    ;
+    """
+
+
+# both columns come with the 20251018 migration
+_COLUMNS_SQL = """
+    SELECT count(*) = 2 AS ok FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'memory_item'
+      AND column_name IN ('access_count', 'crf')
+"""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class AccessRecorder:
+    """Buffers retrieve hits and applies them in one UPDATE per flush.
+
+    ``record`` only touches a dict under a lock; a daemon thread flushes
+    every ``interval_s`` or as soon as ``max_pending`` distinct ids are
+    buffered. A failed flush drops its batch (access stats are best-effort);
+    a missing column pauses the recorder instead of failing every flush, and
+    the columns are looked for again every ``recheck_s`` until the migration
+    has run.
+    Flushes use ``connect`` (e.g. a pooled adapter's ``_connect``) when given,
+    else one long-lived autocommit connection, reopened after an error.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        interval_s: float = float(os.getenv("MEMORY_ACCESS_FLUSH_S", "5")),
+        max_pending: int = int(os.getenv("MEMORY_ACCESS_MAX_PENDING", "5000")),
+        connect: Optional[Callable[[], Any]] = None,
+        recheck_s: float = float(os.getenv("MEMORY_ACCESS_RECHECK_S", "300")),
+    ):
+        self.dsn = dsn
+        self.connect = connect
+        self._conn: Optional[psycopg.Connection] = None
+        self._flush_lock = threading.Lock()
+        self.interval_s = max(0.05, interval_s)
+        self.max_pending = max(1, max_pending)
+        self.enabled = True
+        self.recheck_s = max(0.0, recheck_s)
+        self._recheck_at = 0.0
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counts = Counter("hits", "flushes", "rows", "errors", "dropped")
+        self.flush_ms = Histogram()
+
+    def record(self, ids: Iterable[str]) -> None:
+        if not self.enabled:
+            return
+        now = _utcnow()
+        n = 0
+        with self._lock:
+            for i in ids:
+                hits = self._pending.get(i, (0, now))[0]
+                self._pending[i] = (hits + 1, now)
+                n += 1
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(
+                    target=self._run, name="memory-access", daemon=True
+                )
+                self._thread.start()
+        self.counts.inc("hits", n)
+        if full:
+            self._wake.set()
+
+    def _take(self) -> Dict[str, Tuple[int, datetime]]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    @contextmanager
+    def _connection(self) -> Iterator[Any]:
+        if self.connect is not None:
+            with self.connect() as conn:
+                yield conn
+            return
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg.connect(self.dsn, autocommit=True)
+        try:
+            yield self._conn
+        except psycopg.Error:
+            self._conn.close()
+            self._conn = None
+            raise
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            return self._flush()
+
+    def _recheck(self) -> bool:
+        now = time.monotonic()
+        if now < self._recheck_at:
+            return False
+        self._recheck_at = now + self.recheck_s
+        try:
+            with self._connection() as conn:
+                row = conn.execute(_COLUMNS_SQL).fetchone()
+        except psycopg.Error:
+            self.counts.inc("errors")
+            return False
+        self.enabled = bool(row["ok"] if isinstance(row, dict) else row[0])
+        return self.enabled
+
+    def _flush(self) -> int:
+        if not self.enabled and not self._recheck():
+            return 0
+        batch = self._take()
+        if not batch:
+            return 0
+        ids = sorted(batch)
+        params = {
+            "ids": ids,
+            "hits": [batch[i][0] for i in ids],
+            "seen": [batch[i][1] for i in ids],
+        }
+        t0 = time.perf_counter()
+        try:
+            with self._connection() as conn:
+                conn.execute(touch_sql(), params)
+        except psycopg.errors.UndefinedColumn:
+            self.enabled = False
+            self._recheck_at = time.monotonic() + self.recheck_s
+            self.counts.inc("errors")
+            self.counts.inc("dropped", len(ids))
+            return 0
+        except psycopg.Error:
+            self.counts.inc("errors")
+            self.counts.inc("dropped", len(ids))
+            return 0
+        self.flush_ms.observe((time.perf_counter() - t0) * 1000.0)
+        self.counts.inc("flushes")
+        self.counts.inc("rows", len(ids))
+        return len(ids)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            self.flush()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        with self._flush_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            **self.counts.snapshot(),
+            "enabled": self.enabled,
+            "pending": pending,
+            "flush_ms": self.flush_ms.snapshot(),
+        }
+
+
+_RECORDERS: Dict[str, AccessRecorder] = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+def shared_access_recorder(
+    dsn: str, connect: Optional[Callable[[], Any]] = None
+) -> AccessRecorder:
+    """Return the process-wide access recorder for ``dsn``; ``connect`` is
+    used by the adapter that creates it."""
+    with _RECORDERS_LOCK:
+        rec = _RECORDERS.get(dsn)
+        if rec is None:
+            rec = _RECORDERS[dsn] = AccessRecorder(dsn, connect=connect)
+        return rec
+
+
+def close_access_recorders() -> None:
+    # flushes whatever is still buffered
+    with _RECORDERS_LOCK:
+        recs = list(_RECORDERS.values())
+        _RECORDERS.clear()
+    for r in recs:
+        r.close()
+
+
+class RetentionWorker:
+    """Walks memory_item in keyset pages of ``batch_size`` rows and evicts
+    expired low-score rows, one short transaction per page.
+
+    ``sweep()`` does one full pass (or ``max_batches`` pages); ``start()``
+    repeats it every ``interval_s`` on a daemon thread. ``dry_run=True``
+    reports what a sweep would evict without writing.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        on_evict: Optional[Callable[[Iterable[str]], None]] = None,
+        batch_size: int = int(os.getenv("MEMORY_RETENTION_BATCH", "1000")),
+        min_score: float = float(os.getenv("MEMORY_RETENTION_MIN_SCORE", "0.05")),
+        archive: bool = os.getenv("MEMORY_RETENTION_ARCHIVE", "1") != "0",
+        interval_s: float = float(os.getenv("MEMORY_RETENTION_INTERVAL_S", "3600")),
+        pause_ms: float = float(os.getenv("MEMORY_RETENTION_PAUSE_MS", "50")),
+    ):
+        self.connect = connect
+        self.on_evict = on_evict
+        self.batch_size = max(1, batch_size)
+        self.min_score = min_score
+        self.archive = archive
+        self.interval_s = interval_s
+        self.pause = max(0.0, pause_ms) / 1000.0
+        self.counts = Counter(
+            "sweeps", "batches", "scanned", "evicted", "archived", "errors"
+        )
+        self.batch_ms = Histogram()
+        self.last_sweep: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _params(self, after: str) -> Dict[str, Any]:
+        return {
+            "after": after,
+            "batch": self.batch_size,
+            "min_score": self.min_score,
+            "archive": self.archive,
+        }
+
+    def _batch(self, after: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        with self.connect() as conn, conn.cursor() as cur:
+            cur.execute(sweep_batch_sql(), self._params(after))
+            row = cur.fetchone()
+            conn.commit()
+        self.batch_ms.observe((time.perf_counter() - t0) * 1000.0)
+        if row["users"] and self.on_evict is not None:
+            self.on_evict(row["users"])
+        return row
+
+    def sweep(
+        self, dry_run: bool = False, max_batches: Optional[int] = None
+    ) -> Dict[str, Any]:
+        if dry_run:
+            return self._dry_run(max_batches)
+        t0 = time.perf_counter()
+        after, batches = "", 0
+        totals = Tally()
+        while max_batches is None or batches < max_batches:
+            if self._stop.is_set():
+                break
+            try:
+                row = self._batch(after)
+            except psycopg.Error:
+                self.counts.inc("errors")
+                raise
+            batches += 1
+            for k in ("scanned", "evicted", "archived"):
+                totals[k] += row[k]
+                self.counts.inc(k, row[k])
+            self.counts.inc("batches")
+            if row["last_id"] is None or row["scanned"] < self.batch_size:
+                break
+            after = row["last_id"]
+            if self.pause:
+                time.sleep(self.pause)
+        self.counts.inc("sweeps")
+        self.last_sweep = self._report(totals, batches, t0, dry_run=False)
+        return self.last_sweep
+
+    def _dry_run(self, max_batches: Optional[int]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        after, batches = "", 0
+        totals = Tally()
+        by_user, by_type = Tally(), Tally()
+        lowest: List[Dict[str, Any]] = []
+        while max_batches is None or batches < max_batches:
+            with self.connect() as conn, conn.cursor() as cur:
+                cur.execute(scan_batch_sql(), self._params(after))
+                rows = cur.fetchall()
+            batches += 1
+            for r in rows:
+                totals["scanned"] += 1
+                totals["pinned"] += r["pinned"]
+                totals["expired"] += r["expired"]
+                if r["expired"] and r["score"] < self.min_score:
+                    totals["evicted"] += 1
+                    by_user[r["user_id"]] += 1
+                    by_type[r["type"]] += 1
+                    lowest.append(r)
+            lowest = sorted(lowest, key=lambda r: r["score"])[:20]
+            if len(rows) < self.batch_size:
+                break
+            after = rows[-1]["id"]
+        report = self._report(totals, batches, t0, dry_run=True)
+        report.update(
+            pinned=totals["pinned"],
+            expired=totals["expired"],
+            by_user=dict(by_user.most_common()),
+            by_type=dict(by_type),
+            lowest=[
+                {
+                    "id": r["id"],
+                    "user_id": r["user_id"],
+                    "type": r["type"],
+                    "score": round(float(r["score"]), 4),
+                    "ts_seen": r["ts_seen"],
+                    "access_count": r["access_count"],
+                }
+                for r in lowest
+            ],
+        )
+        return report
+
+    def _report(
+        self, totals: Tally, batches: int, t0: float, dry_run: bool
+    ) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - t0, 1e-9)
+        return {
+            "dry_run": dry_run,
+            "batches": batches,
+            "scanned": totals["scanned"],
+            # in a dry run: rows that would be evicted
+            "evicted": totals["evicted"],
+            "archived": totals["archived"],
+            "elapsed_s": round(elapsed, 3),
+            "scanned_per_s": round(totals["scanned"] / elapsed, 1),
+            "evicted_per_s": round(totals["evicted"] / elapsed, 1),
+            "min_score": self.min_score,
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except psycopg.Error:
+                pass  # counted; retried next interval
+            self._stop.wait(self.interval_s)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="memory-retention", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counts.snapshot(),
+            "running": self._thread is not None and self._thread.is_alive(),
+            "batch_size": self.batch_size,
+            "min_score": self.min_score,
+            "archive": self.archive,
+            "batch_ms": self.batch_ms.snapshot(),
+            "last_sweep": self.last_sweep,
+        }
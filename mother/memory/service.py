@@ -0,0 +1,494 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import os
+import re
+import threading
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .async_adapter import AsyncMemoryAdapter
+from .context import (
+    ContextBudget,
+    PackedContext,
+    fact_line,
+    history_line,
+    mmr,
+    pack_context,
+)
+from .extract import extract_candidate_facts
+from .metrics import Counter, Histogram
+from .pipeline import RememberPipeline
+
+# The memory/chat core shared by mother.app.api and mother.app.memory_middleware:
+# recall -> prompt -> LLM -> auto-remember. The LLM is a plain callable
+# (prompt -> reply, sync or async) plus an optional token stream, so the hot
+# path can be benchmarked and tested with stubs (tests/benchmarks).
+
+LLMCall = Callable[[str], Union[str, Awaitable[str]]]
+LLMStream = Callable[[str], AsyncIterator[str]]
+
+
+# ---- Memory service thin wrapper -------------------------------------------
+
+
+class MemoryService:
+    """Small convenience wrapper over MemoryAdapter."""
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        *,
+        adapter: Optional[AsyncMemoryAdapter] = None,
+    ):
+        if adapter is None:
+            # Prefer DSN env, otherwise default to pg_service (PGSERVICE=mother_local)
+            dsn = dsn or os.getenv("MOTHER_DB_DSN") or "service=mother_local"
+            # pooled adapters with the same DSN share one connection pool per
+            # process
+            adapter = AsyncMemoryAdapter(
+                dsn=dsn, pooled=os.getenv("MEMORY_POOL", "1") != "0"
+            )
+        self._mem = adapter
+        # in-process LRFU eviction; otherwise run `memory_cli retention sweep`
+        # from cron
+        self.retention = None
+        if os.getenv("MEMORY_RETENTION_WORKER", "0") == "1":
+            self.retention = self._mem.retention_worker()
+            self.retention.start()
+        # /chat auto-remember goes through a background pipeline
+        # (MEMORY_REMEMBER_ASYNC=0 writes inline, before the reply returns)
+        self.remember_async = os.getenv("MEMORY_REMEMBER_ASYNC", "1") == "1"
+        self._pipe: Optional[RememberPipeline] = None
+        self._pipe_lock = threading.Lock()
+
+    def recall(
+        self,
+        *,
+        user_id: str,
+        query_text: str,
+        k: int = 5,
+        types: Optional[Iterable[str]] = None,
+        mode: Optional[str] = None,
+        with_embeddings: bool = False,
+    ) -> List[Dict[str, Any]]:
+        return self._mem.retrieve(
+            user_id=user_id,
+            query=query_text,
+            limit=k,
+            types=list(types) if types else None,
+            mode=mode,
+            with_embeddings=with_embeddings,
+        )
+
+    def remember(
+        self,
+        *,
+        user_id: str,
+        text: str,
+        type: str = "semantic",  # autobio | episodic | semantic | procedural
+        tags: Optional[Iterable[str]] = None,
+        pin: bool = False,
+        payload: Optional[Dict[str, Any]] = None,
+        confidence: float = 0.9,
+    ) -> str:
+        return self._mem.upsert(
+            user_id=user_id,
+            text=text,
+            mtype=type,
+            tags=list(tags) if tags else [],
+            pin=pin,
+            payload=payload or {},
+            confidence=confidence,
+        )
+
+    def remember_many(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        """Batch ``remember``: one embedding batch and one transaction."""
+        return self._mem.upsert_many(items)
+
+    def _pipeline(self) -> RememberPipeline:
+        # started on first use, so importing the app does not replay journals
+        with self._pipe_lock:
+            if self._pipe is None:
+                self._pipe = RememberPipeline(self.remember_many, self._mem._stable_id)
+            return self._pipe
+
+    def remember_later(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        """Queue ``items`` for the background writer; returns their ids at once."""
+        if not self.remember_async:
+            return self.remember_many(items)
+        return self._pipeline().submit(items)
+
+    # async variants: same contract, never block the event loop
+
+    async def arecall(
+        self,
+        *,
+        user_id: str,
+        query_text: str,
+        k: int = 5,
+        types: Optional[Iterable[str]] = None,
+        mode: Optional[str] = None,
+        with_embeddings: bool = False,
+    ) -> List[Dict[str, Any]]:
+        return await self._mem.aretrieve(
+            user_id=user_id,
+            query=query_text,
+            limit=k,
+            types=list(types) if types else None,
+            mode=mode,
+            with_embeddings=with_embeddings,
+        )
+
+    async def aremember(
+        self,
+        *,
+        user_id: str,
+        text: str,
+        type: str = "semantic",
+        tags: Optional[Iterable[str]] = None,
+        pin: bool = False,
+        payload: Optional[Dict[str, Any]] = None,
+        confidence: float = 0.9,
+    ) -> str:
+        return await self._mem.aupsert(
+            user_id=user_id,
+            text=text,
+            mtype=type,
+            tags=list(tags) if tags else [],
+            pin=pin,
+            payload=payload or {},
+            confidence=confidence,
+        )
+
+    async def aremember_many(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        return await self._mem.aupsert_many(items)
+
+    async def aremember_later(self, items: Iterable[Dict[str, Any]]) -> List[str]:
+        if not self.remember_async:
+            return await self.aremember_many(items)
+        return self._pipeline().submit(items)  # never waits on storage
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool": self._mem.pool_stats(),
+            "async_pool": self._mem.apool_stats(),
+            "embedder": self._mem.embedder_stats(),
+            "recall_cache": self._mem.recall_cache_stats(),
+            "access": self._mem.access_stats(),
+            "retention": self.retention.stats() if self.retention else None,
+            "remember_pipeline": self._pipe.stats() if self._pipe else None,
+        }
+
+    def close(self) -> None:
+        if self.retention is not None:
+            self.retention.stop()
+        if self._pipe is not None:
+            self._pipe.close()  # drains, then journals what is left
+
+
+# ---- Prompt stitching ------------------------------------------------------
+
+BASE_SYSTEM = (
+    "You are a helpful assistant. Prefer concrete, verified facts. "
+    "If a user fact conflicts with new evidence, ask a short follow-up before assuming."
+)
+
+
+def assemble_prompt(
+    history: List[Dict[str, str]],
+    user_msg: str,
+    facts: List[Dict[str, Any]],
+    budget: Optional[ContextBudget] = None,
+) -> Tuple[str, PackedContext]:
+    """Prompt plus what made it in; facts and history are trimmed to budget."""
+    packed = pack_context(BASE_SYSTEM, user_msg, facts, history, budget)
+    mem_block = "\n".join(fact_line(r) for r in packed.facts)
+    hist = "\n".join(history_line(m) for m in packed.history)
+    memory_section = f"\nKnown facts:\n{mem_block}\n" if mem_block else ""
+    prompt = f"{BASE_SYSTEM}\n{memory_section}\n{hist}\nUser: {user_msg}\nAssistant:"
+    return prompt, packed
+
+
+def build_prompt(
+    history: List[Dict[str, str]], user_msg: str, facts: List[Dict[str, Any]]
+) -> str:
+    return assemble_prompt(history, user_msg, facts)[0]
+
+
+# ---- Chat core ---------------------------------------------------------------
+
+
+async def _cancel(
+    task: Optional[asyncio.Task], gen: Optional[AsyncIterator[str]] = None
+) -> None:
+    # cancel ``task`` and wait for it, then close ``gen`` (which the task may
+    # have been iterating: closing a running generator raises)
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    if gen is not None:
+        await gen.aclose()
+
+
+class ChatMemory:
+    """
+    Wraps an LLM callable with:
+      1) pre-query recall (k * mmr_pool candidates, k diverse ones kept)
+      2) post-reply auto-remember (very conservative)
+
+    ``llm_call`` may be sync or async; ``llm_stream`` (prompt -> async
+    iterator of text chunks) feeds ``astream``, which otherwise replays the
+    blocking reply word by word.
+    """
+
+    def __init__(
+        self,
+        llm_call: LLMCall,
+        mem: Optional[MemoryService] = None,
+        *,
+        llm_stream: Optional[LLMStream] = None,
+        k: int = 5,
+        recall_types: Iterable[str] = ("autobio", "semantic"),
+        auto_remember: bool = True,
+        mmr_pool: int = int(os.getenv("MEMORY_MMR_POOL", "4")),
+        budget: Optional[ContextBudget] = None,
+        speculate: bool = os.getenv("MEMORY_CHAT_SPECULATE", "0") == "1",
+        speculate_ms: float = float(os.getenv("MEMORY_CHAT_SPECULATE_MS", "30")),
+    ):
+        self.llm_call = llm_call
+        self.llm_stream = llm_stream
+        self.mem = mem or MemoryService()
+        self.k = k
+        self.recall_types = list(recall_types)
+        self.auto_remember = auto_remember
+        self.mmr_pool = max(1, mmr_pool)
+        self.budget = budget or ContextBudget()
+        # astream: if recall is slower than speculate_ms, start generating from
+        # a history-only prompt and keep it only if recall adds no facts
+        self.speculate = speculate
+        self.speculate_ms = max(0.0, speculate_ms)
+        self.recall_ms = Histogram()
+        self.ttft_ms = Histogram()
+        self.total_ms = Histogram()
+        self.counts = Counter("streams", "errors", "spec_hits", "spec_misses")
+
+    # -- LLM -----------------------------------------------------------------
+
+    def call_llm(self, prompt: str) -> str:
+        if inspect.iscoroutinefunction(self.llm_call):
+            raise TypeError("async llm_call: use ahandle/astream")
+        return self.llm_call(prompt)
+
+    async def acall_llm(self, prompt: str) -> str:
+        if inspect.iscoroutinefunction(self.llm_call):
+            return await self.llm_call(prompt)
+        return await asyncio.to_thread(self.llm_call, prompt)
+
+    async def astream_llm(self, prompt: str) -> AsyncIterator[str]:
+        if self.llm_stream is not None:
+            it = self.llm_stream(prompt)
+            try:
+                async for tok in it:
+                    yield tok
+            finally:
+                if hasattr(it, "aclose"):
+                    await it.aclose()
+            return
+        reply = await self.acall_llm(prompt)
+        for tok in re.findall(r"\S+\s*", reply):
+            yield tok
+
+    # -- steps ---------------------------------------------------------------
+
+    def _recall_args(self, user_id: str, user_msg: str) -> Dict[str, Any]:
+        return {
+            "user_id": user_id,
+            "query_text": user_msg,
+            "k": self.k * self.mmr_pool,
+            "types": self.recall_types,
+            "with_embeddings": True,
+        }
+
+    def recall_facts(self, user_id: str, user_msg: str) -> List[Dict[str, Any]]:
+        return mmr(self.mem.recall(**self._recall_args(user_id, user_msg)), self.k)
+
+    async def arecall_facts(self, user_id: str, user_msg: str) -> List[Dict[str, Any]]:
+        pool = await self.mem.arecall(**self._recall_args(user_id, user_msg))
+        return mmr(pool, self.k)
+
+    def _candidates(
+        self, user_id: str, user_msg: str, reply: str
+    ) -> Iterator[Dict[str, Any]]:
+        for t, ty, tg, p in extract_candidate_facts(user_msg, reply):
+            yield {"user_id": user_id, "text": t, "type": ty, "tags": tg, "pin": p}
+
+    def remember_reply(self, user_id: str, user_msg: str, reply: str) -> List[str]:
+        if not self.auto_remember:
+            return []
+        try:
+            return self.mem.remember_later(self._candidates(user_id, user_msg, reply))
+        except Exception:
+            # Don’t break the chat on storage hiccups
+            return []
+
+    async def aremember_reply(
+        self, user_id: str, user_msg: str, reply: str
+    ) -> List[str]:
+        if not self.auto_remember:
+            return []
+        try:
+            return await self.mem.aremember_later(
+                self._candidates(user_id, user_msg, reply)
+            )
+        except Exception:
+            return []
+
+    @staticmethod
+    def _result(reply: str, packed: PackedContext, saved: List[str]) -> Dict[str, Any]:
+        return {
+            "reply": reply,
+            "facts_used": [r["text"] for r in packed.facts],
+            "facts_saved": saved,
+            "context_tokens": packed.usage,
+        }
+
+    # -- handlers --------------------------------------------------------------
+
+    def handle(
+        self, *, user_id: str, history: List[Dict[str, str]], user_msg: str
+    ) -> Dict[str, Any]:
+        facts = self.recall_facts(user_id, user_msg)
+        prompt, packed = assemble_prompt(history, user_msg, facts, self.budget)
+        reply = self.call_llm(prompt)
+        saved = self.remember_reply(user_id, user_msg, reply)
+        return self._result(reply, packed, saved)
+
+    async def ahandle(
+        self, *, user_id: str, history: List[Dict[str, str]], user_msg: str
+    ) -> Dict[str, Any]:
+        """Async ``handle``; ``llm_call`` may be sync (run in a thread) or async."""
+        facts = await self.arecall_facts(user_id, user_msg)
+        prompt, packed = assemble_prompt(history, user_msg, facts, self.budget)
+        reply = await self.acall_llm(prompt)
+        saved = await self.aremember_reply(user_id, user_msg, reply)
+        return self._result(reply, packed, saved)
+
+    async def astream(
+        self, *, user_id: str, history: List[Dict[str, str]], user_msg: str
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ("token", {"text"}) events, then one ("done", result) event.
+
+        Recall runs concurrently with prompt preparation (and, with
+        ``speculate``, with a history-only generation). ``result`` is the
+        ``ahandle`` dict plus ``timing`` (recall/ttft/total ms).
+        """
+        t0 = time.perf_counter()
+        self.counts.inc("streams")
+        recall = asyncio.create_task(self.arecall_facts(user_id, user_msg))
+        recall.add_done_callback(
+            lambda _: self.recall_ms.observe((time.perf_counter() - t0) * 1000.0)
+        )
+        spec: Optional[AsyncIterator[str]] = None
+        spec_buf: List[str] = []
+        spec_task: Optional[asyncio.Task] = None
+        stream: Optional[AsyncIterator[str]] = None
+        try:
+            # prepared while recall is in flight
+            bare_prompt, bare = assemble_prompt(history, user_msg, [], self.budget)
+            if self.speculate:
+                done, _ = await asyncio.wait(
+                    {recall}, timeout=self.speculate_ms / 1000.0
+                )
+                if not done:
+                    spec = self.astream_llm(bare_prompt)
+
+                    async def drain() -> None:
+                        async for tok in spec:
+                            spec_buf.append(tok)
+
+                    spec_task = asyncio.create_task(drain())
+            try:
+                facts = await recall
+            except Exception:
+                # answer without memory rather than fail the stream
+                self.counts.inc("errors")
+                facts = []
+            prompt, packed = assemble_prompt(history, user_msg, facts, self.budget)
+
+            if spec_task is not None and prompt == bare_prompt:
+                # speculation hit: the prompt it used is the final prompt
+                self.counts.inc("spec_hits")
+                packed = bare
+
+                async def tokens() -> AsyncIterator[str]:
+                    sent = 0
+                    while not spec_task.done() or sent < len(spec_buf):
+                        if sent < len(spec_buf):
+                            sent += 1
+                            yield spec_buf[sent - 1]
+                        else:
+                            await asyncio.wait({spec_task}, timeout=0.005)
+                    await spec_task  # surface its exception, if any
+
+                stream = tokens()
+            else:
+                if spec_task is not None:
+                    # stop the wasted generation before starting the real one
+                    self.counts.inc("spec_misses")
+                    await _cancel(spec_task, spec)
+                stream = self.astream_llm(prompt)
+
+            parts: List[str] = []
+            ttft = None
+            async for tok in stream:
+                if ttft is None:
+                    ttft = (time.perf_counter() - t0) * 1000.0
+                    self.ttft_ms.observe(ttft)
+                parts.append(tok)
+                yield "token", {"text": tok}
+            reply = "".join(parts)
+
+            saved = await self.aremember_reply(user_id, user_msg, reply)
+            total = (time.perf_counter() - t0) * 1000.0
+            self.total_ms.observe(total)
+            yield "done", {
+                **self._result(reply, packed, saved),
+                "timing": {
+                    "ttft_ms": round(ttft, 2) if ttft is not None else None,
+                    "total_ms": round(total, 2),
+                    "speculative": (
+                        None
+                        if spec_task is None
+                        else ("hit" if packed is bare else "miss")
+                    ),
+                },
+            }
+        finally:
+            # the consumer may stop early (client disconnect -> aclose) or be
+            # cancelled: stop recall and any generation still running
+            await _cancel(recall)
+            await _cancel(spec_task, spec)
+            if stream is not None:
+                await stream.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counts.snapshot(),
+            "recall_ms": self.recall_ms.snapshot(),
+            "ttft_ms": self.ttft_ms.snapshot(),
+            "total_ms": self.total_ms.snapshot(),
+        }
@@ -2,16 +2,38 @@ from __future__ import annotations
 
 # SQL fragments for pgvector-backed memory store.
 
+# metric -> (operator class for the ANN index, distance operator for ORDER BY).
+# The ORDER BY operator must match the index opclass or the index is skipped.
+METRIC_OPS = {
+    "cosine": ("vector_cosine_ops", "<=>"),
+    "l2": ("vector_l2_ops", "<->"),
+    "ip": ("vector_ip_ops", "<#>"),
+}
 
-def upsert_memory_sql(distance_ops: str = "vector_cosine_ops") -> str:
-    return """
-    INSERT INTO memory_item (
-        id, user_id, type, text, tags, confidence, ttl_days, retention_policy,
-        embedding_model, embedding_dim, embedding, payload
-    ) VALUES (
-        %(id)s, %(user_id)s, %(type)s, %(text)s, %(tags)s, %(confidence)s, %(ttl_days)s, %(retention_policy)s,
-        %(embedding_model)s, %(embedding_dim)s, %(embedding)s, %(payload)s
-    )
+
+def distance_operator(metric: str) -> str:
+    try:
+        return METRIC_OPS[metric][1]
+    except KeyError:
+        raise ValueError(f"unknown distance metric: {metric!r}") from None
+
+
+UPSERT_COLUMNS = (
+    "id",
+    "user_id",
+    "type",
+    "text",
+    "tags",
+    "confidence",
+    "ttl_days",
+    "retention_policy",
+    "embedding_model",
+    "embedding_dim",
+    "embedding",
+    "payload",
+)
+
+_ON_CONFLICT = """
     ON CONFLICT (id) DO UPDATE SET
         text = EXCLUDED.text,
         tags = EXCLUDED.tags,
@@ -22,21 +44,334 @@ def upsert_memory_sql(distance_ops: str = "vector_cosine_ops") -> str:
         embedding_dim = EXCLUDED.embedding_dim,
         embedding = EXCLUDED.embedding,
         payload = EXCLUDED.payload,
-        ts_seen = now()
+        ts_seen = now()"""
+
+
+# Quantized storage (MEMORY_QUANT=halfvec, see the 20251017 migration):
+# memory_item keeps only a half-precision copy in embedding_half, which the
+# ANN index and the first search pass use. Full-precision vectors live in the
+# narrow side table memory_item_fp and are read only for the top candidates
+# when re-scoring. Params keep the name ``embedding`` in both modes; pgvector's
+# assignment casts turn the float list / text literal into halfvec.
+QUANT_MODES = ("none", "halfvec")
+
+
+def check_quant(quant: str) -> str:
+    if quant not in QUANT_MODES:
+        raise ValueError(f"unknown quantization mode: {quant!r}")
+    return quant
+
+
+def item_columns(quant: str = "none") -> tuple:
+    if check_quant(quant) == "none":
+        return UPSERT_COLUMNS
+    return tuple("embedding_half" if c == "embedding" else c for c in UPSERT_COLUMNS)
+
+
+def _on_conflict(quant: str) -> str:
+    if quant == "none":
+        return _ON_CONFLICT
+    return _ON_CONFLICT.replace(
+        "embedding = EXCLUDED.embedding", "embedding_half = EXCLUDED.embedding_half"
+    )
+
+
+def upsert_memory_sql(
+    distance_ops: str = "vector_cosine_ops", quant: str = "none"
+) -> str:
+    vec_col = item_columns(quant)[UPSERT_COLUMNS.index("embedding")]
+    return f"""
+    INSERT INTO memory_item (
+        id, user_id, type, text, tags, confidence, ttl_days, retention_policy,
+        embedding_model, embedding_dim, {vec_col}, payload
+    ) VALUES (
+        %(id)s, %(user_id)s, %(type)s, %(text)s, %(tags)s, %(confidence)s, %(ttl_days)s, %(retention_policy)s,
+        %(embedding_model)s, %(embedding_dim)s, %(embedding)s, %(payload)s
+    ){_on_conflict(quant)}
+    ;
+    """
+
+
+def upsert_memory_many_sql(n: int, quant: str = "none") -> str:
+    """Multi-row variant of upsert_memory_sql; params are suffixed ``_<row>``.
+
+    Row ids must be unique within one statement (ON CONFLICT cannot touch the
+    same row twice), so callers dedupe before building params.
+    """
+    rows = ",\n        ".join(
+        "(" + ", ".join(f"%({c}_{i})s" for c in UPSERT_COLUMNS) + ")" for i in range(n)
+    )
+    return f"""
+    INSERT INTO memory_item ({", ".join(item_columns(quant))})
+    VALUES
+        {rows}{_on_conflict(quant)}
+    ;
+    """
+
+
+_FP_CONFLICT = """
+    ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding"""
+
+
+def upsert_fp_sql() -> str:
+    # quantized mode only; run after the memory_item upsert (foreign key)
+    return f"""
+    INSERT INTO memory_item_fp (id, embedding)
+    VALUES (%(id)s, %(embedding)s){_FP_CONFLICT}
+    ;
+    """
+
+
+def upsert_fp_many_sql(n: int) -> str:
+    rows = ", ".join(f"(%(id_{i})s, %(embedding_{i})s)" for i in range(n))
+    return f"""
+    INSERT INTO memory_item_fp (id, embedding)
+    VALUES {rows}{_FP_CONFLICT}
     ;
     """
 
 
-def search_memory_sql(metric: str = "cosine") -> str:
+def upsert_dedupe_sql(metric: str = "cosine", quant: str = "none") -> str:
+    """upsert_memory_sql that first looks for a near-duplicate, one statement.
+
+    The nearest row of the same user and type (found through the ANN index)
+    absorbs the new item when its distance is at most ``%(max_distance)s``:
+    confidence is raised by ``%(bump)s``, tags are unioned, payloads merged,
+    a pin wins, and ts_seen is refreshed; its text and vector stay. Otherwise
+    the row is inserted as usual. An exact id match always takes the plain
+    upsert path. Returns ``(id, merged)``.
+    """
+    op = distance_operator(metric)
+    vec_type = "vector" if check_quant(quant) == "none" else "halfvec"
+    vec_col = item_columns(quant)[UPSERT_COLUMNS.index("embedding")]
+    ann = f"{vec_col} {op} %(embedding)s::{vec_type}"
+    # INSERT ... SELECT does not type its params from the target columns
+    casts = {"embedding": f"::{vec_type}", "payload": "::jsonb", "tags": "::text[]"}
+    values = ", ".join(f"%({c})s{casts.get(c, '')}" for c in UPSERT_COLUMNS)
+    fp = ""
+    if quant != "none":
+        # FK checks run at end of statement, after the sibling insert
+        fp = f""",
+    fp AS (
+        INSERT INTO memory_item_fp (id, embedding)
+        SELECT id, %(embedding)s::vector FROM ins{_FP_CONFLICT}
+    )"""
+    return f"""
+    WITH nn AS (
+        SELECT id, {ann} AS distance
+        FROM memory_item
+        WHERE user_id = %(user_id)s
+          AND type = %(type)s
+          AND NOT EXISTS (SELECT 1 FROM memory_item WHERE id = %(id)s)
+        ORDER BY {ann}
+        LIMIT 1
+    ),
+    merged AS (
+        UPDATE memory_item m
+        SET confidence = least(
+                1.0, greatest(m.confidence, %(confidence)s) + %(bump)s
+            ),
+            tags = ARRAY(
+                SELECT t
+                FROM unnest(m.tags || %(tags)s::text[]) WITH ORDINALITY u(t, i)
+                GROUP BY t
+                ORDER BY min(i)
+            ),
+            payload = m.payload || %(payload)s::jsonb,
+            ttl_days = CASE WHEN m.ttl_days = 0 OR %(ttl_days)s = 0 THEN 0
+                            ELSE greatest(m.ttl_days, %(ttl_days)s) END,
+            ts_seen = now()
+        FROM nn
+        WHERE m.id = nn.id AND nn.distance <= %(max_distance)s
+        RETURNING m.id
+    ),
+    ins AS (
+        INSERT INTO memory_item ({", ".join(item_columns(quant))})
+        SELECT {values}
+        WHERE NOT EXISTS (SELECT 1 FROM merged){_on_conflict(quant)}
+        RETURNING id
+    ){fp}
+    SELECT id, true AS merged FROM merged
+    UNION ALL
+    SELECT id, false AS merged FROM ins
+    ;
+    """
+
+
+def create_stage_sql() -> str:
     return """
+    CREATE TEMP TABLE IF NOT EXISTS memory_item_stage
+        (LIKE memory_item INCLUDING DEFAULTS) ON COMMIT DROP
+    ;
+    """
+
+
+def copy_stage_sql() -> str:
+    return f"COPY memory_item_stage ({', '.join(UPSERT_COLUMNS)}) FROM STDIN"
+
+
+def merge_stage_sql(quant: str = "none") -> str:
+    # DISTINCT ON keeps one row per id (last staged wins via ctid ordering)
+    cols = ", ".join(UPSERT_COLUMNS)
+    if quant != "none":
+        cols = cols.replace("embedding,", "embedding::halfvec,")
+    return f"""
+    INSERT INTO memory_item ({", ".join(item_columns(quant))})
+    SELECT DISTINCT ON (id) {cols}
+    FROM memory_item_stage
+    ORDER BY id, ctid DESC{_on_conflict(quant)}
+    ;
+    """
+
+
+def merge_stage_fp_sql() -> str:
+    return f"""
+    INSERT INTO memory_item_fp (id, embedding)
+    SELECT DISTINCT ON (id) id, embedding
+    FROM memory_item_stage
+    ORDER BY id, ctid DESC{_FP_CONFLICT}
+    ;
+    """
+
+
+_SEARCH_FILTERS = """user_id = %(user_id)s
+      AND (%(types)s::text[] IS NULL OR type = ANY (%(types)s::text[]))
+      AND (%(tags)s::text[] IS NULL OR tags && %(tags)s::text[])"""
+
+# Lexical match expression; must stay identical to the GIN index expression
+# in index.py or the planner cannot use it. 'simple' does no stemming or stop
+# words, so paths, IPs and hostnames survive as whole tokens.
+TEXT_TSV = "to_tsvector('simple', text)"
+
+
+def search_memory_sql(
+    metric: str = "cosine", with_embedding: bool = False, quant: str = "none"
+) -> str:
+    # with_embedding also returns the stored vector (pgvector text form)
+    op = distance_operator(metric)
+    if check_quant(quant) != "none":
+        return _rescore_search_sql(op, with_embedding)
+    emb = "embedding::text AS embedding, " if with_embedding else ""
+    return f"""
     SELECT id, user_id, type, text, tags, ts_created, ts_seen, confidence,
            ttl_days, retention_policy, embedding_model, embedding_dim, payload,
-           (embedding <-> %(query_vec)s::vector) AS distance
+           {emb}(embedding {op} %(query_vec)s::vector) AS distance
     FROM memory_item
-    WHERE user_id = %(user_id)s
-      AND (%(types)s::text[] IS NULL OR type = ANY (%(types)s::text[]))
-      AND (%(tags)s::text[] IS NULL OR tags && %(tags)s::text[])
-    ORDER BY embedding <-> %(query_vec)s::vector
+    WHERE {_SEARCH_FILTERS}
+    ORDER BY embedding {op} %(query_vec)s::vector
+    LIMIT %(limit)s
+    ;
+    """
+
+
+def _rescore_search_sql(op: str, with_embedding: bool) -> str:
+    # approximate top-``rescore`` on the halfvec index, then exact order
+    # from the full-precision side table for just those rows
+    emb = "fp.embedding::text AS embedding, " if with_embedding else ""
+    return f"""
+    WITH cand AS (
+        SELECT id
+        FROM memory_item
+        WHERE {_SEARCH_FILTERS}
+        ORDER BY embedding_half {op} %(query_vec)s::halfvec
+        LIMIT %(rescore)s
+    )
+    SELECT m.id, m.user_id, m.type, m.text, m.tags, m.ts_created, m.ts_seen,
+           m.confidence, m.ttl_days, m.retention_policy, m.embedding_model,
+           m.embedding_dim, m.payload, {emb}
+           (fp.embedding {op} %(query_vec)s::vector) AS distance
+    FROM cand c
+    JOIN memory_item m ON m.id = c.id
+    JOIN memory_item_fp fp ON fp.id = c.id
+    ORDER BY distance
+    LIMIT %(limit)s
+    ;
+    """
+
+
+def hybrid_search_sql(
+    metric: str = "cosine", with_embedding: bool = False, quant: str = "none"
+) -> str:
+    """Vector top-N and lexical top-N fused by reciprocal rank, one statement.
+
+    Each side ranks at most ``candidates`` rows; a row scores
+    sum(1 / (rrf_k + rank)) over the sides it appears in. The lexical side
+    ORs the query terms against the full-text index and also accepts pg_trgm
+    word-similarity matches for partial paths/hosts.
+    """
+    op = distance_operator(metric)
+    if check_quant(quant) == "none":
+        ann = f"embedding {op} %(query_vec)s::vector"
+        full, join = "m.embedding", ""
+    else:
+        # vector side ranks on halfvec; reported distances are full precision
+        ann = f"embedding_half {op} %(query_vec)s::halfvec"
+        full = "fp.embedding"
+        join = "\n    LEFT JOIN memory_item_fp fp ON fp.id = f.id"
+    emb = f"{full}::text AS embedding, " if with_embedding else ""
+    return f"""
+    WITH vec AS (
+        SELECT id, row_number() OVER (ORDER BY d, id) AS rank
+        FROM (
+            SELECT id, {ann} AS d
+            FROM memory_item
+            WHERE {_SEARCH_FILTERS}
+            ORDER BY {ann}
+            LIMIT %(candidates)s
+        ) v
+    ),
+    lex AS (
+        SELECT id, row_number() OVER (ORDER BY score DESC, id) AS rank
+        FROM (
+            SELECT id,
+                   ts_rank_cd({TEXT_TSV}, q.tsq)
+                     + word_similarity(%(query_text)s, text) AS score
+            FROM memory_item,
+                 to_tsquery('simple', replace(
+                     plainto_tsquery('simple', %(query_text)s)::text, ' & ', ' | '
+                 )) AS q(tsq)
+            WHERE {_SEARCH_FILTERS}
+              AND ({TEXT_TSV} @@ q.tsq OR %(query_text)s <%% text)
+            ORDER BY score DESC
+            LIMIT %(candidates)s
+        ) l
+    ),
+    fused AS (
+        SELECT id,
+               sum(1.0 / (%(rrf_k)s + rank)) AS rrf,
+               min(rank) FILTER (WHERE src = 'vec') AS vec_rank,
+               min(rank) FILTER (WHERE src = 'lex') AS lex_rank
+        FROM (
+            SELECT id, rank, 'vec' AS src FROM vec
+            UNION ALL
+            SELECT id, rank, 'lex' AS src FROM lex
+        ) u
+        GROUP BY id
+    )
+    SELECT m.id, m.user_id, m.type, m.text, m.tags, m.ts_created, m.ts_seen,
+           m.confidence, m.ttl_days, m.retention_policy, m.embedding_model,
+           m.embedding_dim, m.payload, {emb}
+           ({full} {op} %(query_vec)s::vector) AS distance,
+           f.rrf::float8 AS rrf, f.vec_rank, f.lex_rank
+    FROM fused f
+    JOIN memory_item m ON m.id = f.id{join}
+    ORDER BY f.rrf DESC, distance
     LIMIT %(limit)s
     ;
     """
+
+
+def search_settings_sql(iterative_scan: bool = False) -> str:
+    # transaction-local ANN knobs. hnsw.iterative_scan only exists in pgvector
+    # >= 0.8, and once the library is loaded it reserves the hnsw. prefix, so
+    # an unknown hnsw.* setting is an error: only set it when enabled.
+    iterative = (
+        ",\n           set_config('hnsw.iterative_scan', %(iterative_scan)s, true)"
+        if iterative_scan
+        else ""
+    )
+    return f"""
+    SELECT set_config('hnsw.ef_search', %(ef_search)s, true),
+           set_config('ivfflat.probes', %(probes)s, true){iterative}
+    ;
+    """
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Set
+
+# Storage backend seam for MemoryAdapter. The adapter owns embedding, ids,
+# caching and scoring; a store only persists rows and answers top-k queries.
+# When no store is configured the adapter talks to pgvector directly (the
+# default backend), so every store must return the pgvector row shape:
+#   id, user_id, type, text, tags (list), ts_created, ts_seen (datetime),
+#   confidence, ttl_days, retention_policy, embedding_model, embedding_dim,
+#   payload (dict), distance
+# where ``distance`` uses pgvector semantics for the metric (cosine: 1 - cos,
+# l2: euclidean, ip: negative inner product).
+
+
+class MemoryStore(Protocol):
+    def upsert_rows(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Insert or update rows built by ``MemoryAdapter._row_params``."""
+        ...
+
+    def search(self, params: Dict[str, Any], metric: str) -> List[Dict[str, Any]]:
+        """Top ``params['limit']`` rows for ``params['query_vec']``.
+
+        ``params`` is ``MemoryAdapter._search_params``: user_id, query_vec,
+        limit, and optional types / tags filters (tags: any-overlap).
+        """
+        ...
+
+    def existing(self, ids: Sequence[str]) -> Set[str]:
+        """The subset of ``ids`` already stored."""
+        ...
+
+    def scan(
+        self, after: str, limit: int, user_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Rows with id > ``after`` in id order, with ``embedding``."""
+        ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+    def close(self) -> None: ...
+
+
+def store_from_env(dim: int, metric: str) -> Optional[MemoryStore]:
+    """Store selected by MEMORY_BACKEND; None means the pgvector default."""
+    backend = os.getenv("MEMORY_BACKEND", "pgvector").lower()
+    if backend == "pgvector":
+        return None
+    if backend == "local":
+        from .local_store import LocalVectorStore
+
+        return LocalVectorStore(
+            os.getenv("MEMORY_LOCAL_PATH", "data/memory"),
+            dim=dim,
+            dtype=os.getenv("MEMORY_LOCAL_DTYPE", "float32"),
+        )
+    raise ValueError(f"unknown MEMORY_BACKEND: {backend!r}")
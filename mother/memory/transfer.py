@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import sys
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from .adapter import _parse_vec, _vec_literal
+from .sql import UPSERT_COLUMNS, check_quant, item_columns, upsert_fp_many_sql
+
+# Bulk paths in and out of memory_item, all in keyset (id) order with memory
+# bounded by one batch:
+#   export   -> NDJSON, one row per line, vector as base64 little-endian float32
+#   import   <- the same file, batched upserts that keep the exported timestamps
+#   reembed  re-embeds rows whose embedding_model differs from the current
+#            embedder, in place, one short transaction per batch
+# Export resumes after the last complete line of an existing file; import
+# keeps its byte offset in "<file>.import"; reembed resumes by construction
+# (finished rows no longer match).
+
+TRANSFER_COLUMNS = UPSERT_COLUMNS[:-2] + ("payload", "ts_created", "ts_seen")
+
+
+def encode_vec(vec: Optional[List[float]]) -> Optional[str]:
+    if vec is None:
+        return None
+    a = array("f", vec)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return base64.b64encode(a.tobytes()).decode("ascii")
+
+
+def decode_vec(data: Optional[str]) -> Optional[List[float]]:
+    if data is None:
+        return None
+    a = array("f")
+    a.frombytes(base64.b64decode(data))
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a.tolist()
+
+
+def dump_row(r: Dict[str, Any]) -> str:
+    out = {c: r[c] for c in TRANSFER_COLUMNS}
+    for c in ("ts_created", "ts_seen"):
+        if isinstance(out[c], datetime):
+            out[c] = out[c].isoformat()
+    if isinstance(out["payload"], str):
+        out["payload"] = json.loads(out["payload"])
+    emb = r.get("embedding")
+    if isinstance(emb, str):
+        emb = _parse_vec(emb)
+    out["embedding"] = encode_vec(emb)
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_row(line: bytes) -> Dict[str, Any]:
+    r = json.loads(line)
+    r["embedding"] = decode_vec(r.get("embedding"))
+    r["tags"] = r.get("tags") or []
+    r["payload"] = json.dumps(r.get("payload") or {})
+    return r
+
+
+def _resume_point(path: str) -> str:
+    """Last exported id; drops a torn final line left by an interrupted run."""
+    with open(path, "rb+") as f:
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        # read backwards until the last complete line is fully in ``tail``
+        while pos > 0 and tail.count(b"\n") < 2:
+            step = min(65536, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+        cut = tail.rfind(b"\n")
+        if cut < 0:
+            f.truncate(0)
+            return ""
+        f.truncate(pos + cut + 1)
+        return json.loads(tail[: cut + 1].splitlines()[-1])["id"]
+
+
+def export_sql(quant: str = "none") -> str:
+    if check_quant(quant) == "none":
+        vec, join = "m.embedding", ""
+    else:
+        vec, join = "fp.embedding", "\n    LEFT JOIN memory_item_fp fp ON fp.id = m.id"
+    cols = ", ".join(f"m.{c}" for c in TRANSFER_COLUMNS)
+    return f"""
+    SELECT {cols}, {vec}::text AS embedding
+    FROM memory_item m{join}
+    WHERE m.id > %(after)s
+      AND (%(user_id)s::text IS NULL OR m.user_id = %(user_id)s)
+    ORDER BY m.id
+    ;
+    """
+
+
+def import_many_sql(n: int, quant: str = "none") -> str:
+    # like upsert_memory_many_sql, but timestamps come from the file
+    cols = UPSERT_COLUMNS + ("ts_created", "ts_seen")
+    target = item_columns(quant) + ("ts_created", "ts_seen")
+    rows = ",\n        ".join(
+        "(" + ", ".join(f"%({c}_{i})s" for c in cols) + ")" for i in range(n)
+    )
+    updates = ",\n        ".join(f"{c} = EXCLUDED.{c}" for c in target[1:])
+    return f"""
+    INSERT INTO memory_item ({", ".join(target)})
+    VALUES
+        {rows}
+    ON CONFLICT (id) DO UPDATE SET
+        {updates}
+    ;
+    """
+
+
+def reembed_sql(quant: str = "none") -> List[str]:
+    # the text guard skips rows rewritten since they were read
+    col = item_columns(quant)[UPSERT_COLUMNS.index("embedding")]
+    vec_type = "vector" if quant == "none" else "halfvec"
+    sqls = [f"""
+    UPDATE memory_item m
+    SET {col} = v.vec::{vec_type},
+        embedding_model = %(model)s,
+        embedding_dim = %(dim)s
+    FROM unnest(%(ids)s::text[], %(texts)s::text[], %(vecs)s::text[])
+         AS v(id, text, vec)
+    WHERE m.id = v.id AND m.text = v.text
+    ;
+    """]
+    if quant != "none":
+        sqls.append("""
+    INSERT INTO memory_item_fp (id, embedding)
+    SELECT v.id, v.vec::vector
+    FROM unnest(%(ids)s::text[], %(texts)s::text[], %(vecs)s::text[])
+         AS v(id, text, vec)
+    JOIN memory_item m ON m.id = v.id AND m.text = v.text
+    ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding
+    ;
+    """)
+    return sqls
+
+
+def _stale_sql() -> str:
+    return """
+    SELECT id, user_id, text
+    FROM memory_item
+    WHERE id > %(after)s
+      AND embedding_model <> %(model)s
+      AND (%(user_id)s::text IS NULL OR user_id = %(user_id)s)
+    ORDER BY id
+    LIMIT %(batch)s
+    ;
+    """
+
+
+def _rate(n: int, t0: float) -> Dict[str, float]:
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    return {"elapsed_s": round(elapsed, 3), "rows_per_s": round(n / elapsed, 1)}
+
+
+def _iter_export(mem, after: str, user_id: Optional[str], batch: int) -> Iterator:
+    if mem.store is not None:
+        while True:
+            rows = mem.store.scan(after, batch, user_id)
+            yield from rows
+            if len(rows) < batch:
+                return
+            after = rows[-1]["id"]
+    # server-side cursor: one snapshot, ``batch`` rows in flight at a time
+    with mem._connect() as conn:
+        with conn.cursor(name="memory_export") as cur:
+            cur.itersize = batch
+            cur.execute(export_sql(mem.quant), {"after": after, "user_id": user_id})
+            yield from cur
+
+
+def export_items(
+    mem,
+    path: str,
+    user_id: Optional[str] = None,
+    batch: int = 1000,
+    resume: bool = True,
+) -> Dict[str, Any]:
+    after = ""
+    if resume and os.path.exists(path):
+        after = _resume_point(path)
+    t0 = time.perf_counter()
+    n = 0
+    with open(path, "a" if after else "w", encoding="utf-8") as f:
+        for r in _iter_export(mem, after, user_id, max(1, batch)):
+            f.write(dump_row(r) + "\n")
+            n += 1
+            if n % batch == 0:
+                f.flush()
+        f.flush()
+        os.fsync(f.fileno())
+    return {"path": path, "rows": n, "resumed_after": after or None, **_rate(n, t0)}
+
+
+def _write_batch(mem, rows: List[Dict[str, Any]]) -> int:
+    rows = list({r["id"]: r for r in rows}.values())  # one ON CONFLICT hit per id
+    for r in rows:
+        emb = r["embedding"]
+        if emb is not None and len(emb) != mem.dim:
+            raise ValueError(
+                f"row {r['id']}: embedding dim {len(emb)} != {mem.dim}"
+                " (set EMBEDDING_DIM to match the export)"
+            )
+    if mem.store is not None:
+        # the local store needs a vector for every row
+        rows = [r for r in rows if r["embedding"] is not None]
+        mem.store.upsert_rows(rows)
+    else:
+        params: Dict[str, Any] = {}
+        cols = UPSERT_COLUMNS + ("ts_created", "ts_seen")
+        for i, r in enumerate(rows):
+            params.update({f"{c}_{i}": r[c] for c in cols})
+        with mem._connect() as conn, conn.cursor() as cur:
+            cur.execute(import_many_sql(len(rows), mem.quant), params)
+            fp = [r for r in rows if r["embedding"] is not None]
+            if mem.quant != "none" and fp:
+                fp_params: Dict[str, Any] = {}
+                for i, r in enumerate(fp):
+                    fp_params.update(
+                        {f"id_{i}": r["id"], f"embedding_{i}": r["embedding"]}
+                    )
+                cur.execute(upsert_fp_many_sql(len(fp)), fp_params)
+            conn.commit()
+    mem._invalidate(r["user_id"] for r in rows)
+    return len(rows)
+
+
+def import_items(
+    mem, path: str, batch: int = 500, resume: bool = True
+) -> Dict[str, Any]:
+    ckpt = path + ".import"
+    start = 0
+    if resume and os.path.exists(ckpt):
+        with open(ckpt) as f:
+            start = int(f.read().strip() or 0)
+    t0 = time.perf_counter()
+    n = skipped = 0
+    buf: List[Dict[str, Any]] = []
+
+    def commit(pos: int) -> None:
+        nonlocal n, skipped
+        written = _write_batch(mem, buf)
+        n += written
+        skipped += len(buf) - written
+        buf.clear()
+        with open(ckpt, "w") as f:
+            f.write(str(pos))
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # torn tail of an export still being written
+            pos += len(line)
+            if line.strip():
+                buf.append(load_row(line))
+            if len(buf) >= batch:
+                commit(pos)
+        if buf:
+            commit(pos)
+    if os.path.exists(ckpt):
+        os.remove(ckpt)
+    return {
+        "path": path,
+        "rows": n,
+        "skipped": skipped,
+        "resumed_at_byte": start or None,
+        **_rate(n, t0),
+    }
+
+
+def _stale_page(mem, after: str, batch: int, user_id: Optional[str], model: str):
+    if mem.store is not None:
+        rows = mem.store.scan(after, batch, user_id)
+        last = rows[-1]["id"] if rows else None
+        return [r for r in rows if r["embedding_model"] != model], last
+    with mem._connect() as conn, conn.cursor() as cur:
+        cur.execute(
+            _stale_sql(),
+            {"after": after, "model": model, "user_id": user_id, "batch": batch},
+        )
+        rows = cur.fetchall()
+    return rows, rows[-1]["id"] if rows else None
+
+
+def reembed_items(
+    mem, batch: int = 256, user_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Re-embed every row not written by ``mem.embedder`` (EMBEDDING_MODEL).
+
+    Search keeps working throughout; until the run finishes, results mix
+    vectors of both models.
+    """
+    model = mem.embedder.name
+    t0 = time.perf_counter()
+    after, n = "", 0
+    while True:
+        rows, last = _stale_page(mem, after, max(1, batch), user_id, model)
+        if last is None:
+            break
+        after = last
+        if not rows:
+            continue
+        vecs = mem._embed_many([r["text"] for r in rows])
+        if mem.store is not None:
+            for r, v in zip(rows, vecs):
+                r.update(embedding=v, embedding_model=model, embedding_dim=mem.dim)
+            mem.store.upsert_rows(rows)
+        else:
+            params = {
+                "ids": [r["id"] for r in rows],
+                "texts": [r["text"] for r in rows],
+                "vecs": [_vec_literal(v) for v in vecs],
+                "model": model,
+                "dim": mem.dim,
+            }
+            with mem._connect() as conn, conn.cursor() as cur:
+                for sql in reembed_sql(mem.quant):
+                    cur.execute(sql, params)
+                conn.commit()
+        mem._invalidate(r["user_id"] for r in rows)
+        n += len(rows)
+    return {"model": model, "rows": n, **_rate(n, t0)}
@@ -0,0 +1,33 @@
+-- 20251017_memory_quantized.sql
+-- Opt-in quantized embedding storage (MEMORY_QUANT=halfvec, pgvector >= 0.7)
+--
+-- memory_item keeps a half-precision copy for the ANN index and the first
+-- search pass; full-precision vectors move to memory_item_fp and are read only
+-- when re-scoring the top candidates. Apply only when switching the adapter to
+-- MEMORY_QUANT=halfvec: afterwards memory_item.embedding is NULL.
+
+BEGIN;
+
+ALTER TABLE memory_item ADD COLUMN IF NOT EXISTS embedding_half halfvec(1024);
+
+CREATE TABLE IF NOT EXISTS memory_item_fp (
+  id        TEXT PRIMARY KEY REFERENCES memory_item(id) ON DELETE CASCADE,
+  embedding vector(1024) NOT NULL
+);
+
+INSERT INTO memory_item_fp (id, embedding)
+SELECT id, embedding FROM memory_item WHERE embedding IS NOT NULL
+ON CONFLICT (id) DO UPDATE SET embedding = EXCLUDED.embedding;
+
+UPDATE memory_item
+SET embedding_half = embedding::halfvec(1024), embedding = NULL
+WHERE embedding IS NOT NULL;
+
+-- the full-precision ANN index is dead weight now
+DROP INDEX IF EXISTS idx_memory_embedding_ivf;
+
+COMMIT;
+
+-- Then, outside a transaction:
+--   VACUUM FULL memory_item;   -- reclaim the old vector bytes
+--   python -m scripts.memory_cli index ensure   (with MEMORY_QUANT=halfvec)
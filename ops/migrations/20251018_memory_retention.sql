@@ -0,0 +1,38 @@
+-- 20251018_memory_retention.sql
+-- Access stats + archive table for the LRFU retention worker
+-- (mother/memory/retention.py, `python -m scripts.memory_cli retention ...`)
+--
+-- crf is the LRFU combined recency-frequency value as of ts_seen; retrieve
+-- hits add 1 after decaying the old value by the row's half-life. Existing
+-- rows start at one access. Rows with ttl_days = 0 (pinned, and everything
+-- written while MEMORY_TTL_DAYS was 0) are never evicted.
+
+BEGIN;
+
+ALTER TABLE memory_item ADD COLUMN IF NOT EXISTS access_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE memory_item ADD COLUMN IF NOT EXISTS crf DOUBLE PRECISION NOT NULL DEFAULT 1.0;
+
+-- evicted rows, minus their vectors (re-embed on restore)
+CREATE TABLE IF NOT EXISTS memory_item_archive (
+  id               TEXT PRIMARY KEY,
+  user_id          TEXT NOT NULL,
+  type             TEXT NOT NULL,
+  text             TEXT NOT NULL,
+  tags             TEXT[] DEFAULT '{}',
+  ts_created       TIMESTAMPTZ NOT NULL,
+  ts_seen          TIMESTAMPTZ NOT NULL,
+  confidence       REAL NOT NULL,
+  ttl_days         INTEGER NOT NULL,
+  retention_policy TEXT NOT NULL,
+  embedding_model  TEXT NOT NULL,
+  embedding_dim    INTEGER NOT NULL,
+  payload          JSONB NOT NULL DEFAULT '{}'::jsonb,
+  access_count     INTEGER NOT NULL,
+  crf              DOUBLE PRECISION NOT NULL,
+  score            DOUBLE PRECISION NOT NULL,
+  ts_archived      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_memory_archive_user ON memory_item_archive (user_id, ts_archived DESC);
+
+COMMIT;
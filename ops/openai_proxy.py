@@ -1,23 +1,140 @@
+import asyncio
+import importlib.util
+import json
+import logging
 import os
 import secrets
+import threading
+import time
+
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+import anyio
 import httpx
 
 UP = os.getenv("UPSTREAM", "http://vllm-5005:8000")
 API_KEY = os.getenv("OPENAI_PROXY_KEY")  # optional
+
+# One pooled keep-alive client for the process, created at startup. HTTP/2 is
+# negotiated by ALPN on https upstreams; plain http upstreams stay on HTTP/1.1
+# keep-alive. HTTP/2 needs the h2 package (pip install "httpx[http2]").
+HTTP2 = (
+    os.getenv("PROXY_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+)
+MAX_CONNECTIONS = int(os.getenv("PROXY_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("PROXY_MAX_KEEPALIVE", "20"))
+KEEPALIVE_S = float(os.getenv("PROXY_KEEPALIVE_S", "30"))
+CONNECT_TIMEOUT_S = float(os.getenv("PROXY_CONNECT_TIMEOUT_S", "5"))
+# max gap between upstream bytes, not the whole completion
+READ_TIMEOUT_S = float(os.getenv("PROXY_READ_TIMEOUT_S", "120"))
+POOL_TIMEOUT_S = float(os.getenv("PROXY_POOL_TIMEOUT_S", "10"))
+
+# per-connection headers are not forwarded in either direction
+HOP_BY_HOP = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+    "content-length",
+}
+PASSTHRU = ("content-type", "cache-control", "content-encoding")
+
+log = logging.getLogger("openai_proxy")
 app = FastAPI()
 
+MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
 
-@app.get("/health")
-async def health():
-    return {"ok": True, "upstream": UP}
 
+class Stats:
+    """Counters and upstream latency histograms, served from /stats."""
 
-@app.api_route(
-    "/v1/{path:path}",
-    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"],
-)
-async def proxy(path: str, request: Request):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(
+            (
+                "requests",
+                "streams",
+                "upstream_errors",
+                "disconnects",
+                "bytes_in",
+                "bytes_out",
+            ),
+            0,
+        )
+        self.ttfb = [0] * (len(MS_BUCKETS) + 1)  # until upstream headers
+        self.total = [0] * (len(MS_BUCKETS) + 1)  # until the last byte
+        self.total_sum = 0.0
+
+    @staticmethod
+    def _bucket(ms: float) -> int:
+        return next((i for i, b in enumerate(MS_BUCKETS) if ms <= b), len(MS_BUCKETS))
+
+    def inc(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += n
+
+    def record(self, ttfb_ms: float, total_ms: float, nbytes: int) -> None:
+        with self._lock:
+            self.ttfb[self._bucket(ttfb_ms)] += 1
+            self.total[self._bucket(total_ms)] += 1
+            self.total_sum += total_ms
+            self.counts["bytes_out"] += nbytes
+
+    def snapshot(self) -> dict:
+        def hist(counts):
+            le = [str(b) for b in MS_BUCKETS] + ["+Inf"]
+            return dict(zip(le, counts))
+
+        with self._lock:
+            done = sum(self.total)
+            return {
+                **self.counts,
+                "ttfb_ms": hist(self.ttfb),
+                "total_ms": hist(self.total),
+                "total_ms_mean": round(self.total_sum / done, 2) if done else None,
+            }
+
+
+stats = Stats()
+
+
+def make_client(transport: httpx.AsyncBaseTransport | None = None) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_S,
+        ),
+        timeout=httpx.Timeout(
+            READ_TIMEOUT_S,
+            connect=CONNECT_TIMEOUT_S,
+            pool=POOL_TIMEOUT_S,
+        ),
+        transport=transport,
+    )
+
+
+@app.on_event("startup")
+async def _open_client() -> None:
+    if getattr(app.state, "client", None) is None:
+        app.state.client = make_client()
+
+
+@app.on_event("shutdown")
+async def _close_client() -> None:
+    client = getattr(app.state, "client", None)
+    if client is not None:
+        await client.aclose()
+        app.state.client = None
+
+
+def _unauthorized(request: Request) -> Response | None:
     if API_KEY:
         key = request.headers.get("x-api-key") or ""
         if not secrets.compare_digest(key, API_KEY):
@@ -26,15 +143,144 @@ async def proxy(path: str, request: Request):
                 content=b'{"error":"unauthorized"}',
                 media_type="application/json",
             )
-    url = f"{UP}/v1/{path}"
-    headers = dict(request.headers)
-    headers.pop("host", None)
-    body = await request.body()
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.request(request.method, url, headers=headers, content=body)
-    passthru = {
-        k: v
-        for k, v in r.headers.items()
-        if k.lower() in ("content-type", "cache-control")
+    return None
+
+
+def _error(status: int, detail: str) -> Response:
+    return Response(
+        status_code=status,
+        content=json.dumps({"error": "upstream", "detail": detail}).encode(),
+        media_type="application/json",
+    )
+
+
+class UpstreamStream(StreamingResponse):
+    """Streams an upstream body; ``on_close`` runs however the stream ends
+    (completed, upstream error, client disconnect, or never started)."""
+
+    def __init__(self, *args, on_close, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.on_close()
+
+
+@app.get("/health")
+async def health():
+    return {"ok": True, "upstream": UP}
+
+
+@app.get("/stats")
+async def proxy_stats(request: Request):
+    denied = _unauthorized(request)
+    if denied is not None:
+        return denied
+    return {
+        "upstream": UP,
+        "http2": HTTP2,
+        "limits": {
+            "max_connections": MAX_CONNECTIONS,
+            "max_keepalive": MAX_KEEPALIVE,
+            "keepalive_s": KEEPALIVE_S,
+        },
+        **stats.snapshot(),
     }
-    return Response(content=r.content, status_code=r.status_code, headers=passthru)
+
+
+async def _send(request: Request, req: httpx.Request) -> httpx.Response | None:
+    # a non-streamed completion sends no headers until it is finished; stop
+    # waiting (and drop the upstream request) if the client goes away first
+    send = asyncio.ensure_future(app.state.client.send(req, stream=True))
+    while True:
+        done, _ = await asyncio.wait({send}, timeout=0.5)
+        if done:
+            return send.result()
+        if await request.is_disconnected():
+            send.cancel()
+            return None
+
+
+@app.api_route(
+    "/v1/{path:path}",
+    methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"],
+)
+async def proxy(path: str, request: Request):
+    denied = _unauthorized(request)
+    if denied is not None:
+        return denied
+    t0 = time.perf_counter()
+    stats.inc("requests")
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+    body = await request.body()
+    stats.inc("bytes_in", len(body))
+    req = app.state.client.build_request(
+        request.method,
+        f"{UP}/v1/{path}",
+        headers=headers,
+        params=request.query_params,
+        content=body,
+    )
+    try:
+        r = await _send(request, req)
+    except httpx.TimeoutException as e:
+        stats.inc("upstream_errors")
+        return _error(504, repr(e))
+    except httpx.HTTPError as e:
+        stats.inc("upstream_errors")
+        return _error(502, repr(e))
+    if r is None:
+        stats.inc("disconnects")
+        return Response(status_code=499)
+    ttfb = (time.perf_counter() - t0) * 1000.0
+    if r.headers.get("content-type", "").startswith("text/event-stream"):
+        stats.inc("streams")
+
+    sent = 0
+    state = "incomplete"  # -> "ok" | "upstream_error"; else the client left
+
+    async def body_iter():
+        # raw bytes: content-encoding is passed through, nothing is re-encoded
+        nonlocal sent, state
+        try:
+            async for chunk in r.aiter_raw():
+                sent += len(chunk)
+                yield chunk
+        except httpx.HTTPError:
+            # re-raised so the server aborts the response: the client sees a
+            # truncated body, not a clean end
+            state = "upstream_error"
+            stats.inc("upstream_errors")
+            raise
+        state = "ok"
+
+    async def on_close():
+        # closing the upstream response aborts the generation there
+        await r.aclose()
+        if state == "incomplete":
+            stats.inc("disconnects")
+        total = (time.perf_counter() - t0) * 1000.0
+        stats.record(ttfb, total, sent)
+        log.info(
+            "%s /v1/%s %d ttfb_ms=%.1f total_ms=%.1f bytes_in=%d bytes_out=%d %s",
+            req.method,
+            path,
+            r.status_code,
+            ttfb,
+            total,
+            len(body),
+            sent,
+            state,
+        )
+
+    passthru = {k: v for k, v in r.headers.items() if k.lower() in PASSTHRU}
+    return UpstreamStream(
+        body_iter(),
+        status_code=r.status_code,
+        headers=passthru,
+        on_close=on_close,
+    )
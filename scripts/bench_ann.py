@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# ANN benchmark: recall@k vs p95 latency for HNSW / IVFFlat on a scratch table.
+#
+# Needs a Postgres with pgvector (a local docker stand-in is fine):
+#   docker run -d -p 55433:5432 -e POSTGRES_PASSWORD=x pgvector/pgvector:pg16
+#   python scripts/bench_ann.py --dsn postgresql://postgres:x@localhost:55433/postgres
+#
+# Ground truth is exact top-k computed in NumPy; the table mirrors the
+# memory_item search shape (user_id filter + ORDER BY distance LIMIT k).
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import psycopg
+
+from mother.memory.index import IndexSpec, create_index_sql
+from mother.memory.sql import METRIC_OPS, search_settings_sql
+
+TABLE = "memory_item_bench"
+
+
+def synth(n, dim, seed=0, clusters=64):
+    # clustered data is closer to real embeddings than iid noise
+    rnd = np.random.default_rng(seed)
+    centers = rnd.standard_normal((clusters, dim)).astype(np.float32)
+    x = centers[rnd.integers(0, clusters, n)] + 0.35 * rnd.standard_normal(
+        (n, dim)
+    ).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def exact_topk(data, queries, k, metric, chunk=100_000):
+    # chunked so 1M x queries never materializes one full distance matrix
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), k), dtype=np.int64)
+    qn = (queries**2).sum(1)[:, None]
+    for lo in range(0, len(data), chunk):
+        part = data[lo : lo + chunk]
+        if metric == "l2":
+            d = qn - 2 * queries @ part.T + (part**2).sum(1)[None, :]
+        else:  # cosine / ip on unit vectors rank identically
+            d = -(queries @ part.T)
+        d = np.concatenate([best_d, d], axis=1)
+        i = np.concatenate(
+            [best_i, np.broadcast_to(np.arange(lo, lo + len(part)), d[:, k:].shape)],
+            axis=1,
+        )
+        sel = np.argpartition(d, k - 1, axis=1)[:, :k]
+        best_d = np.take_along_axis(d, sel, axis=1)
+        best_i = np.take_along_axis(i, sel, axis=1)
+    return [set(row.tolist()) for row in best_i]
+
+
+def load(conn, data, dim):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(
+            f"CREATE TABLE {TABLE} (id bigint PRIMARY KEY, user_id text NOT NULL,"
+            f" embedding vector({dim}))"
+        )
+        with cur.copy(f"COPY {TABLE} (id, user_id, embedding) FROM STDIN") as cp:
+            for i, v in enumerate(data):
+                cp.write_row((i, "bench", "[" + ",".join(f"{x:.6f}" for x in v) + "]"))
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def run_queries(conn, queries, k, op, settings):
+    sql = (
+        f"SELECT id FROM {TABLE} WHERE user_id = 'bench'"
+        f" ORDER BY embedding {op} %(q)s::vector LIMIT %(k)s"
+    )
+    lat, got = [], []
+    for q in queries:
+        lit = "[" + ",".join(f"{x:.6f}" for x in q) + "]"
+        t0 = time.perf_counter()
+        with conn.cursor() as cur:
+            with conn.pipeline():
+                cur.execute(
+                    search_settings_sql(settings["iterative_scan"] != "off"), settings
+                )
+                cur.execute(sql, {"q": lit, "k": k})
+                rows = cur.fetchall()
+        lat.append((time.perf_counter() - t0) * 1000.0)
+        conn.commit()
+        got.append({r[0] for r in rows})
+    return got, np.percentile(lat, 50), np.percentile(lat, 95)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--dsn", default=os.getenv("MOTHER_BENCH_DSN"), required=False)
+    ap.add_argument(
+        "--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000]
+    )
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--metric", default="cosine", choices=sorted(METRIC_OPS))
+    ap.add_argument("--methods", nargs="*", default=["hnsw", "ivfflat"])
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--ef", type=int, nargs="*", default=[20, 40, 80, 160])
+    ap.add_argument("--probes", type=int, nargs="*", default=[1, 5, 10, 20])
+    ap.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = ap.parse_args()
+    if not args.dsn:
+        ap.error("--dsn (or MOTHER_BENCH_DSN) is required")
+
+    op = METRIC_OPS[args.metric][1]
+    conn = psycopg.connect(args.dsn)
+    conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    conn.commit()
+    rnd = np.random.default_rng(1)
+    for n in args.sizes:
+        data = synth(n, args.dim)
+        queries = data[rnd.integers(0, n, args.queries)] + 0.05 * rnd.standard_normal(
+            (args.queries, args.dim)
+        ).astype(np.float32)
+        truth = exact_topk(data, queries, args.k, args.metric)
+        load(conn, data, args.dim)
+        for method in args.methods:
+            spec = IndexSpec(method=method, metric=args.metric)
+            ddl = create_index_sql(spec, rows=n).replace("memory_item", TABLE, 1)
+            ddl = ddl.replace(spec.name, f"{TABLE}_{method}")
+            t0 = time.perf_counter()
+            conn.execute(ddl)
+            conn.commit()
+            build_s = time.perf_counter() - t0
+            knobs = args.ef if method == "hnsw" else args.probes
+            for knob in knobs:
+                settings = spec.search_params(
+                    ef_search=knob if method == "hnsw" else None,
+                    probes=knob if method == "ivfflat" else None,
+                )
+                got, p50, p95 = run_queries(conn, queries, args.k, op, settings)
+                recall = float(
+                    np.mean([len(g & t) / args.k for g, t in zip(got, truth)])
+                )
+                print(
+                    json.dumps(
+                        {
+                            "rows": n,
+                            "dim": args.dim,
+                            "method": method,
+                            "ef_search" if method == "hnsw" else "probes": knob,
+                            "build_s": round(build_s, 2),
+                            f"recall@{args.k}": round(recall, 4),
+                            "p50_ms": round(float(p50), 2),
+                            "p95_ms": round(float(p95), 2),
+                        }
+                    ),
+                    flush=True,
+                )
+            conn.execute(f"DROP INDEX {TABLE}_{method}")
+            conn.commit()
+    if not args.keep:
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# Load generator for the interaction log (mother/core/memory.py): concurrent
+# /nudge/demo requests, req/s and latency per storage engine and
+# MOTHER_DB_DURABILITY, with one or more worker processes sharing the store.
+#
+#   python scripts/bench_core_memory.py --modes full group async --concurrency 32
+#   python scripts/bench_core_memory.py --workers 4 --modes group
+#   python scripts/bench_core_memory.py --engines sqlite postgres \
+#       --dsn postgresql://localhost/mother_bench --workers 4
+#   python scripts/bench_core_memory.py --url http://127.0.0.1:8000   # live server
+#
+# In-process runs drive mother.api through httpx's ASGI transport, so sync
+# endpoints execute on the server thread pool exactly as under uvicorn. Each
+# worker is a subprocess (like a uvicorn worker); all workers of a run share
+# one fresh SQLite file, or the --dsn database (use a scratch one: the tables
+# are created there and left behind).
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+
+async def _load(client, args):
+    lat = []
+    stop = time.perf_counter() + args.seconds
+    rnd = random.Random(7)
+
+    async def worker():
+        while time.perf_counter() < stop:
+            uid = f"u{rnd.randrange(args.users)}"
+            t0 = time.perf_counter()
+            r = await client.get("/nudge/demo", params={"user_id": uid})
+            r.raise_for_status()
+            lat.append((time.perf_counter() - t0) * 1000.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "requests": len(lat),
+        "req_s": round(len(lat) / elapsed, 1),
+        "p50_ms": round(lat[len(lat) // 2], 2),
+        "p95_ms": round(lat[int(len(lat) * 0.95)], 2),
+    }
+
+
+async def _run_inproc(args):
+    from mother import api
+    from mother.core import memory
+
+    if args.init:
+        memory.init_db()
+        memory.shutdown()
+        return {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        out = await _load(c, args)
+    # trees from before the writer thread have no shutdown()
+    getattr(memory, "shutdown", lambda: None)()
+    return out
+
+
+async def _run_url(args):
+    async with httpx.AsyncClient(base_url=args.url) as c:
+        return await _load(c, args)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="core memory write-path benchmark")
+    ap.add_argument("--modes", nargs="*", default=["full", "group", "async"])
+    ap.add_argument("--engines", nargs="*", default=["sqlite"])
+    ap.add_argument("--dsn", default=os.getenv("MOTHER_DB_DSN"))
+    ap.add_argument("--workers", type=int, default=1, help="processes per run")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--url", default=None, help="benchmark a running server")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--init", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.url:
+        print(json.dumps({"url": args.url, **asyncio.run(_run_url(args))}))
+        return
+    if args.worker:
+        print(json.dumps(asyncio.run(_run_inproc(args))))
+        return
+    for engine in args.engines:
+        if engine == "postgres" and not args.dsn:
+            print(json.dumps({"engine": engine, "skipped": "no --dsn"}), flush=True)
+            continue
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory(prefix="bench_core_") as d:
+                env = {
+                    **os.environ,
+                    "MOTHER_DB_ENGINE": engine,
+                    "MOTHER_DB_PATH": os.path.join(d, "mother.db"),
+                    "MOTHER_DB_DURABILITY": mode,
+                }
+                if args.dsn:
+                    env["MOTHER_DB_DSN"] = args.dsn
+                out = _run_workers(args, env)
+                print(
+                    json.dumps({"engine": engine, "durability": mode, **out}),
+                    flush=True,
+                )
+
+
+def _run_workers(args, env):
+    # schema first, so workers do not race on DDL
+    cmd = [sys.executable, __file__, "--worker"]
+    _check(subprocess.run(cmd + ["--init"], env=env, capture_output=True, text=True))
+    cmd += ["--concurrency", str(args.concurrency)]
+    cmd += ["--seconds", str(args.seconds), "--users", str(args.users)]
+    procs = [
+        subprocess.Popen(
+            cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        for _ in range(max(1, args.workers))
+    ]
+    outs = []
+    for p in procs:
+        stdout, stderr = p.communicate()
+        _check(subprocess.CompletedProcess(p.args, p.returncode, stdout, stderr))
+        outs.append(json.loads(stdout.strip().splitlines()[-1]))
+    if len(outs) == 1:
+        return outs[0]
+    return {
+        "workers": len(outs),
+        "requests": sum(o["requests"] for o in outs),
+        "req_s": round(sum(o["req_s"] for o in outs), 1),
+        # per-worker percentiles; the worst worker bounds the tail
+        "p50_ms": max(o["p50_ms"] for o in outs),
+        "p95_ms": max(o["p95_ms"] for o in outs),
+    }
+
+
+def _check(res):
+    if res.returncode != 0:
+        sys.exit(res.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Microbenchmark: HashEmbedder texts/sec, pure-Python reference vs NumPy paths.
+import argparse
+import json
+import random
+import string
+import time
+
+from mother.memory.embedders import HashEmbedder, _hash_embed_py
+
+
+def _texts(n, seed=7):
+    rnd = random.Random(seed)
+    alphabet = string.ascii_lowercase + string.digits + " /.:-"
+    return [
+        "".join(rnd.choice(alphabet) for _ in range(rnd.randint(8, 120)))
+        for _ in range(n)
+    ]
+
+
+def _rate(fn, texts, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return len(texts) / best if best > 0 else float("inf")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--n", type=int, default=2000, help="texts per run")
+    ap.add_argument("--dims", type=int, nargs="*", default=[384, 768, 1024])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    texts = _texts(args.n)
+    out = []
+    for dim in args.dims:
+        emb = HashEmbedder(_dim=dim)
+        row = {
+            "dim": dim,
+            "python_loop": _rate(
+                lambda ts: [_hash_embed_py(t, dim) for t in ts], texts, args.repeat
+            ),
+            "embed": _rate(lambda ts: [emb.embed(t) for t in ts], texts, args.repeat),
+            "embed_batch": _rate(emb.embed_batch, texts, args.repeat),
+        }
+        out.append(
+            {k: (round(v, 1) if isinstance(v, float) else v) for k, v in row.items()}
+        )
+        print(json.dumps(out[-1]))
+
+
+if __name__ == "__main__":
+    main()
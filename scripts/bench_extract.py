@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Auto-remember fact extraction (mother/memory/extract.py): time per message
+# for the scanner vs the original finditer loop, on chat-like text and on
+# dashed/dotted log noise, from 1 KB to 1 MB. Budgets are off so both sides
+# scan everything; the legacy loop is skipped where a single call would take
+# longer than --legacy-cap seconds.
+#
+#   python scripts/bench_extract.py
+#   python scripts/bench_extract.py --sizes 1024 65536 --repeat 20
+import argparse
+import json
+import random
+import time
+
+from mother.memory.extract import (
+    extract_candidate_facts,
+    extract_candidate_facts_legacy,
+)
+
+CHAT = [
+    "the", "repo", "is", "at", "/root/genomics-stack", "and", "postgres", "runs",
+    "on", "10.10.10.12:5432", "see", "build.example.com", "for", "logs", "ok.",
+    "please", "check", "/mnt/data/raw", "192.168.1.20:22", "\n",
+]  # fmt: skip
+
+
+def _text(kind, size, rnd):
+    parts, n = [], 0
+    while n < size:
+        if kind == "chat":
+            w = rnd.choice(CHAT)
+        else:  # log noise: long [-a-z0-9.] runs with no host in them
+            w = "-".join(rnd.choice("abc123") for _ in range(rnd.randint(50, 400)))
+        parts.append(w)
+        n += len(w) + 1
+    return " ".join(parts)[:size]
+
+
+def _time(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--sizes", type=int, nargs="+", default=[1 << 10, 1 << 14, 1 << 17, 1 << 20]
+    )
+    ap.add_argument("--kinds", nargs="+", default=["chat", "noise"])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--legacy-cap", type=float, default=5.0)
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+
+    def new(t):
+        return extract_candidate_facts(t, max_chars=0, budget_ms=None)
+
+    for kind in args.kinds:
+        legacy_ok = True
+        for size in args.sizes:
+            text = _text(kind, size, rnd)
+            row = {"kind": kind, "bytes": size}
+            row["scanner_ms"] = round(_time(new, text, args.repeat) * 1000, 3)
+            if legacy_ok:
+                t = _time(extract_candidate_facts_legacy, text, 1)
+                if t < args.legacy_cap:
+                    t = min(t, _time(extract_candidate_facts_legacy, text, args.repeat))
+                else:
+                    legacy_ok = False  # larger sizes only get slower
+                row["legacy_ms"] = round(t * 1000, 3)
+                row["speedup"] = round(
+                    row["legacy_ms"] / max(row["scanner_ms"], 1e-6), 1
+                )
+                if new(text) != extract_candidate_facts_legacy(text):
+                    row["mismatch"] = True
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# Quantized embedding storage: size and retrieval latency, before vs after.
+#
+#   pg:    full-precision memory_item vs halfvec memory_item + memory_item_fp,
+#          each in its own scratch schema with an HNSW index, queried through
+#          the adapter's own SQL (search_memory_sql with/without re-scoring).
+#            python scripts/bench_quantized.py pg --dsn postgresql://... --rows 1000000
+#   local: LocalVectorStore with float32 / float16 / int8 storage.
+#            python scripts/bench_quantized.py local --rows 1000000
+#
+# Vectors are generated chunk by chunk from fixed seeds so 1M x 1024 never has
+# to sit in RAM; exact top-k (for recall@k) streams over the same chunks.
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from mother.memory.index import IndexSpec, create_index_sql
+from mother.memory.local_store import LocalVectorStore
+from mother.memory.sql import search_memory_sql, search_settings_sql
+
+CHUNK = 50_000
+
+
+def chunks(n, dim, clusters=64):
+    centers = np.random.default_rng(0).standard_normal((clusters, dim))
+    for lo in range(0, n, CHUNK):
+        rnd = np.random.default_rng(lo + 1)
+        m = min(CHUNK, n - lo)
+        x = centers[rnd.integers(0, clusters, m)] + 0.35 * rnd.standard_normal((m, dim))
+        x = (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+        yield lo, x
+
+
+def make_queries(n, dim, count, seed=1):
+    _, first = next(chunks(min(n, CHUNK), dim))
+    rnd = np.random.default_rng(seed)
+    q = first[rnd.integers(0, len(first), count)]
+    q = q + 0.05 * rnd.standard_normal(q.shape).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def exact_topk(n, dim, queries, k):
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), k), dtype=np.int64)
+    for lo, x in chunks(n, dim):
+        d = np.concatenate([best_d, 1.0 - queries @ x.T], axis=1)
+        ids = np.broadcast_to(np.arange(lo, lo + len(x)), (len(queries), len(x)))
+        i = np.concatenate([best_i, ids], axis=1)
+        sel = np.argpartition(d, k - 1, axis=1)[:, :k]
+        best_d = np.take_along_axis(d, sel, axis=1)
+        best_i = np.take_along_axis(i, sel, axis=1)
+    return [{str(j) for j in row} for row in best_i]
+
+
+def summarize(label, lat, got, truth, k, **extra):
+    recall = float(np.mean([len(g & t) / k for g, t in zip(got, truth)]))
+    return {
+        "storage": label,
+        **extra,
+        f"recall@{k}": round(recall, 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+    }
+
+
+def _lit(v):
+    return "[" + ",".join(f"{x:.6f}" for x in v) + "]"
+
+
+def run_pg(args, queries, truth):
+    import psycopg
+
+    conn = psycopg.connect(args.dsn, autocommit=True)
+    conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    for quant in ("none", "halfvec"):
+        schema = f"memory_bench_{quant}"
+        conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute(f"SET search_path TO {schema}, public")
+        col = "embedding_half" if quant == "halfvec" else "embedding"
+        conn.execute(
+            "CREATE TABLE memory_item (id text PRIMARY KEY, user_id text NOT NULL,"
+            " type text NOT NULL DEFAULT 'semantic', text text NOT NULL DEFAULT '',"
+            " tags text[] DEFAULT '{}', ts_created timestamptz DEFAULT now(),"
+            " ts_seen timestamptz DEFAULT now(), confidence real DEFAULT 0.9,"
+            " ttl_days int DEFAULT 0, retention_policy text DEFAULT 'LRFU(21d)',"
+            " embedding_model text DEFAULT 'bench', embedding_dim int DEFAULT 0,"
+            f" embedding vector({args.dim}), embedding_half halfvec({args.dim}),"
+            " payload jsonb DEFAULT '{}')"
+        )
+        if quant == "halfvec":
+            conn.execute(
+                "CREATE TABLE memory_item_fp (id text PRIMARY KEY"
+                " REFERENCES memory_item(id), embedding vector(%d) NOT NULL)" % args.dim
+            )
+        t0 = time.perf_counter()
+        with conn.cursor() as cur:
+            for lo, x in chunks(args.rows, args.dim):
+                with conn.transaction():
+                    with cur.copy(
+                        f"COPY memory_item (id, user_id, {col}) FROM STDIN"
+                    ) as cp:
+                        for i, v in enumerate(x, lo):
+                            cp.write_row((str(i), "bench", _lit(v)))
+                    if quant == "halfvec":
+                        with cur.copy(
+                            "COPY memory_item_fp (id, embedding) FROM STDIN"
+                        ) as cp:
+                            for i, v in enumerate(x, lo):
+                                cp.write_row((str(i), _lit(v)))
+        spec = IndexSpec(method="hnsw", metric="cosine", quant=quant)
+        conn.execute(create_index_sql(spec, rows=args.rows))
+        conn.execute("VACUUM ANALYZE memory_item")
+        load_s = time.perf_counter() - t0
+        sizes = conn.execute(
+            "SELECT pg_table_size('memory_item'), pg_indexes_size('memory_item'),"
+            " coalesce(pg_total_relation_size(to_regclass('memory_item_fp')), 0)"
+        ).fetchone()
+        sql = search_memory_sql("cosine", quant=quant)
+        settings = spec.search_params(ef_search=args.ef_search)
+        lat, got = [], []
+        for q in queries:
+            params = {
+                "user_id": "bench",
+                "query_vec": _lit(q),
+                "limit": args.k,
+                "rescore": args.k * args.rescore_factor,
+                "types": None,
+                "tags": None,
+            }
+            t0 = time.perf_counter()
+            with conn.transaction(), conn.cursor() as cur:
+                cur.execute(search_settings_sql(spec.iterative), settings)
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            got.append({r[0] for r in rows})
+        print(
+            json.dumps(
+                summarize(
+                    quant,
+                    lat,
+                    got,
+                    truth,
+                    args.k,
+                    rows=args.rows,
+                    load_s=round(load_s, 1),
+                    table_mb=round(sizes[0] / 2**20, 1),
+                    index_mb=round(sizes[1] / 2**20, 1),
+                    fp_table_mb=round(sizes[2] / 2**20, 1),
+                )
+            ),
+            flush=True,
+        )
+        if not args.keep:
+            conn.execute("RESET search_path")
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+    conn.close()
+
+
+def _row(i, v, dim):
+    return {
+        "id": str(i),
+        "user_id": "bench",
+        "type": "semantic",
+        "text": "",
+        "tags": [],
+        "confidence": 0.9,
+        "ttl_days": 0,
+        "retention_policy": "LRFU(21d)",
+        "embedding_model": "bench",
+        "embedding_dim": dim,
+        "embedding": v,
+        "payload": "{}",
+    }
+
+
+def _du(path):
+    # allocated bytes, so sparse tails of the preallocated memmaps do not count
+    return sum(os.stat(os.path.join(path, f)).st_blocks * 512 for f in os.listdir(path))
+
+
+def run_local(args, queries, truth):
+    for dtype in ("float32", "float16", "int8"):
+        path = tempfile.mkdtemp(prefix=f"bench_quant_{dtype}_")
+        store = LocalVectorStore(path, dim=args.dim, dtype=dtype)
+        t0 = time.perf_counter()
+        for lo, x in chunks(args.rows, args.dim):
+            store.upsert_rows([_row(i, v, args.dim) for i, v in enumerate(x, lo)])
+        load_s = time.perf_counter() - t0
+        lat, got = [], []
+        for q in queries:
+            params = {
+                "user_id": "bench",
+                "query_vec": q,
+                "limit": args.k,
+                "rescore": args.k * args.rescore_factor,
+            }
+            t0 = time.perf_counter()
+            rows = store.search(params, "cosine")
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            got.append({r["id"] for r in rows})
+        st = store.stats()
+        store.close()
+        print(
+            json.dumps(
+                summarize(
+                    dtype,
+                    lat,
+                    got,
+                    truth,
+                    args.k,
+                    rows=args.rows,
+                    load_s=round(load_s, 1),
+                    searched_mb=round(st["vector_bytes"] / 2**20, 1),
+                    disk_mb=round(_du(path) / 2**20, 1),
+                )
+            ),
+            flush=True,
+        )
+        if not args.keep:
+            shutil.rmtree(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="quantized storage benchmark")
+    ap.add_argument("backend", choices=["pg", "local"])
+    ap.add_argument("--dsn", default=os.getenv("MOTHER_BENCH_DSN"))
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--rescore-factor", type=int, default=4)
+    ap.add_argument("--ef-search", type=int, default=80)
+    ap.add_argument("--keep", action="store_true", help="keep scratch data")
+    args = ap.parse_args()
+    if args.backend == "pg" and not args.dsn:
+        ap.error("--dsn (or MOTHER_BENCH_DSN) is required for pg")
+
+    queries = make_queries(args.rows, args.dim, args.queries)
+    truth = exact_topk(args.rows, args.dim, queries, args.k)
+    (run_pg if args.backend == "pg" else run_local)(args, queries, truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import json
 from mother.memory.adapter import MemoryAdapter
+from mother.memory.transfer import export_items, import_items, reembed_items
 
 
 def cmd_upsert(args: argparse.Namespace) -> None:
@@ -15,6 +16,7 @@ def cmd_upsert(args: argparse.Namespace) -> None:
         pin=args.pin,
         payload=json.loads(args.payload) if args.payload else None,
         confidence=float(args.confidence),
+        dedupe=args.dedupe,
     )
     print(json.dumps({"id": vid, "ok": True}, ensure_ascii=False, default=str))
 
@@ -27,10 +29,56 @@ def cmd_search(args: argparse.Namespace) -> None:
         limit=args.limit,
         types=args.types,
         tags=args.tags,
+        mode=args.mode,
     )
     print(json.dumps({"results": rows}, ensure_ascii=False, default=str))
 
 
+def cmd_index(args: argparse.Namespace) -> None:
+    mem = MemoryAdapter()
+    if args.method:
+        mem.index.method = args.method
+    action = {
+        "ensure": mem.ensure_index,
+        "rebuild": mem.rebuild_index,
+        "status": mem.index_status,
+    }[args.action]
+    print(json.dumps(action(), ensure_ascii=False, default=str))
+
+
+def cmd_retention(args: argparse.Namespace) -> None:
+    mem = MemoryAdapter(track_access=False)
+    kwargs = {"archive": not args.no_archive}
+    if args.batch:
+        kwargs["batch_size"] = args.batch
+    if args.min_score is not None:
+        kwargs["min_score"] = args.min_score
+    worker = mem.retention_worker(**kwargs)
+    report = worker.sweep(dry_run=args.action == "report", max_batches=args.max_batches)
+    print(json.dumps(report, ensure_ascii=False, default=str))
+
+
+def cmd_export(args: argparse.Namespace) -> None:
+    mem = MemoryAdapter(track_access=False)
+    report = export_items(
+        mem, args.out, user_id=args.user, batch=args.batch, resume=not args.restart
+    )
+    print(json.dumps(report, ensure_ascii=False, default=str))
+
+
+def cmd_import(args: argparse.Namespace) -> None:
+    mem = MemoryAdapter(track_access=False)
+    report = import_items(mem, args.src, batch=args.batch, resume=not args.restart)
+    print(json.dumps(report, ensure_ascii=False, default=str))
+
+
+def cmd_reembed(args: argparse.Namespace) -> None:
+    # the target model comes from EMBEDDING_MODEL, as everywhere else
+    mem = MemoryAdapter(track_access=False)
+    report = reembed_items(mem, batch=args.batch, user_id=args.user)
+    print(json.dumps(report, ensure_ascii=False, default=str))
+
+
 def main(argv: list[str] | None = None) -> None:
     p = argparse.ArgumentParser(description="mother memory CLI (pgvector)")
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -47,6 +95,12 @@ def main(argv: list[str] | None = None) -> None:
     u.add_argument("--pin", action="store_true", default=False)
     u.add_argument("--payload", default=None, help="JSON string")
     u.add_argument("--confidence", default="0.9")
+    u.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="merge into a near-duplicate (default: MEMORY_DEDUPE)",
+    )
     u.set_defaults(func=cmd_upsert)
 
     s = sub.add_parser("search", help="search memory items")
@@ -55,8 +109,40 @@ def main(argv: list[str] | None = None) -> None:
     s.add_argument("--limit", type=int, default=10)
     s.add_argument("--types", nargs="*", default=None)
     s.add_argument("--tags", nargs="*", default=None)
+    s.add_argument("--mode", choices=["vector", "hybrid"], default=None)
     s.set_defaults(func=cmd_search)
 
+    ix = sub.add_parser("index", help="manage the ANN index on memory_item")
+    ix.add_argument("action", choices=["ensure", "rebuild", "status"])
+    ix.add_argument("--method", choices=["hnsw", "ivfflat", "none"], default=None)
+    ix.set_defaults(func=cmd_index)
+
+    rt = sub.add_parser("retention", help="LRFU eviction (report = dry run)")
+    rt.add_argument("action", choices=["report", "sweep"])
+    rt.add_argument("--batch", type=int, default=None, help="rows per page")
+    rt.add_argument("--max-batches", type=int, default=None)
+    rt.add_argument("--min-score", type=float, default=None)
+    rt.add_argument("--no-archive", action="store_true", default=False)
+    rt.set_defaults(func=cmd_retention)
+
+    ex = sub.add_parser("export", help="stream memory_item to NDJSON")
+    ex.add_argument("--out", required=True)
+    ex.add_argument("--user", default=None)
+    ex.add_argument("--batch", type=int, default=1000)
+    ex.add_argument("--restart", action="store_true", help="ignore existing output")
+    ex.set_defaults(func=cmd_export)
+
+    im = sub.add_parser("import", help="load an NDJSON export (batched upserts)")
+    im.add_argument("src")
+    im.add_argument("--batch", type=int, default=500)
+    im.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    im.set_defaults(func=cmd_import)
+
+    re_ = sub.add_parser("reembed", help="re-embed rows with the current model")
+    re_.add_argument("--user", default=None)
+    re_.add_argument("--batch", type=int, default=256)
+    re_.set_defaults(func=cmd_reembed)
+
     args = p.parse_args(argv)
     args.func(args)
 
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.async_adapter import AsyncMemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+from mother.memory.local_store import LocalVectorStore  # noqa: E402
+from mother.memory.service import ChatMemory, MemoryService  # noqa: E402
+
+USER = "u_bench"  # the user test_bench_service.py recalls for
+N_FACTS = 2000
+
+REPLY = (
+    "Acknowledged. Using /root/genomics-stack and postgres at 10.10.10.1:5434; "
+    "artifacts go to s3.internal.example.com and logs to /var/log/mother. "
+) * 4
+
+
+def echo_llm(prompt):
+    return REPLY
+
+
+@pytest.fixture(scope="session")
+def mem(tmp_path_factory):
+    # embedded store + hash embedder: no Postgres or model download needed;
+    # no recall cache, so every recall is a real search
+    svc = MemoryService(
+        adapter=AsyncMemoryAdapter(
+            dsn="unused",
+            embedder=HashEmbedder(_dim=256),
+            recall_cache=None,
+            store=LocalVectorStore(str(tmp_path_factory.mktemp("store")), dim=256),
+        )
+    )
+    svc.remember_async = False  # measure the write, not the queue
+    svc.remember_many(
+        {
+            "user_id": USER,
+            "text": f"fact {i}: service-{i % 97} runs on host{i}.example.com",
+            "type": "semantic" if i % 3 else "autobio",
+        }
+        for i in range(N_FACTS)
+    )
+    yield svc
+    svc.close()
+
+
+@pytest.fixture(scope="session")
+def chat(mem):
+    return ChatMemory(echo_llm, mem, k=5)
+
+
+@pytest.fixture
+def history():
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " * 20}
+        for i in range(20)
+    ]
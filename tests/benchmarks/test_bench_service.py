@@ -0,0 +1,45 @@
+# Hot-path benchmarks for mother.memory.service (pytest-benchmark):
+#
+#   pytest tests/benchmarks --benchmark-only --benchmark-autosave
+#   pytest tests/benchmarks --benchmark-only \
+#       --benchmark-compare --benchmark-compare-fail=median:20%
+#
+# In a plain ``pytest`` run each benchmark executes as an ordinary test.
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from mother.memory.extract import extract_candidate_facts  # noqa: E402
+from mother.memory.service import assemble_prompt  # noqa: E402
+
+USER = "u_bench"
+MSG = "where does the genomics service run and which postgres does it use?"
+
+
+def test_recall(benchmark, chat):
+    facts = benchmark(chat.recall_facts, USER, MSG)
+    assert len(facts) == chat.k
+
+
+def test_prompt_build(benchmark, chat, history):
+    facts = chat.recall_facts(USER, MSG)
+    prompt, packed = benchmark(assemble_prompt, history, MSG, facts, chat.budget)
+    assert packed.facts and prompt.endswith("Assistant:")
+
+
+def test_extract(benchmark, chat):
+    text = (MSG + " " + chat.call_llm(MSG)) * 8  # ~5 KB
+    assert benchmark(extract_candidate_facts, MSG, text)
+
+
+def test_remember(benchmark, mem):
+    items = [
+        {"user_id": USER, "text": f"bench note {i} at /root/notes/{i}", "pin": True}
+        for i in range(16)
+    ]
+    assert len(benchmark(mem.remember_many, items)) == 16
+
+
+def test_handle(benchmark, chat, history):
+    out = benchmark(chat.handle, user_id=USER, history=history, user_msg=MSG)
+    assert out["facts_used"] and out["facts_saved"]
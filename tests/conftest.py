@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def pg_dsn():
+    # Postgres-backed tests run only against a scratch database named here
+    dsn = os.getenv("MOTHER_TEST_DSN")
+    if not dsn:
+        pytest.skip("MOTHER_TEST_DSN not set")
+    pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    return dsn
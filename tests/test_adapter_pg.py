@@ -0,0 +1,146 @@
+import uuid
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.adapter import MemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+
+
+class _SlashBlindEmbedder(HashEmbedder):
+    def embed_batch(self, texts):
+        return super().embed_batch([t.rstrip("/") for t in texts])
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+@pytest.fixture
+def mem(pg_dsn):
+    # a migrated scratch database (ops/migrations); rows are per-test users
+    import psycopg
+
+    with psycopg.connect(pg_dsn) as conn:
+        if conn.execute("SELECT to_regclass('memory_item')").fetchone()[0] is None:
+            pytest.skip("memory tables not migrated")
+    mem = MemoryAdapter(
+        dsn=pg_dsn,
+        embedder=_SlashBlindEmbedder(_dim=1024),
+        recall_cache=None,
+        quant="none",
+        dedupe=True,
+    )
+    mem.test_users = [f"t-{uuid.uuid4().hex[:8]}" for _ in range(2)]
+    yield mem
+    with psycopg.connect(pg_dsn) as conn:
+        conn.execute(
+            "DELETE FROM memory_item WHERE user_id = ANY(%s)", (mem.test_users,)
+        )
+
+
+def test_dedupe_rows_sql_path(mem):
+    u1, u2 = mem.test_users
+    first = mem.upsert(u1, "/root/genomics-stack", tags=["path"], confidence=0.8)
+    # one pipelined executemany(returning=True); one result set per row
+    ids = mem.upsert_many(
+        [
+            {"user_id": u1, "text": "/root/genomics-stack/", "tags": ["repo"]},
+            {"user_id": u1, "text": "likes tea"},
+            {"user_id": u2, "text": "/root/genomics-stack/"},
+            {"user_id": u2, "text": "/root/genomics-stack"},
+        ]
+    )
+    assert ids[0] == first and ids[1] != first and ids[2] != first
+    assert ids[3] == ids[2]  # merged into the row written just before it
+    hit = mem.retrieve(u1, "/root/genomics-stack", limit=1)[0]
+    assert hit["id"] == first and hit["tags"] == ["path", "repo"]
+    assert hit["confidence"] == pytest.approx(0.95)
+
+
+def test_dedupe_sql_leaves_stored_ids_in_place(mem):
+    u1, _ = mem.test_users
+    items = [
+        {"user_id": u1, "text": "/root/genomics-stack"},
+        {"user_id": u1, "text": "/root/genomics-stack/"},
+    ]
+    ids = mem.upsert_many(items, dedupe=False)
+    assert mem.upsert_many(items) == ids
+
+
+class _PipelineCursor:
+    # results queued in a pipeline reach a cursor in order, so a pending
+    # SELECT ends up ahead of executemany's result sets (as in psycopg)
+    def __init__(self, conn):
+        self.connection = conn
+        self.sets = []
+
+    def execute(self, sql, params=None):
+        self.sets.append([{"set_config": "40"}])
+        return self
+
+    def executemany(self, sql, rows, returning=False):
+        self.sets.extend([[{"id": r["id"]}] for r in rows])
+
+    def fetchone(self):
+        return self.sets[0][0]
+
+    def nextset(self):
+        self.sets.pop(0)
+        return bool(self.sets) or None
+
+
+class _PipelineConn:
+    def pipeline(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return _PipelineCursor(self)
+
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
+
+
+def test_dedupe_rows_maps_each_row_to_its_own_result():
+    mem = MemoryAdapter(dsn="unused", embedder=HashEmbedder(_dim=8), recall_cache=None)
+    rows = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    cur = _PipelineConn().cursor()
+    assert mem._dedupe_rows(cur, rows) == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_dedupe_rows_returns_id_mapping_on_postgres(mem):
+    u1, _ = mem.test_users
+    first = mem.upsert(u1, "/root/genomics-stack")
+    n1, n2 = f"{u1}-1", f"{u1}-2"
+    rows = mem._chunk_rows(
+        [n1, n2],
+        [
+            {"user_id": u1, "text": "/root/genomics-stack/"},
+            {"user_id": u1, "text": "likes tea"},
+        ],
+        mem._embed_many(["/root/genomics-stack/", "likes tea"]),
+    )
+    with mem._connect() as conn, conn.cursor() as cur:
+        out = mem._dedupe_rows(cur, list(rows.values()))
+        conn.commit()
+    assert out == {n1: first, n2: n2}
+
+
+def test_retrieve_fills_limit_for_a_minority_user(mem):
+    # the user_id filter runs after the ANN scan: ef_search must cover limit
+    u1, u2 = mem.test_users
+    mem.ensure_index()
+    mem.upsert_many(
+        [{"user_id": u2, "text": f"fact {i}"} for i in range(400)], dedupe=False
+    )
+    mem.upsert_many(
+        [{"user_id": u1, "text": f"fact {i}"} for i in range(60)], dedupe=False
+    )
+    rows = mem.retrieve(u1, "fact 7", limit=50)
+    assert len(rows) == 50 and {r["user_id"] for r in rows} == {u1}
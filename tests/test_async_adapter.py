@@ -0,0 +1,65 @@
+import asyncio
+
+import psycopg
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.async_adapter import AsyncMemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+
+
+class _FakeConn:
+    closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+
+def test_unpooled_aconnect_opens_a_connection_per_call(monkeypatch):
+    opened = []
+
+    async def connect(dsn, **kwargs):
+        opened.append((dsn, kwargs))
+        return _FakeConn()
+
+    monkeypatch.setattr(psycopg.AsyncConnection, "connect", connect)
+    mem = AsyncMemoryAdapter(
+        dsn="dbname=x", embedder=HashEmbedder(_dim=8), pooled=False
+    )
+
+    async def run():
+        async with mem._aconnect() as conn:
+            assert not conn.closed
+        return conn
+
+    conn = asyncio.run(run())
+    assert conn.closed and len(opened) == 1 and opened[0][0] == "dbname=x"
+    assert mem._apool is None
+    assert mem.apool_stats() == {"pooled": False}
+
+
+class _NoExecutor:
+    def submit(self, *a, **k):
+        raise AssertionError("aembed hopped through the executor")
+
+
+def test_aembed_awaits_the_batching_embedder():
+    from mother.memory.batching import BatchingEmbedder
+    from mother.memory.cache import CachedEmbedder, EmbeddingCache
+
+    batcher = BatchingEmbedder(HashEmbedder(_dim=8), max_wait_ms=1)
+    emb = CachedEmbedder(batcher, EmbeddingCache(max_entries=16, path=None))
+    mem = AsyncMemoryAdapter(dsn="dbname=x", embedder=emb, executor=_NoExecutor())
+
+    async def run():
+        return await mem.aembed("hello"), await mem.aembed("hello")
+
+    first, again = asyncio.run(run())
+    batcher.close()
+    assert first == again == HashEmbedder(_dim=8).embed("hello")
+    assert batcher.stats()["texts"] == 1
+    assert emb.stats()["hits_mem"] == 1 and emb.stats()["misses"] == 1
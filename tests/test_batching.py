@@ -0,0 +1,77 @@
+import asyncio
+import threading
+
+import pytest
+
+from mother.memory.batching import BatchingEmbedder
+
+
+class Model:
+    dim = 2
+    name = "stub"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model down")
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def test_concurrent_calls_share_a_batch():
+    model = Model()
+    emb = BatchingEmbedder(model, max_batch=8, max_wait_ms=200)
+    start = threading.Barrier(4)
+    out = {}
+
+    def call(t):
+        start.wait()
+        out[t] = emb.embed(t)
+
+    threads = [threading.Thread(target=call, args=("x" * n,)) for n in range(1, 5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert out == {"x" * n: [float(n), 1.0] for n in range(1, 5)}
+    assert len(model.calls) < 4 and sum(map(len, model.calls)) == 4
+    # a call of max_batch texts or more skips the queue
+    assert len(emb.embed_batch(["a"] * 8)) == 8 and model.calls[-1] == ["a"] * 8
+    emb.close()
+    s = emb.stats()
+    assert s["texts"] == 4 and s["bypass"] == 1
+
+
+def test_model_errors_reach_every_caller_and_the_worker_survives():
+    model = Model(fail=True)
+    emb = BatchingEmbedder(model, max_batch=8, max_wait_ms=20)
+    futs = emb.submit(["a", "b"])
+    for f in futs:
+        with pytest.raises(RuntimeError, match="model down"):
+            f.result(timeout=5)
+    model.fail = False
+
+    async def go():
+        return await emb.aembed("abc")
+
+    assert asyncio.run(go()) == [3.0, 1.0]
+    assert emb.stats()["errors"] == 1
+    emb.close()
+
+
+def test_calls_after_close_raise():
+    emb = BatchingEmbedder(Model(), max_batch=4, max_wait_ms=1)
+    assert emb.embed("a") == [1.0, 1.0]
+    emb.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        emb.embed("a")
+    with pytest.raises(RuntimeError, match="closed"):
+        emb.embed_batch(["a"] * 4)
+    with pytest.raises(RuntimeError, match="closed"):
+        asyncio.run(emb.aembed("a"))
@@ -0,0 +1,30 @@
+import pytest
+
+from mother.memory.context import ContextBudget, approx_tokens, mmr, pack_context
+
+
+def test_mmr_skips_near_duplicates():
+    pytest.importorskip("numpy")
+    rows = [
+        {"text": "repo /root/a", "score": 0.95, "embedding": [1.0, 0.0, 0.0]},
+        {"text": "repo /root/a ", "score": 0.94, "embedding": [0.99, 0.01, 0.0]},
+        {"text": "db 10.0.0.1", "score": 0.80, "embedding": [0.0, 1.0, 0.0]},
+    ]
+    out = mmr(rows, 2, lambda_=0.5)
+    assert [r["text"] for r in out] == ["repo /root/a", "db 10.0.0.1"]
+    assert "embedding" not in out[0]
+    assert [r["text"] for r in mmr(rows, 2, lambda_=1.0)][1] == "repo /root/a "
+
+
+def test_pack_context_respects_budget_and_reports_usage():
+    facts = [{"text": f"fact number {i} " + "x" * 40} for i in range(20)]
+    history = [{"role": "user", "content": f"turn {i} " * 10} for i in range(30)]
+    budget = ContextBudget(total=300, facts=60, history_turns=10)
+    packed = pack_context("system prompt", "hello", facts, history, budget)
+    u = packed.usage
+    assert u["facts"] <= 60 and u["total"] <= 300
+    assert u["facts"] + u["history"] + u["system"] + u["user"] == u["total"]
+    assert packed.history and packed.history[-1] is history[-1]
+    assert len(packed.history) <= 10
+    assert u["facts_dropped"] == 20 - len(packed.facts)
+    assert approx_tokens("/root/genomics-stack") >= 4
@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+
+import pytest
+
+from mother.core import engines, memory
+
+
+@pytest.fixture(params=["full", "group", "async"])
+def db(tmp_path, monkeypatch, request):
+    memory.shutdown()
+    monkeypatch.setattr(memory, "DB_PATH", str(tmp_path / "mother.db"))
+    monkeypatch.setattr(memory, "DURABILITY", request.param)
+    memory.init_db()
+    yield memory
+    memory.shutdown()
+
+
+def test_last_seen_reads_own_writes(db):
+    assert db.touch_and_delta("u1") is None
+    # the second touch sees the first even if it is still queued (async)
+    d = db.touch_and_delta("u1")
+    assert d is not None and d.total_seconds() >= 0
+    db.remember_fact("u1", "city", "Lisbon")
+    assert db.get_profile("u1") == {"city": "Lisbon"}
+    db.flush()
+    assert db._query("SELECT count(*) FROM events") == [(2,)]
+
+
+def test_concurrent_touches_all_commit(db):
+    def hammer(i):
+        for _ in range(20):
+            db.touch_and_delta(f"u{i % 4}")
+
+    threads = [threading.Thread(target=hammer, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    db.flush()
+    assert db._query("SELECT count(*) FROM events") == [(160,)]
+    assert db._query("SELECT count(*) FROM users") == [(4,)]
+    assert set(db._USERS) == {"u0", "u1", "u2", "u3"}
+
+
+def test_last_seen_sees_other_workers(db):
+    if db.DURABILITY == "async":
+        pytest.skip("async trusts this process's cache")
+    db.touch_and_delta("u1")
+    # another worker on the same file touches u1 later than we did
+    other = sqlite3.connect(db.DB_PATH)
+    with other:
+        other.execute(
+            "UPDATE users SET last_seen_at=? WHERE user_id='u1'",
+            ("2999-01-01T00:00:00+00:00",),
+        )
+    other.close()
+    d = db.touch_and_delta("u1")
+    assert d is not None and d.total_seconds() < 0
+
+
+def test_user_cache_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(db, "USER_CACHE", 2)
+    for u in ("a", "b", "c"):
+        db.touch_and_delta(u)
+    assert list(db._USERS) == ["b", "c"]
+    # evicted users still work: the upsert never relies on the cache
+    db.remember_fact("a", "k", "v")
+    assert db.get_profile("a") == {"k": "v"}
+
+
+def test_profile_read_is_pure_and_hides_expired(db):
+    db.remember_fact("u1", "city", "Lisbon")
+    db.remember_fact("u1", "old", "x", ttl_days=-1)
+    db.flush()
+    changes = db._engine()._writer._conn.total_changes
+    assert db.get_profile("u1") == {"city": "Lisbon"}
+    assert db.get_profile("nobody") == {}
+    db.flush()
+    assert db._engine()._writer._conn.total_changes == changes
+    # the expired row stays until the sweeper removes it
+    assert db._query("SELECT count(*) FROM facts") == [(2,)]
+    assert db.sweep_expired(batch=1) == 1
+    assert db._query("SELECT count(*) FROM facts") == [(1,)]
+
+
+def test_remember_invalidates_cached_profile(db):
+    db.remember_fact("u1", "city", "Lisbon")
+    assert db.get_profile("u1") == {"city": "Lisbon"}
+    assert "u1" in db._PROFILES
+    db.remember_fact("u1", "city", "Porto")
+    assert db.get_profile("u1") == {"city": "Porto"}
+
+
+def test_init_db_tolerates_a_concurrent_migration(db, monkeypatch):
+    # another worker added prev_seen_at between our check and our ALTER
+    eng = db._engine()
+    columns = eng.columns
+    stale = iter([{"user_id", "created_at", "last_seen_at"}])
+    monkeypatch.setattr(eng, "columns", lambda t: next(stale, None) or columns(t))
+    db.init_db()
+    assert "prev_seen_at" in columns("users")
+
+
+def test_sqlite_too_old_for_returning(monkeypatch, tmp_path):
+    monkeypatch.setattr(engines.sqlite3, "sqlite_version_info", (3, 31, 1))
+    with pytest.raises(RuntimeError, match="3.35"):
+        engines.SQLiteEngine(str(tmp_path / "x.db"))
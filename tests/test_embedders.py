@@ -0,0 +1,22 @@
+import pytest
+
+from mother.memory import embedders
+from mother.memory.embedders import HashEmbedder, _hash_embed_py
+
+
+@pytest.mark.parametrize("dim", [1, 384, 1024])
+def test_hash_embedder_matches_reference(dim):
+    pytest.importorskip("numpy")
+    texts = ["", "ping", "/root/genomics-stack", "10.10.10.1:5434", "é ünïcode"]
+    emb = HashEmbedder(_dim=dim)
+    assert emb.embed_batch(texts) == [_hash_embed_py(t, dim) for t in texts]
+    assert emb.embed("ping") == _hash_embed_py("ping", dim)
+
+
+def test_hash_embedder_pure_python_fallback(monkeypatch):
+    monkeypatch.setattr(embedders, "np", None)
+    emb = HashEmbedder(_dim=16)
+    assert emb.embed_batch(["a", "b"]) == [
+        _hash_embed_py("a", 16),
+        _hash_embed_py("b", 16),
+    ]
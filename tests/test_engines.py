@@ -0,0 +1,78 @@
+import ast
+import inspect
+import re
+import uuid
+
+import pytest
+
+from mother.core import memory, rollups
+from mother.core.engines import PostgresEngine, _pg_sql
+
+_SQL_START = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|WITH)\b", re.I)
+
+
+def _sql_strings(module):
+    # string literals and f-strings (interpolations as a bare name)
+    out = []
+    for node in ast.walk(ast.parse(inspect.getsource(module))):
+        if isinstance(node, ast.JoinedStr):
+            s = "".join(
+                v.value if isinstance(v, ast.Constant) else "x" for v in node.values
+            )
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            s = node.value
+        else:
+            continue
+        if _SQL_START.match(s):
+            out.append(s)
+    return out
+
+
+@pytest.mark.parametrize("module", [memory, rollups])
+def test_pg_sql_over_module_statements(module):
+    stmts = _sql_strings(module)
+    assert stmts
+    for sql in stmts:
+        pg = _pg_sql(sql)
+        assert "?" not in pg
+        assert pg.count("%s") - sql.count("%s") == sql.count("?")
+        # every % left is a placeholder or an escaped literal
+        assert "%" not in re.sub(r"%[s%]", "", pg), sql
+
+
+def test_pg_sql_escapes_literal_percent():
+    assert _pg_sql("SELECT ? WHERE k LIKE 'a%'") == "SELECT %s WHERE k LIKE 'a%%'"
+    assert _pg_sql("id INTEGER PRIMARY KEY AUTOINCREMENT") == "id BIGSERIAL PRIMARY KEY"
+
+
+def test_postgres_engine_roundtrip(pg_dsn):
+    from mother.memory.pool import close_pools
+
+    table = f"t_engine_{uuid.uuid4().hex[:8]}"
+    eng = PostgresEngine(pg_dsn)
+    try:
+        eng.submit(
+            [
+                (
+                    f"CREATE TABLE {table} ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT, k TEXT NOT NULL)",
+                    (),
+                )
+            ]
+        ).result()
+        assert eng.columns(table) == {"id", "k"}
+        res = eng.submit(
+            [
+                (f"INSERT INTO {table}(k) VALUES(?), (?) RETURNING id", ("a%", "b")),
+                (f"SELECT count(*) FROM {table}", ()),
+            ]
+        ).result()
+        assert [r[0] for r in res[0]] == [1, 2]
+        assert res[1] == [(2,)]
+        assert eng.query(f"SELECT k FROM {table} WHERE k LIKE 'a%'") == [("a%",)]
+        assert eng.query(f"SELECT k FROM {table} WHERE id = ?", (2,)) == [("b",)]
+        with pytest.raises(Exception):
+            eng.submit([(f"INSERT INTO {table}(k) VALUES(NULL)", ())]).result()
+    finally:
+        eng.submit([(f"DROP TABLE IF EXISTS {table}", ())]).result()
+        close_pools()
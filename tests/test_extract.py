@@ -0,0 +1,64 @@
+import random
+import time
+
+from mother.memory.extract import (
+    extract_candidate_facts,
+    extract_candidate_facts_legacy,
+)
+
+CORPUS = [
+    "my repo root is /root/genomics-stack and data lives in /mnt/data/raw",
+    "Repository path is /home/ana/src/mother\nthanks",
+    "db is postgres on 10.10.10.12:5432, replica at 10.10.10.13:5432",
+    "POSTGRES lives at 10.10.10.12:5432\npostgres? no",
+    "ssh to build.example.com:2222 or 192.168.1.20:22; mirror at pkg.internal.io",
+    "foo/root/x and //srv/www but not ' /var/log' mid-sentence",
+    "x_api.example.com a-b-c.d-e.fg a.b.c 1.2.3.4.5 256.300.1.1:99999",
+    "",
+    "nothing to see here",
+    "dup: /root/a /ROOT/A /root/a 10.0.0.1 10.0.0.1",
+]
+
+TOKENS = [
+    "/root/x", "/home/a.b", "//srv/", "repo root is /x", "repository path is y\n",
+    "10.10.10.5:5432", "10.10.10.", "postgres", "Postgres", "1.2.3.4",
+    "foo.com", "a-b.c-d.ef", "x_y.com", ".io", "-", ".", ":", ":8080", " ", "\n",
+    "_", "é", "db", "123", "a", "9", "Host.EXAMPLE.org:22",
+]  # fmt: skip
+
+
+def test_matches_legacy_on_corpus():
+    for i, a in enumerate(CORPUS):
+        for b in CORPUS[i:]:
+            assert extract_candidate_facts(a, b) == extract_candidate_facts_legacy(a, b)
+
+
+def test_matches_legacy_on_random_text():
+    rnd = random.Random(7)
+    for _ in range(5000):
+        s = "".join(rnd.choice(TOKENS) for _ in range(rnd.randint(1, 12)))
+        if rnd.random() < 0.5:
+            s = s.replace(" ", "")
+        assert extract_candidate_facts(s, budget_ms=None) == (
+            extract_candidate_facts_legacy(s)
+        )
+
+
+def test_pathological_input_is_linear():
+    # dashed noise: the legacy host scan is quadratic here
+    noise = "a-" * 20_000 + " postgres " + "x " * 10_000
+    t0 = time.perf_counter()
+    assert extract_candidate_facts(noise, max_chars=0, budget_ms=None) == []
+    assert time.perf_counter() - t0 < 1.0
+
+
+def test_size_and_time_budget():
+    text = "/root/first " + "x" * 100 + " /root/second"
+    assert [f[0] for f in extract_candidate_facts(text, max_chars=50)] == [
+        "/root/first"
+    ]
+    big = " ".join(f"h{i}.example.com" for i in range(50_000))
+    t0 = time.perf_counter()
+    out = extract_candidate_facts(big, max_chars=0, budget_ms=5)
+    assert time.perf_counter() - t0 < 0.5
+    assert 0 < len(out) < 50_000
@@ -0,0 +1,115 @@
+from mother.memory.adapter import MemoryAdapter
+from mother.memory.embedders import HashEmbedder
+from mother.memory.index import IndexSpec, ensure_index, rebuild_index
+from mother.memory.sql import search_settings_sql
+
+
+def test_iterative_scan_is_only_set_when_enabled():
+    off = IndexSpec(iterative_scan="off")
+    assert not off.iterative
+    assert "hnsw.iterative_scan" not in search_settings_sql(off.iterative)
+    on = IndexSpec(iterative_scan="relaxed_order")
+    assert "hnsw.iterative_scan" in search_settings_sql(on.iterative)
+    assert on.search_params()["iterative_scan"] == "relaxed_order"
+    # "auto" waits for the pgvector version (ensure_index)
+    assert not IndexSpec(iterative_scan="auto").iterative
+
+
+def test_search_params_cover_the_query_limit():
+    spec = IndexSpec(ef_search=40, probes=10)
+    assert spec.search_params(limit=10) == spec.search_params()
+    wide = spec.search_params(limit=200)
+    assert wide["ef_search"] == "200" and wide["probes"] == "50"
+    assert spec.search_params(ef_search=400, limit=200)["ef_search"] == "400"
+
+
+def test_ann_limit_counts_rescore_and_hybrid_candidates():
+    def ann(quant, mode):
+        mem = MemoryAdapter(
+            dsn="unused",
+            embedder=HashEmbedder(_dim=8),
+            recall_cache=None,
+            track_access=False,
+            quant=quant,
+            rescore_factor=4,
+            hybrid_candidates=100,
+        )
+        return mem._ann_limit(
+            mem._search_params("u", [0.0] * 8, 50, None, None, "q", mode)
+        )
+
+    assert ann("none", "vector") == 50
+    assert ann("halfvec", "vector") == 200
+    assert ann("none", "hybrid") == 100
+
+
+class _Cur:
+    def __init__(self, version, indexes):
+        self.version, self.indexes, self.sql = version, indexes, []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *a):
+        return False
+
+    def execute(self, sql, params=None):
+        self.sql.append(sql)
+        self.last = sql
+
+    def fetchone(self):
+        return {"extversion": self.version} if "extversion" in self.last else None
+
+    def fetchall(self):
+        return [{"indexname": n} for n in self.indexes]
+
+
+class _Conn:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def cursor(self):
+        return self._cur
+
+
+def test_ensure_index_turns_iterative_scan_off_on_old_pgvector():
+    spec = IndexSpec(method="hnsw", iterative_scan="relaxed_order", lexical=False)
+    out = ensure_index(_Conn(_Cur("0.7.4", [spec.name])), spec)
+    assert out["pgvector"] == "0.7.4" and spec.iterative_scan == "off"
+    spec = IndexSpec(method="hnsw", iterative_scan="relaxed_order", lexical=False)
+    ensure_index(_Conn(_Cur("0.8.0", [spec.name])), spec)
+    assert spec.iterative_scan == "relaxed_order"
+
+
+def test_ensure_index_resolves_auto_iterative_scan():
+    spec = IndexSpec(method="hnsw", iterative_scan="auto", lexical=False)
+    ensure_index(_Conn(_Cur("0.8.0", [spec.name])), spec)
+    assert spec.iterative_scan == "relaxed_order" and spec.iterative
+    spec = IndexSpec(method="hnsw", iterative_scan="auto", lexical=False)
+    ensure_index(_Conn(_Cur("0.7.4", [spec.name])), spec)
+    assert spec.iterative_scan == "off"
+
+
+def test_ivfflat_rebuild_swaps_in_a_new_index():
+    spec = IndexSpec(method="ivfflat", lexical=False)
+    cur = _Cur("0.8.0", [spec.name])
+    rebuild_index(_Conn(cur), spec)
+    ddl = [s for s in cur.sql if "INDEX" in s]
+    tmp = f"{spec.name}_rebuild"
+    # the new index exists before the old one is dropped
+    assert ddl[1].startswith(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {tmp} ")
+    assert ddl[2] == f"DROP INDEX CONCURRENTLY IF EXISTS {spec.name}"
+    assert ddl[3] == f"ALTER INDEX {tmp} RENAME TO {spec.name}"
+
+
+def test_relaxed_order_results_are_resorted_by_distance():
+    mem = MemoryAdapter(
+        dsn="unused",
+        embedder=HashEmbedder(_dim=8),
+        recall_cache=None,
+        track_access=False,
+        index=IndexSpec(iterative_scan="relaxed_order"),
+    )
+    rows = [{"id": "b", "distance": 0.3}, {"id": "a", "distance": 0.1}]
+    assert [r["id"] for r in mem._scored(list(rows), resort=True)] == ["a", "b"]
+    assert mem._relaxed({"mode": "vector"}) and not mem._relaxed({"mode": "hybrid"})
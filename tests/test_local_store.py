@@ -0,0 +1,173 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.adapter import MemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+from mother.memory.local_store import LocalVectorStore  # noqa: E402
+
+
+def _adapter(path, dtype="float32"):
+    emb = HashEmbedder(_dim=32)
+    return MemoryAdapter(
+        dsn="unused",
+        embedder=emb,
+        recall_cache=None,
+        store=LocalVectorStore(str(path), dim=32, dtype=dtype),
+    )
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_upsert_retrieve_filters_and_reopen(tmp_path, dtype):
+    mem = _adapter(tmp_path, dtype)
+    mem.upsert_many(
+        [
+            {"user_id": "u1", "text": "repo /root/mother", "type": "project"},
+            {"user_id": "u1", "text": "likes tea", "tags": ["pref"]},
+            {"user_id": "u2", "text": "repo /root/mother"},
+        ]
+    )
+    rows = mem.retrieve("u1", "repo /root/mother", limit=5)
+    assert [r["text"] for r in rows][0] == "repo /root/mother"
+    assert len(rows) == 2 and all(r["user_id"] == "u1" for r in rows)
+    assert rows[0]["score"] == pytest.approx(1.0, abs=1e-2)
+    assert set(rows[0]) >= {"id", "tags", "payload", "ts_created", "ts_seen"}
+    assert [r["type"] for r in mem.retrieve("u1", "x", types=["project"])] == [
+        "project"
+    ]
+    assert [r["text"] for r in mem.retrieve("u1", "x", tags="pref")] == ["likes tea"]
+
+    vid = mem.upsert("u1", "likes tea", tags=["pref", "drink"], payload={"k": 1})
+    mem.store.close()
+
+    mem = _adapter(tmp_path, dtype)
+    assert mem.store_stats()["rows"] == 3
+    hit = mem.retrieve("u1", "likes tea", limit=1)[0]
+    assert hit["id"] == vid and hit["tags"] == ["pref", "drink"]
+    assert hit["payload"] == {"k": 1}
+    assert mem.retrieve("nobody", "likes tea") == []
+
+
+def test_reused_id_moves_to_the_new_user_and_type(tmp_path):
+    mem = _adapter(tmp_path)
+    vid = mem.upsert("u1", "likes tea", mtype="pref")
+    assert mem.upsert("u2", "likes tea", mtype="autobio", id_override=vid) == vid
+    for reopen in (False, True):
+        if reopen:
+            mem.store.close()
+            mem = _adapter(tmp_path)
+        assert mem.retrieve("u1", "likes tea") == []
+        hit = mem.retrieve("u2", "likes tea", types=["autobio"])[0]
+        assert (hit["id"], hit["user_id"], hit["type"]) == (vid, "u2", "autobio")
+        assert mem.retrieve("u2", "likes tea", types=["pref"]) == []
+
+
+def test_dim_mismatch_is_rejected(tmp_path):
+    LocalVectorStore(str(tmp_path), dim=8).close()
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path), dim=16)
+
+
+def test_hybrid_mode_fuses_exact_string_matches(tmp_path):
+    mem = _adapter(tmp_path)
+    texts = [f"note number {i}" for i in range(30)] + ["host db01 at 10.0.0.7"]
+    mem.upsert_many([{"user_id": "u1", "text": t} for t in texts])
+    rows = mem.retrieve("u1", "where is 10.0.0.7", limit=3, mode="hybrid")
+    assert rows[0]["text"] == "host db01 at 10.0.0.7"
+    assert rows[0]["lex_rank"] == 1 and rows[0]["rrf"] >= rows[1]["rrf"]
+    assert "rrf" not in mem.retrieve("u1", "where is 10.0.0.7", limit=3)[0]
+    with pytest.raises(ValueError):
+        mem.retrieve("u1", "x", mode="bm25")
+
+
+def test_int8_rescoring_matches_full_precision_order(tmp_path):
+    np = pytest.importorskip("numpy")
+    rnd = np.random.default_rng(0)
+    vecs = rnd.standard_normal((500, 32)).astype(np.float32)
+    rows = [
+        {
+            "id": str(i),
+            "user_id": "u",
+            "type": "semantic",
+            "text": str(i),
+            "tags": [],
+            "confidence": 0.9,
+            "ttl_days": 0,
+            "retention_policy": "LRFU(21d)",
+            "embedding_model": "test",
+            "embedding_dim": 32,
+            "embedding": v,
+            "payload": "{}",
+        }
+        for i, v in enumerate(vecs)
+    ]
+    q = rnd.standard_normal(32).astype(np.float32)
+    exact = 1 - vecs @ q / (np.linalg.norm(vecs, axis=1) * np.linalg.norm(q))
+    want = [str(i) for i in np.argsort(exact)[:10]]
+
+    store = LocalVectorStore(str(tmp_path), dim=32, dtype="int8")
+    store.upsert_rows(rows)
+    params = {"user_id": "u", "query_vec": q, "limit": 10, "rescore": 40}
+    got = store.search(params, "cosine")
+    assert [r["id"] for r in got] == want
+    assert got[0]["distance"] == pytest.approx(float(exact.min()), abs=1e-5)
+    assert store.stats()["vector_bytes"] * 4 == store.stats()["full_bytes"]
+
+
+class _SlashBlindEmbedder(HashEmbedder):
+    # trailing slashes do not change the vector: a stand-in for a model that
+    # puts rewordings of one fact next to each other
+    def embed_batch(self, texts):
+        return super().embed_batch([t.rstrip("/") for t in texts])
+
+    def embed(self, text):
+        return self.embed_batch([text])[0]
+
+
+def test_dedupe_merges_near_duplicates(tmp_path):
+    mem = MemoryAdapter(
+        dsn="unused",
+        embedder=_SlashBlindEmbedder(_dim=32),
+        recall_cache=None,
+        store=LocalVectorStore(str(tmp_path), dim=32),
+        dedupe=True,
+    )
+    first = mem.upsert("u1", "/root/genomics-stack", tags=["path"], confidence=0.8)
+    ids = mem.upsert_many(
+        [
+            {"user_id": "u1", "text": "/root/genomics-stack/", "tags": ["repo"]},
+            {"user_id": "u1", "text": "likes tea"},
+            {"user_id": "u2", "text": "/root/genomics-stack/"},
+        ]
+    )
+    assert ids[0] == first and ids[1] != first and ids[2] != first
+    assert mem.store_stats()["rows"] == 3
+    hit = mem.retrieve("u1", "/root/genomics-stack", limit=1)[0]
+    assert hit["text"] == "/root/genomics-stack"
+    assert hit["tags"] == ["path", "repo"]
+    assert hit["confidence"] == pytest.approx(0.95)
+
+
+def test_dedupe_leaves_stored_ids_in_place(tmp_path):
+    # matches upsert_dedupe_sql: a known id is upserted, never merged away
+    mem = MemoryAdapter(
+        dsn="unused",
+        embedder=_SlashBlindEmbedder(_dim=32),
+        recall_cache=None,
+        store=LocalVectorStore(str(tmp_path), dim=32),
+    )
+    ids = mem.upsert_many(
+        [
+            {"user_id": "u1", "text": "/root/genomics-stack"},
+            {"user_id": "u1", "text": "/root/genomics-stack/"},
+        ]
+    )
+    assert mem.store.existing([*ids, "nope"]) == set(ids)
+    again = mem.upsert_many(
+        [
+            {"user_id": "u1", "text": "/root/genomics-stack"},
+            {"user_id": "u1", "text": "/root/genomics-stack/"},
+        ],
+        dedupe=True,
+    )
+    assert again == ids and mem.store_stats()["rows"] == 2
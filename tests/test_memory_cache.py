@@ -0,0 +1,79 @@
+from mother.memory.cache import CachedEmbedder, EmbeddingCache
+from mother.memory.embedders import HashEmbedder
+
+
+class CountingEmbedder(HashEmbedder):
+    calls = 0
+
+    def embed_batch(self, texts):
+        self.calls += len(texts)
+        return super().embed_batch(texts)
+
+
+def test_memory_tier_hits_and_lru_eviction():
+    inner = CountingEmbedder(_dim=8)
+    emb = CachedEmbedder(inner, EmbeddingCache(max_entries=2, path=None))
+    v = emb.embed("ping")
+    assert emb.embed("ping") == v
+    emb.embed_batch(["a", "b", "a"])
+    assert inner.calls == 3  # ping, a, b
+    s = emb.stats()
+    assert s["hits_mem"] == 1 and s["mem_entries"] == 2 and s["evictions_mem"] == 1
+
+
+def test_disk_tier_survives_restart_and_evicts(tmp_path):
+    path = str(tmp_path / "emb.sqlite")
+    emb = CachedEmbedder(HashEmbedder(_dim=8), EmbeddingCache(max_entries=0, path=path))
+    v = emb.embed("/root/genomics-stack")
+
+    inner = CountingEmbedder(_dim=8)
+    cache = EmbeddingCache(max_entries=4, path=path, max_disk_entries=3)
+    emb2 = CachedEmbedder(inner, cache)
+    got = emb2.embed("/root/genomics-stack")
+    assert inner.calls == 0
+    assert type(got[0]) is float
+    assert max(abs(a - b) for a, b in zip(v, got)) < 1e-6
+    emb2.embed_batch(["w", "x", "y", "z"])
+    assert cache.stats()["disk_entries"] <= 3
+    assert cache.stats()["hits_disk"] == 1
+
+
+def test_disk_row_count_ignores_rewrites(tmp_path):
+    cache = EmbeddingCache(max_entries=0, path=str(tmp_path / "emb.sqlite"))
+    cache.put_many({"a": [1.0], "b": [2.0]})
+    cache.put_many({"a": [1.0], "c": [3.0]})
+    cache.put_many({"a": [1.0]})
+    assert cache.stats()["disk_entries"] == 3
+    assert cache.get_many(["a", "c"]) == [[1.0], [3.0]]
+
+
+def test_callers_cannot_edit_cached_vectors():
+    emb = CachedEmbedder(HashEmbedder(_dim=8), EmbeddingCache(max_entries=4))
+    v = emb.embed("ping")
+    want = list(v)
+    v[0] = 99.0
+    hit = emb.embed("ping")
+    assert hit == want
+    hit[1] = 99.0
+    assert emb.cache.peek(emb._key("ping")) == want
+    assert emb.embed_batch(["ping"]) == [want]
+
+
+def test_retrieval_cache_invalidation_and_generation():
+    from mother.memory.cache import RetrievalCache
+
+    rc = RetrievalCache(ttl_s=60, max_entries=4)
+    key = rc.key("u1", [0.1, 0.2], ["semantic"], None, 5)
+    gen = rc.generation("u1")
+    assert rc.get(key) is None
+    rc.put(key, [{"id": "a", "score": 0.9}], gen)
+    assert rc.get(key) == [{"id": "a", "score": 0.9}]
+
+    # a write for the user drops entries and rejects puts from older lookups
+    rc.invalidate_user("u1")
+    assert rc.get(key) is None
+    rc.put(key, [{"id": "stale"}], gen)
+    assert rc.get(key) is None
+    rc.put(key, [{"id": "b"}], rc.generation("u1"))
+    assert rc.get(key) == [{"id": "b"}]
+    assert rc.stats()["invalidations"] == 1
@@ -0,0 +1,120 @@
+import asyncio
+import importlib.util
+import os
+
+import httpx
+
+_PATH = os.path.join(os.path.dirname(__file__), "..", "ops", "openai_proxy.py")
+_spec = importlib.util.spec_from_file_location("openai_proxy", _PATH)
+proxy = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(proxy)
+
+
+def test_streams_upstream_body_and_records_stats():
+    closed = []
+
+    async def sse():
+        try:
+            for i in range(3):
+                yield f"data: {i}\n\n".encode()
+        finally:
+            closed.append(True)
+
+    def upstream(request):
+        assert request.url.path == "/v1/chat/completions"
+        assert request.url.params["x"] == "1" and request.headers["host"] != "t"
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream", "x-internal": "no"},
+            content=sse(),
+        )
+
+    async def run():
+        proxy.app.state.client = proxy.make_client(httpx.MockTransport(upstream))
+        transport = httpx.ASGITransport(app=proxy.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            r = await c.post("/v1/chat/completions?x=1", json={"stream": True})
+            s = (await c.get("/stats")).json()
+        await proxy.app.state.client.aclose()
+        return r, s
+
+    r, s = asyncio.run(run())
+    assert r.status_code == 200 and r.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert r.headers["content-type"] == "text/event-stream"
+    assert "x-internal" not in r.headers
+    assert closed == [True]
+    assert s["requests"] == 1 and s["streams"] == 1 and s["disconnects"] == 0
+    assert s["bytes_out"] == len(r.content) and sum(s["total_ms"].values()) == 1
+
+
+def test_upstream_down_is_502():
+    def upstream(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run():
+        proxy.app.state.client = proxy.make_client(httpx.MockTransport(upstream))
+        transport = httpx.ASGITransport(app=proxy.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await c.get("/v1/models")
+
+    r = asyncio.run(run())
+    assert r.status_code == 502 and r.json()["error"] == "upstream"
+
+
+def test_client_disconnect_closes_upstream():
+    closed = []
+
+    async def sse():
+        try:
+            for i in range(100):
+                yield f"data: {i}\n\n".encode()
+                await asyncio.sleep(0)
+        finally:
+            closed.append(True)
+
+    def upstream(request):
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=sse()
+        )
+
+    async def run():
+        proxy.app.state.client = proxy.make_client(httpx.MockTransport(upstream))
+        before = proxy.stats.snapshot()["disconnects"]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.4"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/v1/completions",
+            "raw_path": b"/v1/completions",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"t")],
+            "client": ("127.0.0.1", 1),
+            "server": ("t", 80),
+        }
+        body = [{"type": "http.request", "body": b"{}", "more_body": False}]
+
+        async def receive():
+            if body:
+                return body.pop()
+            await asyncio.sleep(3600)
+
+        chunks = []
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                chunks.append(message["body"])
+                raise OSError("client went away")
+
+        try:
+            await proxy.app(scope, receive, send)
+        except Exception:
+            pass
+        await proxy.app.state.client.aclose()
+        return chunks, proxy.stats.snapshot()["disconnects"] - before
+
+    chunks, disconnects = asyncio.run(run())
+    assert chunks == [b"data: 0\n\n"]
+    assert closed == [True] and disconnects == 1
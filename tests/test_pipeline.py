@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+
+import pytest
+
+from mother.memory.pipeline import RememberPipeline
+
+
+class Sink:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, items):
+        self.gate.wait()
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("db down")
+        self.batches.append([it["id_override"] for it in items])
+
+
+def _ids(user_id, text):
+    return f"{user_id}:{text}"
+
+
+def _item(text):
+    return {"user_id": "u1", "text": text, "type": "semantic"}
+
+
+def test_batches_across_submits_and_retries(tmp_path):
+    sink = Sink(fail=1)
+    sink.gate.clear()
+    p = RememberPipeline(
+        sink, _ids, workers=1, max_wait_ms=50, journal=str(tmp_path / "j")
+    )
+    assert p.submit([_item("a")]) == ["u1:a"]
+    assert p.submit([_item("b"), _item("c")]) == ["u1:b", "u1:c"]
+    sink.gate.set()
+    assert p.flush(timeout=10)
+    p.close()
+    assert sink.batches == [["u1:a", "u1:b", "u1:c"]]
+    s = p.stats()
+    assert s["retries"] == 1 and s["written"] == 3 and s["spilled"] == 0
+
+
+def test_unwritten_items_are_journaled_and_replayed(tmp_path):
+    journal = str(tmp_path / "remember.journal")
+    down = Sink(fail=100)
+    p = RememberPipeline(down, _ids, workers=1, max_retries=0, journal=journal)
+    p.submit([_item("a")])
+    assert p.flush(timeout=10)
+    down.gate.clear()
+    p.submit([_item("b")])  # still queued or in flight at close
+    p.close(timeout=0.2)
+    down.gate.set()
+    assert p.stats()["spilled"] >= 2
+
+    up = Sink()
+    p2 = RememberPipeline(up, _ids, workers=1, journal=journal)
+    assert p2.flush(timeout=10)
+    p2.close()
+    written = sorted({i for b in up.batches for i in b})
+    assert written == ["u1:a", "u1:b"]
+    assert p2.stats()["replayed"] >= 2
+
+
+def test_replay_skips_bad_lines_and_claimed_files(tmp_path):
+    fcntl = pytest.importorskip("fcntl")
+    journal = str(tmp_path / "remember.journal")
+    with open(journal, "w") as f:
+        f.write(json.dumps({**_item("a"), "id_override": "u1:a"}) + "\n")
+        f.write("{not json\n")
+    # left by a process that died mid-replay
+    with open(journal + ".replay.99.1", "w") as f:
+        f.write(json.dumps({**_item("b"), "id_override": "u1:b"}) + "\n")
+    # being replayed by a live process
+    busy = open(journal + ".replay.98.1", "a")
+    busy.write(json.dumps({**_item("c"), "id_override": "u1:c"}) + "\n")
+    busy.flush()
+    fcntl.flock(busy, fcntl.LOCK_EX)
+
+    sink = Sink()
+    p = RememberPipeline(sink, _ids, workers=2, journal=journal)
+    assert p.flush(timeout=10)
+    p.submit([_item("d")])
+    assert p.flush(timeout=10)
+    p.close()
+    busy.close()
+    written = [i for b in sink.batches for i in b]
+    assert sorted(written[:2]) == ["u1:a", "u1:b"] and written[2:] == ["u1:d"]
+    s = p.stats()
+    assert s["errors"] == 1 and s["replayed"] == 2
+    assert sorted(os.listdir(tmp_path)) == [
+        "remember.journal.lock",
+        "remember.journal.replay.98.1",
+    ]
@@ -0,0 +1,27 @@
+import pytest
+
+from mother.memory import pool
+from mother.memory.pool import PoolConfig
+
+
+class _FakePool:
+    def __init__(self, dsn, config=None):
+        self.config = config or PoolConfig()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(pool, "SharedPool", _FakePool)
+    monkeypatch.setattr(pool, "SharedAsyncPool", _FakePool)
+    monkeypatch.setattr(pool, "_POOLS", {})
+    monkeypatch.setattr(pool, "_ASYNC_POOLS", {})
+
+
+@pytest.mark.parametrize("get", [pool.shared_pool, pool.shared_async_pool])
+def test_shared_pool_rejects_a_conflicting_config(registry, get):
+    first = get("dbname=x", PoolConfig(max_size=4))
+    assert get("dbname=x") is first
+    assert get("dbname=x", PoolConfig(max_size=4)) is first
+    with pytest.raises(ValueError, match="already exists"):
+        get("dbname=x", PoolConfig(max_size=20))
+    assert get("dbname=y", PoolConfig(max_size=20)) is not first
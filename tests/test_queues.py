@@ -0,0 +1,21 @@
+import queue
+import time
+
+from mother.memory.queues import STOP, gather
+
+
+def test_gather_limits_and_stop():
+    q = queue.Queue()
+    for i in range(1, 6):
+        q.put(i)
+    assert gather(q, 0, 3, 0.0) == ([0, 1, 2], False)
+    q.put(STOP)
+    q.put(99)
+    assert gather(q, "x", 10, 1.0) == (["x", 3, 4, 5], True)
+    assert q.get_nowait() == 99
+
+
+def test_gather_waits_at_most_max_wait():
+    t0 = time.monotonic()
+    assert gather(queue.Queue(), 1, 8, 0.05) == ([1], False)
+    assert 0.04 <= time.monotonic() - t0 < 1.0
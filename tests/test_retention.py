@@ -0,0 +1,99 @@
+import psycopg
+
+from mother.memory.retention import (
+    _HALF_LIFE_SQL,
+    _POLICY,
+    AccessRecorder,
+    half_life_days,
+)
+
+
+def test_policy_half_life():
+    assert half_life_days("LRFU(21d)") == 21.0
+    assert half_life_days("LRFU(3.5d)") == 3.5
+    assert half_life_days("FIFO") == 21.0
+    # the SQL side parses the policy with the same pattern
+    assert _POLICY.pattern in _HALF_LIFE_SQL
+
+
+def test_access_recorder_coalesces_hits():
+    rec = AccessRecorder("postgresql://unused", interval_s=3600)
+    rec.record(["a", "b"])
+    rec.record(["a"])
+    batch = rec._take()
+    assert {k: v[0] for k, v in batch.items()} == {"a": 2, "b": 1}
+    assert batch["a"][1] >= batch["b"][1]
+    assert rec.flush() == 0  # nothing left to write
+    assert rec.stats()["hits"] == 3
+
+
+class _Conn:
+    closed = False
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql, params):
+        if self.fail:
+            raise psycopg.OperationalError("server closed the connection")
+        self.executed.append(params["ids"])
+
+    def close(self):
+        self.closed = True
+
+
+def test_access_recorder_uses_the_given_connect():
+    conn = _Conn()
+    rec = AccessRecorder("postgresql://unused", interval_s=3600, connect=lambda: conn)
+    rec.record(["b", "a"])
+    assert rec.flush() == 2 and conn.executed == [["a", "b"]]
+
+
+def test_access_recorder_keeps_one_connection(monkeypatch):
+    opened = [_Conn(fail=True), _Conn(), _Conn()]
+    monkeypatch.setattr(psycopg, "connect", lambda *a, **k: opened.pop(0))
+    rec = AccessRecorder("postgresql://unused", interval_s=3600)
+    rec.record(["a"])
+    assert rec.flush() == 0  # dropped; the broken connection is discarded
+    for _ in range(3):
+        rec.record(["a"])
+        assert rec.flush() == 1
+    assert len(opened) == 1
+    rec.close()
+    assert rec.stats()["errors"] == 1
+
+
+class _Unmigrated(_Conn):
+    migrated = False
+
+    def execute(self, sql, params=None):
+        if params is None:  # the column check
+            return self
+        if not self.migrated:
+            raise psycopg.errors.UndefinedColumn("column crf does not exist")
+        return super().execute(sql, params)
+
+    def fetchone(self):
+        return (self.migrated,)
+
+
+def test_access_recorder_resumes_once_the_columns_exist():
+    conn = _Unmigrated()
+    rec = AccessRecorder(
+        "postgresql://unused", interval_s=3600, connect=lambda: conn, recheck_s=0
+    )
+    rec.record(["a"])
+    assert rec.flush() == 0 and not rec.enabled
+    rec.record(["a"])  # ignored while paused
+    assert rec.flush() == 0 and not rec.enabled
+    conn.migrated = True
+    assert rec.flush() == 0 and rec.enabled
+    rec.record(["a"])
+    assert rec.flush() == 1 and conn.executed == [["a"]]
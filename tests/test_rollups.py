@@ -0,0 +1,68 @@
+import pytest
+
+from mother.core import memory, rollups
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    memory.shutdown()
+    monkeypatch.setattr(memory, "DB_PATH", str(tmp_path / "mother.db"))
+    memory.init_db()
+    rollups.init_db()
+    yield memory
+    memory.shutdown()
+
+
+def _event(user_id, kind, created_at):
+    memory._write(
+        [
+            (
+                "INSERT OR IGNORE INTO users(user_id, created_at) VALUES(?, ?)",
+                (user_id, created_at),
+            ),
+            (
+                "INSERT INTO events(user_id, kind, payload, created_at)"
+                " VALUES(?, ?, '{}', ?)",
+                (user_id, kind, created_at),
+            ),
+        ]
+    )
+
+
+def test_rollup_is_incremental(db):
+    _event("u1", "render", "2026-01-05T10:15:00+00:00")
+    _event("u1", "render", "2026-01-05T10:45:00+00:00")
+    _event("u2", "render", "2026-01-05T11:00:00+00:00")
+    assert rollups.rollup(batch=2)["batches"] == 2
+    _event("u1", "render", "2026-01-05T11:30:00+00:00")
+    assert rollups.rollup()["to_id"] == 4
+    assert rollups.rollup()["batches"] == 0
+    assert rollups.query("u1", grain="hour") == [
+        {"bucket": "2026-01-05T10", "kind": "render", "n": 2},
+        {"bucket": "2026-01-05T11", "kind": "render", "n": 1},
+    ]
+    assert rollups.query(grain="day") == [
+        {"bucket": "2026-01-05", "kind": "render", "n": 4}
+    ]
+
+
+def test_prune_archives_rolled_up_events(db, tmp_path):
+    _event("u1", "render", "2020-03-01T00:00:00+00:00")
+    _event("u1", "render", "2020-04-01T00:00:00+00:00")
+    assert rollups.prune(days=30, archive_dir=str(tmp_path))["pruned"] == 0
+    rollups.rollup()
+    _event("u1", "render", "2020-04-02T00:00:00+00:00")  # not rolled up yet
+    out = rollups.prune(days=30, archive_dir=str(tmp_path), batch=1)
+    assert out == {"pruned": 2, "archived": 2}
+    assert [e["id"] for e in rollups.read_archive("2020-04", str(tmp_path))] == [2]
+    assert memory._query("SELECT id FROM events") == [(3,)]
+    assert rollups.query("u1", since="2020-03", until="2020-03-31")[0]["n"] == 1
+
+
+def test_postgres_rollup_waits_out_the_commit_lag(db, monkeypatch):
+    monkeypatch.setattr(type(memory._engine()), "name", "postgres")
+    _event("u1", "render", "2026-01-05T10:15:00+00:00")
+    _event("u1", "render", memory._utc_now().isoformat())  # may still be in flight
+    assert rollups.rollup()["to_id"] == 1
+    monkeypatch.setattr(rollups, "ROLLUP_LAG_S", 0)
+    assert rollups.rollup()["to_id"] == 2
@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.async_adapter import AsyncMemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+from mother.memory.local_store import LocalVectorStore  # noqa: E402
+from mother.memory.service import ChatMemory, MemoryService  # noqa: E402
+
+
+def _service(tmp_path):
+    mem = MemoryService(
+        adapter=AsyncMemoryAdapter(
+            dsn="unused",
+            embedder=HashEmbedder(_dim=32),
+            recall_cache=None,
+            store=LocalVectorStore(str(tmp_path), dim=32),
+        )
+    )
+    mem.remember_async = False
+    return mem
+
+
+def test_handle_recalls_calls_llm_and_remembers(tmp_path):
+    mem = _service(tmp_path)
+    mem.remember(user_id="u1", text="repo root is /root/mother", type="autobio")
+    prompts = []
+
+    def llm(prompt):
+        prompts.append(prompt)
+        return "DB is on db.example.com"
+
+    chat = ChatMemory(llm, mem, k=2)
+    out = chat.handle(user_id="u1", history=[], user_msg="where is my repo?")
+    assert out["facts_used"] == ["repo root is /root/mother"]
+    assert "repo root is /root/mother" in prompts[0]
+    assert out["reply"] == "DB is on db.example.com" and len(out["facts_saved"]) == 1
+    texts = [r["text"] for r in mem.recall(user_id="u1", query_text="db", k=5)]
+    assert "db.example.com" in texts
+
+
+def test_async_llm_call_and_stream(tmp_path):
+    mem = _service(tmp_path)
+
+    async def llm(prompt):
+        return "ok then"
+
+    async def stream(prompt):
+        for tok in ("ok ", "then"):
+            yield tok
+
+    chat = ChatMemory(llm, mem, llm_stream=stream)
+    out = asyncio.run(chat.ahandle(user_id="u1", history=[], user_msg="hi"))
+    assert out["reply"] == "ok then"
+
+    async def collect():
+        return [e async for e in chat.astream(user_id="u1", history=[], user_msg="hi")]
+
+    events = asyncio.run(collect())
+    assert [d["text"] for e, d in events if e == "token"] == ["ok ", "then"]
+    assert events[-1][1]["reply"] == "ok then"
+    with pytest.raises(TypeError):
+        chat.handle(user_id="u1", history=[], user_msg="hi")
+
+
+def _speculating(tmp_path, monkeypatch, delay=0.05):
+    mem = _service(tmp_path)
+    recall = mem.arecall
+
+    async def slow_arecall(**kw):
+        await asyncio.sleep(delay)
+        return await recall(**kw)
+
+    monkeypatch.setattr(mem, "arecall", slow_arecall)
+    calls = []
+
+    async def stream(prompt):
+        call = {"prompt": prompt, "closed": False}
+        call["after_close"] = all(c["closed"] for c in calls)
+        calls.append(call)
+        try:
+            for tok in ("a ", "b ", "c"):
+                await asyncio.sleep(0.01)
+                yield tok
+        finally:
+            call["closed"] = True
+
+    chat = ChatMemory(
+        None,
+        mem,
+        llm_stream=stream,
+        speculate=True,
+        speculate_ms=1,
+        auto_remember=False,
+    )
+    return mem, chat, calls
+
+
+async def _collect(chat, user_msg):
+    gen = chat.astream(user_id="u1", history=[], user_msg=user_msg)
+    return [e async for e in gen]
+
+
+def test_astream_speculation_hit(tmp_path, monkeypatch):
+    _, chat, calls = _speculating(tmp_path, monkeypatch)
+    events = asyncio.run(_collect(chat, "hello"))  # nothing stored: no facts
+    assert len(calls) == 1 and calls[0]["closed"]
+    assert [d["text"] for e, d in events if e == "token"] == ["a ", "b ", "c"]
+    assert events[-1][1]["timing"]["speculative"] == "hit"
+    assert chat.stats()["spec_hits"] == 1
+
+
+def test_astream_speculation_miss_stops_the_guess(tmp_path, monkeypatch):
+    mem, chat, calls = _speculating(tmp_path, monkeypatch, delay=0.015)
+    mem.remember(user_id="u1", text="repo root is /root/mother", type="autobio")
+    events = asyncio.run(_collect(chat, "where is my repo?"))
+    assert len(calls) == 2
+    assert "/root/mother" not in calls[0]["prompt"]
+    # the guess was stopped before the real generation started
+    assert "/root/mother" in calls[1]["prompt"] and calls[1]["after_close"]
+    assert events[-1][1]["reply"] == "a b c"
+    assert events[-1][1]["timing"]["speculative"] == "miss"
+    assert chat.stats()["spec_misses"] == 1
+
+
+def test_astream_early_close_cleans_up(tmp_path, monkeypatch):
+    _, chat, calls = _speculating(tmp_path, monkeypatch, delay=0.015)
+
+    async def first_token():
+        gen = chat.astream(user_id="u1", history=[], user_msg="hello")
+        first = await gen.__anext__()
+        await gen.aclose()  # what a client disconnect does
+        return first, [c["closed"] for c in calls]
+
+    first, closed = asyncio.run(first_token())
+    assert first[0] == "token" and closed == [True]
+
+
+def test_chat_stream_endpoint(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from mother.app import api
+
+    _, chat, _ = _speculating(tmp_path, monkeypatch)
+    monkeypatch.setattr(api, "chat_mm", chat)
+    with TestClient(api.app) as client:
+        r = client.post("/chat/stream", json={"user_id": "u1", "message": "hello"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in r.text.split("\n\n") if f]
+    names = [f.split("\n")[0] for f in frames]
+    assert names == ["event: token"] * 3 + ["event: done"]
+    done = json.loads(frames[-1].split("\n")[1][len("data: ") :])
+    assert done["reply"] == "a b c" and done["timing"]["speculative"] == "hit"
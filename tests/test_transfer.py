@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from mother.memory.adapter import MemoryAdapter  # noqa: E402
+from mother.memory.embedders import HashEmbedder  # noqa: E402
+from mother.memory.local_store import LocalVectorStore  # noqa: E402
+from mother.memory.transfer import (  # noqa: E402
+    export_items,
+    import_items,
+    reembed_items,
+)
+
+
+def _adapter(path, name="hash-fallback-v1"):
+    return MemoryAdapter(
+        dsn="unused",
+        embedder=HashEmbedder(_dim=16, _name=name),
+        recall_cache=None,
+        store=LocalVectorStore(str(path), dim=16),
+    )
+
+
+def test_export_import_roundtrip_and_resume(tmp_path):
+    src = _adapter(tmp_path / "a")
+    src.upsert_many(
+        [{"user_id": "u1", "text": f"fact {i}", "tags": ["t"]} for i in range(25)]
+    )
+    out = str(tmp_path / "dump.ndjson")
+    assert export_items(src, out, batch=10)["rows"] == 25
+
+    # an interrupted export leaves a torn line; resuming drops it and goes on
+    with open(out, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(out, "wb") as f:
+        f.writelines(lines[:7] + [lines[7][:20]])
+    assert export_items(src, out, batch=10)["rows"] == 18
+    with open(out, "rb") as f:
+        assert f.read().splitlines(keepends=True) == lines
+
+    dst = _adapter(tmp_path / "b")
+    assert import_items(dst, out, batch=8)["rows"] == 25
+    assert not (tmp_path / "dump.ndjson.import").exists()
+    a = src.retrieve("u1", "fact 3", limit=3)
+    b = dst.retrieve("u1", "fact 3", limit=3)
+    assert [r["id"] for r in a] == [r["id"] for r in b]
+    assert [r["score"] for r in a] == pytest.approx([r["score"] for r in b])
+
+    # the exported timestamps survive, as on the Postgres import path
+    def stamps(mem):
+        return [
+            (r["id"], r["ts_created"], r["ts_seen"]) for r in mem.store.scan("", 50)
+        ]
+
+    assert stamps(dst) == stamps(src)
+
+
+def test_reembed_switches_model(tmp_path):
+    mem = _adapter(tmp_path)
+    mem.upsert_many([{"user_id": "u1", "text": f"fact {i}"} for i in range(5)])
+    mem.store.close()
+
+    mem = _adapter(tmp_path, name="hash-v2")
+    assert reembed_items(mem, batch=2)["rows"] == 5
+    assert reembed_items(mem, batch=2)["rows"] == 0
+    rows = mem.store.scan("", 10)
+    assert {r["embedding_model"] for r in rows} == {"hash-v2"}